@@ -19,6 +19,10 @@
         'report_xlsx',
     ],
     'data': [
+        'security/ir.model.access.csv',
+        'security/account_financial_report_job_security.xml',
+        'data/ir_cron.xml',
+        'data/account_financial_report_storage.xml',
         'wizard/aged_partner_balance_wizard_view.xml',
         'wizard/general_ledger_wizard_view.xml',
         'wizard/journal_ledger_wizard_view.xml',
@@ -42,6 +46,7 @@
         'view/report_open_items.xml',
         'view/report_aged_partner_balance.xml',
         'view/report_vat_report.xml',
+        'view/account_financial_report_job_view.xml',
     ],
     'installable': True,
     'application': True,
@@ -1,2 +1,18 @@
 from . import account
+from . import account_aging
+from . import account_analytic_account
+from . import account_financial_report_job
+from . import account_financial_report_query
+from . import account_financial_report_storage
 from . import account_group
+from . import account_group_closure
+from . import account_journal
+from . import account_ledger_generation
+from . import account_move
+from . import account_move_line
+from . import account_partial_reconcile
+from . import account_partial_reconcile_date
+from . import account_period_balance
+from . import account_tax
+from . import res_company
+from . import res_partner
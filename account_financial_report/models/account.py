@@ -1,6 +1,6 @@
 # © 2011 Guewen Baconnier (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).-
-from odoo import models, fields
+from odoo import api, models, fields
 
 
 class AccountAccount(models.Model):
@@ -11,3 +11,32 @@ class AccountAccount(models.Model):
         help="If flagged, no details will be displayed in "
              "the General Ledger report (the webkit one only), "
              "only centralized amounts per period.")
+
+    @api.model
+    def create(self, vals):
+        account = super(AccountAccount, self).create(vals)
+        self.env['account.group']._refresh_account_groups(account.ids)
+        self.env['account.group.closure']._refresh_accounts(account.ids)
+        self.env['account.ledger.generation']._bump_companies(
+            account.mapped('company_id').ids)
+        return account
+
+    @api.multi
+    def write(self, vals):
+        company_ids = self.mapped('company_id').ids
+        res = super(AccountAccount, self).write(vals)
+        # The cached reports display the code, name and groups of the
+        # accounts
+        self.env['account.ledger.generation']._bump_companies(
+            company_ids + self.mapped('company_id').ids)
+        if 'code' in vals:
+            self.env['account.group']._refresh_account_groups(self.ids)
+        if 'code' in vals or 'group_id' in vals:
+            self.env['account.group.closure']._refresh_accounts(self.ids)
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['account.ledger.generation']._bump_companies(
+            self.mapped('company_id').ids)
+        return super(AccountAccount, self).unlink()
@@ -0,0 +1,79 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+class AccountAging(models.AbstractModel):
+    """ Aging of amounts in buckets of days overdue.
+
+    The buckets are given by the ascending list of their first day
+    overdue: with [1, 31, 61], the buckets are not due (up to 0 days),
+    1 to 30 days, 31 to 60 days and 61 days or more.
+
+    The bucket of an amount is the index given by a single CASE on this
+    list, so all the buckets of all the partners are computed by one
+    grouped scan, whatever the number of buckets.
+    """
+
+    _name = 'account.aging'
+    _description = 'Account Aging'
+
+    @api.model
+    def _get_bucket_sql(self, days_overdue, limits):
+        """ Return the SQL expression of the bucket index of the
+        `days_overdue` SQL expression, NULL when it is NULL.
+
+        The query must have the parameters of `_get_aging_params`. """
+        return (
+            "CASE WHEN " + days_overdue + " IS NULL THEN NULL" + "".join(
+                " WHEN " + days_overdue + " < %(aging_limit_" + str(index) +
+                ")s THEN " + str(index)
+                for index in range(len(limits))) +
+            " ELSE " + str(len(limits)) + " END")
+
+    @api.model
+    def _get_aging_params(self, limits):
+        return dict(
+            ('aging_limit_%d' % index, limit)
+            for index, limit in enumerate(limits))
+
+    @api.model
+    def _compute_aging(self, query, params, key_columns, limits,
+                       prepared=False):
+        """ Return the amounts of the lines selected by `query` summed
+        per key and bucket, as {key: (total, amounts)}: `amounts` has the
+        sum of each bucket, None for the empty buckets, and the lines
+        without days overdue are only part of the total.
+
+        `query` selects the `key_columns`, days_overdue and amount. With
+        `prepared`, it is run as a prepared statement, see
+        account.financial.report.query.
+        """
+        key = ', '.join('l.' + column for column in key_columns)
+        # pylint: disable=sql-injection
+        query_aging = """
+SELECT
+    """ + key + """,
+    """ + self._get_bucket_sql('l.days_overdue', limits) + """ AS bucket,
+    SUM(l.amount) AS amount
+FROM
+    (""" + query + """) l
+GROUP BY
+    """ + key + """,
+    bucket
+        """
+        params = dict(params, **self._get_aging_params(limits))
+        if prepared:
+            self.env['account.financial.report.query']._execute(
+                query_aging, params)
+        else:
+            self.env.cr.execute(query_aging, params)
+        res = {}
+        for row in self.env.cr.fetchall():
+            bucket, amount = row[-2:]
+            values = res.setdefault(
+                row[:-2], [0.0, [None] * (len(limits) + 1)])
+            values[0] += amount or 0.0
+            if bucket is not None:
+                values[1][bucket] = amount
+        return dict((key, tuple(value)) for key, value in res.items())
@@ -0,0 +1,23 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+# Fields of the analytic accounts displayed by the reports
+REPORT_FIELDS = ('name', 'code')
+
+
+class AccountAnalyticAccount(models.Model):
+    _inherit = 'account.analytic.account'
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountAnalyticAccount, self).write(vals)
+        if any(f in vals for f in REPORT_FIELDS):
+            # Without company, an analytic account is shared
+            generation_model = self.env['account.ledger.generation']
+            if any(not account.company_id for account in self):
+                generation_model._bump_companies()
+            else:
+                generation_model._bump_companies(
+                    self.mapped('company_id').ids)
+        return res
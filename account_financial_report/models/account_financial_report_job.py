@@ -0,0 +1,370 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import base64
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo import api, fields, models, tools, _
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountFinancialReportJob(models.Model):
+    """ Report computed and rendered in background.
+
+    The wizards enqueue the report values instead of computing the report
+    inside the HTTP request. The scheduler then creates the report,
+    computes it, renders it and attaches the file to the job.
+
+    The state and the progress of the job are written in their own
+    transaction, so that the user can follow them while the report
+    is being computed.
+
+    A batch job renders one PDF per partner of the report values instead,
+    for the partner statements: the partners are rendered by chunks, and
+    the PDF of each partner is converted on a pool of threads.
+    """
+
+    _name = 'account.financial.report.job'
+    _description = 'Financial Report Job'
+    _order = 'id desc'
+
+    name = fields.Char(required=True, readonly=True)
+    user_id = fields.Many2one(
+        comodel_name='res.users',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+    )
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+        default=lambda self: self.env.user.company_id,
+    )
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        required=True,
+        readonly=True,
+        default='pending',
+        index=True,
+    )
+    report_model = fields.Char(required=True, readonly=True)
+    # JSON dump of the values of the report to create
+    report_values = fields.Text(required=True, readonly=True)
+    report_type = fields.Selection(
+        selection=[
+            ('qweb-pdf', 'PDF'),
+            ('xlsx', 'XLSX'),
+        ],
+        required=True,
+        readonly=True,
+    )
+    report_id = fields.Integer(readonly=True)
+    progress = fields.Float(readonly=True)
+    progress_step = fields.Char(readonly=True)
+    date_start = fields.Datetime(readonly=True)
+    date_done = fields.Datetime(readonly=True)
+    error = fields.Text(readonly=True)
+    attachment_id = fields.Many2one(
+        comodel_name='ir.attachment',
+        readonly=True,
+        ondelete='set null',
+    )
+    file = fields.Binary(related='attachment_id.datas', readonly=True)
+    filename = fields.Char(related='attachment_id.datas_fname', readonly=True)
+    batch = fields.Boolean(readonly=True)
+    batch_attachment_ids = fields.Many2many(
+        comodel_name='ir.attachment',
+        relation='account_financial_report_job_attachment_rel',
+        column1='job_id',
+        column2='attachment_id',
+        string='Partner Files',
+        readonly=True,
+    )
+
+    @api.model
+    def enqueue(self, name, report_model, report_values, report_type,
+                batch=False):
+        """ Create a job computing the report in background and return
+        the action displaying it.
+
+        With `batch`, `report_model` is the model of a QWeb report on
+        res.partner, rendered for each partner of `partner_ids` in
+        `report_values`. """
+        job = self.create({
+            'name': name,
+            'report_model': report_model,
+            'report_values': json.dumps(report_values),
+            'report_type': report_type,
+            'batch': batch,
+        })
+        action = self.env.ref(
+            'account_financial_report.action_account_financial_report_job')
+        vals = action.read()[0]
+        vals.update({
+            'res_id': job.id,
+            'view_mode': 'form',
+            'views': [(False, 'form')],
+        })
+        return vals
+
+    @api.multi
+    def button_retry(self):
+        """ Run the failed jobs again: a batch job resumes after the
+        partners already attached. """
+        self.filtered(lambda job: job.state == 'failed').sudo().write({
+            'state': 'pending',
+        })
+        return True
+
+    @api.model
+    def process_pending_jobs(self):
+        """ Run the pending jobs, called by the scheduler. """
+        jobs = self.search([('state', '=', 'pending')], order='id')
+        for job in jobs:
+            job._run()
+        return True
+
+    @api.multi
+    def _run(self):
+        """ Compute and render the report of the job, committed.
+
+        In tests, the job runs in a savepoint of the transaction of the
+        test instead, which is never committed. """
+        self.ensure_one()
+        self._write_in_new_cursor({
+            'state': 'running',
+            'date_start': fields.Datetime.now(),
+            'progress': 0.0,
+            'progress_step': False,
+            'error': False,
+        })
+        try:
+            if tools.config['test_enable']:
+                with self.env.cr.savepoint():
+                    vals = self._run_report()
+            else:
+                vals = self._run_report()
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        except Exception as e:
+            if not tools.config['test_enable']:
+                self.env.cr.rollback()
+            _logger.exception("Financial report job %s failed", self.id)
+            self._write_in_new_cursor({
+                'state': 'failed',
+                'date_done': fields.Datetime.now(),
+                'error': tools.ustr(e),
+            })
+            return
+        vals.update({
+            'state': 'done',
+            'date_done': fields.Datetime.now(),
+            'progress': 100.0,
+            'progress_step': False,
+        })
+        self._write_in_new_cursor(vals)
+
+    @api.multi
+    def _run_report(self):
+        """ Compute and render the report as the user of the job, and
+        return the values of the job to write. """
+        self.ensure_one()
+        env = self.env(user=self.user_id.id, context=dict(
+            self.env.context,
+            report_job_id=self.id,
+            lang=self.user_id.lang,
+            tz=self.user_id.tz,
+        ))
+        if self.batch:
+            self.with_env(env)._render_batch()
+            return {}
+        report = env[self.report_model]._create_and_compute(
+            json.loads(self.report_values))
+        self._write_in_new_cursor({'progress_step': _('Rendering')})
+        attachment = self._render_report(report)
+        return {
+            'report_id': report.id,
+            'attachment_id': attachment.id,
+        }
+
+    @api.multi
+    def _render_report(self, report):
+        """ Render the computed report and attach the file to the job. """
+        self.ensure_one()
+        action = report.print_report(self.report_type)
+        ir_report = self.env['ir.actions.report'].search(
+            [('report_name', '=', action['report_name']),
+             ('report_type', '=', self.report_type)], limit=1)
+        content, extension = ir_report.with_env(report.env).render(report.ids)
+        filename = '%s.%s' % (self.name, extension)
+        return self.env['ir.attachment'].create({
+            'name': filename,
+            'datas_fname': filename,
+            'datas': base64.b64encode(content),
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+
+    def _get_batch_param(self, name, default):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_financial_report.statement_' + name, default))
+
+    @api.multi
+    def _render_batch(self):
+        """ Render and attach the PDF of each partner of the report values.
+
+        The HTML of the partners is rendered by chunks, so that the report
+        reads the journal items of a whole chunk at once. The PDF of each
+        partner is converted by wkhtmltopdf on a pool of threads, while the
+        next chunk is rendered.
+
+        The files of each chunk are committed with the job: when the job
+        is run again after a failure, the partners already attached are
+        skipped.
+        """
+        self.ensure_one()
+        values = json.loads(self.report_values)
+        done_partner_ids = set(self.batch_attachment_ids.filtered(
+            lambda a: a.res_model == 'res.partner').mapped('res_id'))
+        partner_ids = [
+            partner_id for partner_id in values['partner_ids']
+            if partner_id not in done_partner_ids]
+        chunk_size = max(self._get_batch_param('chunk_size', 500), 1)
+        workers = max(self._get_batch_param('workers', 4), 1)
+        # The QWeb reports are named after their report model
+        ir_report = self.env['ir.actions.report'].search(
+            [('report_name', '=', self.report_model[len('report.'):]),
+             ('report_type', '=', self.report_type)], limit=1)
+        context = {'debug': False}
+        if not tools.config['test_enable']:
+            context['commit_assetsbundle'] = True
+        ir_report = ir_report.with_context(**context)
+        paperformat_values = self._get_batch_paperformat_values(ir_report)
+        chunks = [
+            partner_ids[index:index + chunk_size]
+            for index in range(0, len(partner_ids), chunk_size)
+        ]
+        futures = []
+        # The cursors of the threads of the pool, by thread
+        thread_cursors = {}
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for index, chunk in enumerate(chunks):
+                    self._set_progress(
+                        _('Partners %s to %s of %s') % (
+                            index * chunk_size + 1,
+                            index * chunk_size + len(chunk), len(partner_ids)),
+                        index, len(chunks))
+                    html = ir_report.render_qweb_html(chunk, data=dict(
+                        values, partner_ids=chunk, report_type='pdf',
+                        enable_editor=False))[0]
+                    bodies, html_ids, header, footer, paperformat_args = \
+                        ir_report._prepare_html(html.decode('utf-8'))
+                    # Attach the files of the previous chunk meanwhile
+                    self._attach_batch_files(futures)
+                    futures = [
+                        (partner_id, executor.submit(
+                            self._render_batch_pdf, thread_cursors,
+                            paperformat_values, body, header, footer,
+                            paperformat_args))
+                        for partner_id, body in zip(html_ids, bodies)
+                        if partner_id
+                    ]
+                self._attach_batch_files(futures)
+        finally:
+            for cr in thread_cursors.values():
+                cr.close()
+        return self.batch_attachment_ids
+
+    @api.model
+    def _get_batch_paperformat_values(self, ir_report):
+        """ Return the values of the paper format of `ir_report`, its own
+        or the one of the company of the user, read once for all the PDF
+        of the batch. """
+        # Without any, the paper format given by default to the companies
+        paperformat = ir_report.get_paperformat() or self.env.ref(
+            'base.paperformat_euro')
+        return dict(
+            (name, paperformat[name])
+            for name, field in paperformat._fields.items()
+            if field.store and field.type not in (
+                'many2one', 'one2many', 'many2many'))
+
+    def _render_batch_pdf(self, thread_cursors, paperformat_values, body,
+                          header, footer, paperformat_args):
+        """ Return the PDF of a partner.
+
+        Run in a thread of the pool, on a cursor of the thread opened once
+        for all its PDF and recorded in `thread_cursors`. The report and
+        its paper format are records in memory of an environment of the
+        thread, so that the conversion does not read the database. """
+        thread_id = threading.current_thread().ident
+        if thread_id not in thread_cursors:
+            thread_cursors[thread_id] = self.pool.cursor()
+        with api.Environment.manage():
+            env = api.Environment(
+                thread_cursors[thread_id], self.env.uid, self.env.context)
+            ir_report = env['ir.actions.report'].new({
+                'paperformat_id': env['report.paperformat'].new(
+                    paperformat_values),
+            })
+            return ir_report._run_wkhtmltopdf(
+                [body], header=header, footer=footer,
+                landscape=self.env.context.get('landscape'),
+                specific_paperformat_args=paperformat_args,
+                set_viewport_size=self.env.context.get('set_viewport_size'))
+
+    @api.multi
+    def _attach_batch_files(self, futures):
+        """ Attach the PDF of the (partner id, future) to their partner
+        and to the job, and commit them. """
+        self.ensure_one()
+        if not futures:
+            return
+        attachments = self.env['ir.attachment']
+        partners = self.env['res.partner'].browse(
+            [partner_id for partner_id, future in futures])
+        for partner, (partner_id, future) in zip(partners, futures):
+            filename = '%s - %s.pdf' % (self.name, partner.display_name)
+            attachments |= self.env['ir.attachment'].create({
+                'name': filename,
+                'datas_fname': filename,
+                'datas': base64.b64encode(future.result()),
+                'res_model': 'res.partner',
+                'res_id': partner.id,
+            })
+        self.sudo().write({
+            'batch_attachment_ids': [(4, attachment.id)
+                                     for attachment in attachments],
+        })
+        if not tools.config['test_enable']:
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    @api.multi
+    def _set_progress(self, step, done, total):
+        """ Record that `done` out of `total` steps are completed and
+        that `step` is running. """
+        self._write_in_new_cursor({
+            'progress': 100.0 * done / total if total else 0.0,
+            'progress_step': step,
+        })
+
+    @api.multi
+    def _write_in_new_cursor(self, vals):
+        """ Write the job in its own transaction, committed at once.
+
+        In tests, the job is written in the transaction of the test. """
+        if tools.config['test_enable']:
+            self.sudo().write(vals)
+            return
+        with api.Environment.manage():
+            with self.pool.cursor() as cr:
+                self.with_env(self.env(cr=cr)).sudo().write(vals)
+        self.invalidate_cache()
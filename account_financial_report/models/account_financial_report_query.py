@@ -0,0 +1,52 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import hashlib
+import re
+
+from odoo import api, models
+
+PLACEHOLDER = re.compile(r'%\((\w+)\)s')
+
+
+class AccountFinancialReportQuery(models.AbstractModel):
+    """ Queries run as prepared statements.
+
+    psycopg2 sends a query with its parameters inlined, so PostgreSQL
+    parses and plans each run of a report query from scratch. Run as a
+    prepared statement, the query is parsed once per database connection,
+    and PostgreSQL can reuse its plan for the next runs, e.g. for the next
+    chunks of partners of a batch of statements.
+    """
+
+    _name = 'account.financial.report.query'
+    _description = 'Financial Report Prepared Query'
+
+    @api.model
+    def _execute(self, query, params):
+        """ Execute `query`, with %(name)s placeholders, as a prepared
+        statement with the `params` dict.
+
+        The statement is named after its text, it is prepared on the first
+        run on the database connection. The parameters are typed by
+        PostgreSQL from the query: cast them where their type is ambiguous.
+        """
+        names = []
+
+        def replace(match):
+            if match.group(1) not in names:
+                names.append(match.group(1))
+            return '$%d' % (names.index(match.group(1)) + 1)
+        statement = PLACEHOLDER.sub(replace, query).replace('%%', '%')
+        name = 'afr_' + hashlib.md5(statement.encode('utf-8')).hexdigest()
+        self.env.cr.execute(
+            "SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+        if not self.env.cr.fetchone():
+            # pylint: disable=sql-injection
+            self.env.cr.execute("PREPARE " + name + " AS " + statement)
+        if names:
+            # pylint: disable=sql-injection
+            self.env.cr.execute(
+                "EXECUTE " + name + " (" + ", ".join(["%s"] * len(names)) +
+                ")", [params[key] for key in names])
+        else:
+            self.env.cr.execute("EXECUTE " + name)
@@ -0,0 +1,122 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+
+import psycopg2
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+UNLOGGED_PARAM = 'account_financial_report.unlogged_report_tables'
+
+
+class AccountFinancialReportStorage(models.AbstractModel):
+    """ Storage of the tables of the reports.
+
+    The lines of the reports are throwaway rows: they are inserted by
+    millions when a report is computed, and deleted by the transient
+    vacuum a few hours later. With the system parameter
+    account_financial_report.unlogged_report_tables set, the report
+    tables are UNLOGGED: their rows are written without WAL, so they are
+    neither replicated nor kept after a crash of the database server.
+
+    Altering a table locks it: the storage is applied at the update of
+    the module, or by the server action of the module, not at each start
+    of the server.
+    """
+
+    _name = 'account.financial.report.storage'
+    _description = 'Financial Report Storage'
+
+    @api.model
+    def _get_report_tables(self):
+        """ Return the tables of the transient report models of the
+        module, with the tables of their many2many fields. """
+        tables = set()
+        for model in self.env.values():
+            if not (model._transient and model._name.startswith('report_')
+                    and model._module == 'account_financial_report'):
+                continue
+            tables.add(model._table)
+            for field in model._fields.values():
+                if field.type == 'many2many' and field.store:
+                    tables.add(field.relation)
+        return tables
+
+    @api.model
+    def _sort_report_tables(self, tables):
+        """ Return the `tables` sorted so that each table comes after the
+        tables referencing it. """
+        self.env.cr.execute("""
+            SELECT conrelid::regclass::text, confrelid::regclass::text
+            FROM pg_constraint
+            WHERE contype = 'f'
+            AND conrelid <> confrelid
+            AND conrelid::regclass::text IN %(tables)s
+            AND confrelid::regclass::text IN %(tables)s
+        """, {'tables': tuple(tables)})
+        references = {}
+        for table, referenced_table in self.env.cr.fetchall():
+            references.setdefault(referenced_table, set()).add(table)
+        res = []
+        visited = set()
+
+        def visit(table):
+            if table in visited:
+                return
+            visited.add(table)
+            for referencing_table in sorted(references.get(table, ())):
+                visit(referencing_table)
+            res.append(table)
+        for table in sorted(tables):
+            visit(table)
+        return res
+
+    @api.model
+    def _apply_report_tables_storage(self):
+        """ Make the report tables UNLOGGED or LOGGED, as set by the system
+        parameter, when they are not yet. """
+        # SET UNLOGGED and SET LOGGED need PostgreSQL 9.5
+        if self.env.cr._cnx.server_version < 90500:
+            _logger.info(
+                "The storage of the report tables can not be changed "
+                "before PostgreSQL 9.5")
+            return
+        unlogged = bool(self.env['ir.config_parameter'].sudo().get_param(
+            UNLOGGED_PARAM))
+        tables = self._get_report_tables()
+        self.env.cr.execute("""
+            SELECT relname
+            FROM pg_class
+            WHERE relkind = 'r'
+            AND relname IN %(tables)s
+            AND relpersistence = %(persistence)s
+        """, {
+            'tables': tuple(tables),
+            'persistence': 'p' if unlogged else 'u',
+        })
+        to_alter = set(row[0] for row in self.env.cr.fetchall())
+        if not to_alter:
+            return
+        # A logged table can not reference an unlogged table: the
+        # referencing tables are unlogged first, and logged last
+        ordered_tables = self._sort_report_tables(tables)
+        if not unlogged:
+            ordered_tables.reverse()
+        for table in ordered_tables:
+            if table not in to_alter:
+                continue
+            _logger.info(
+                "Set table %s %s", table,
+                'UNLOGGED' if unlogged else 'LOGGED')
+            try:
+                with self.env.cr.savepoint():
+                    # pylint: disable=sql-injection
+                    self.env.cr.execute(
+                        'ALTER TABLE "' + table + '" SET ' +
+                        ('UNLOGGED' if unlogged else 'LOGGED'))
+            except psycopg2.Error as error:
+                # E.g. a logged table of another module references it
+                _logger.warning(
+                    "Table %s left as is: %s", table, error)
@@ -19,10 +19,76 @@ class AccountGroup(models.Model):
         comodel_name='account.account',
         inverse_name='group_id',
         string="Accounts")
+    # Accounts with a code starting with the code prefix of the group
+    # (or its name without code prefix), maintained by
+    # `_refresh_group_accounts` and `_refresh_account_groups`
     compute_account_ids = fields.Many2many(
         'account.account',
-        compute='_compute_group_accounts',
-        string="Accounts", store=True)
+        relation='account_account_account_group_rel',
+        column1='account_group_id',
+        column2='account_account_id',
+        string="Accounts",
+        readonly=True)
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountGroup, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_account_code_pattern_idx'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE INDEX account_account_code_pattern_idx
+                ON account_account (code text_pattern_ops)
+            """)
+            self._refresh_account_groups()
+        return res
+
+    @api.model
+    def create(self, vals):
+        group = super(AccountGroup, self).create(vals)
+        group._refresh_group_accounts()
+        closure_model = self.env['account.group.closure']
+        closure_model._refresh_accounts(
+            closure_model._get_group_account_ids(group.ids))
+        # The groups have no company, they are read by all the companies
+        self.env['account.ledger.generation']._bump_companies()
+        return group
+
+    @api.multi
+    def write(self, vals):
+        # Only the closure of the accounts of the groups, before and
+        # after the change, is refreshed
+        closure_model = self.env['account.group.closure']
+        to_refresh = 'parent_id' in vals or 'code_prefix' in vals
+        if to_refresh:
+            account_ids = closure_model._get_group_account_ids(self.ids)
+        res = super(AccountGroup, self).write(vals)
+        if 'code_prefix' in vals or 'name' in vals:
+            self._refresh_group_accounts()
+        if to_refresh:
+            closure_model._refresh_accounts(
+                account_ids + closure_model._get_group_account_ids(self.ids))
+        self.env['account.ledger.generation']._bump_companies()
+        return res
+
+    @api.multi
+    def unlink(self):
+        closure_model = self.env['account.group.closure']
+        account_ids = closure_model._get_group_account_ids(self.ids)
+        res = super(AccountGroup, self).unlink()
+        closure_model._refresh_accounts(account_ids)
+        self.env['account.ledger.generation']._bump_companies()
+        return res
+
+    @api.model
+    def _get_code_pattern_sql(self, prefix):
+        """ Return the SQL expression of the LIKE pattern matching the
+        codes starting with the `prefix` SQL expression. """
+        return (
+            "REPLACE(REPLACE(REPLACE(" + prefix + ", '\\', '\\\\'), "
+            "'%%', '\\%%'), '_', '\\_') || '%%'")
 
     @api.multi
     @api.depends('parent_id')
@@ -36,13 +102,65 @@ class AccountGroup(models.Model):
             group.level = level
 
     @api.multi
-    @api.depends('code_prefix', 'account_ids', 'account_ids.code',
-                 'group_child_ids', 'group_child_ids.account_ids.code')
-    def _compute_group_accounts(self):
-        account_obj = self.env['account.account']
-        accounts = account_obj.search([])
-        for group in self:
-            prefix = group.code_prefix if group.code_prefix else group.name
-            gr_acc = accounts.filtered(
-                lambda a: a.code.startswith(prefix)).ids
-            group.compute_account_ids = [(6, 0, gr_acc)]
+    def _refresh_group_accounts(self):
+        """ Recompute the accounts of the groups, matching the codes of the
+        accounts on the prefix of each group in a single query. """
+        if not self:
+            return
+        self.env.cr.execute("""
+            DELETE FROM account_account_account_group_rel
+            WHERE account_group_id IN %s
+        """, (tuple(self.ids),))
+        pattern = self._get_code_pattern_sql(
+            "COALESCE(NULLIF(g.code_prefix, ''), g.name)")
+        # pylint: disable=sql-injection
+        self.env.cr.execute("""
+            INSERT INTO account_account_account_group_rel
+                (account_group_id, account_account_id)
+            SELECT g.id, acc.id
+            FROM account_group g
+            INNER JOIN account_account acc ON acc.code LIKE """ + pattern + """
+            WHERE g.id IN %s
+        """, (tuple(self.ids),))
+        self.invalidate_cache(['compute_account_ids'], self.ids)
+
+    @api.model
+    def _refresh_account_groups(self, account_ids=None):
+        """ Recompute the groups of the given accounts, or of all the
+        accounts, matching every prefix of their code on the groups. """
+        where = "TRUE"
+        params = {}
+        if account_ids is not None:
+            if not account_ids:
+                return
+            where = "acc.id IN %(account_ids)s"
+            params['account_ids'] = tuple(account_ids)
+        # pylint: disable=sql-injection
+        self.env.cr.execute("""
+            DELETE FROM account_account_account_group_rel acc_rel
+            USING account_account acc
+            WHERE acc_rel.account_account_id = acc.id
+            AND """ + where, params)
+        self.env.cr.execute("""
+            INSERT INTO account_account_account_group_rel
+                (account_group_id, account_account_id)
+            SELECT DISTINCT
+                g.id,
+                acc.id
+            FROM
+                (
+                    SELECT
+                        acc.id,
+                        LEFT(acc.code, GENERATE_SERIES(1, LENGTH(acc.code)))
+                            AS prefix
+                    FROM
+                        account_account acc
+                    WHERE
+                        """ + where + """
+                ) acc
+            INNER JOIN
+                account_group g
+                    ON COALESCE(NULLIF(g.code_prefix, ''), g.name) =
+                        acc.prefix
+            """, params)
+        self.invalidate_cache(['compute_account_ids'])
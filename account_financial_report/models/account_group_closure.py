@@ -0,0 +1,169 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class AccountGroupClosure(models.Model):
+    """ Accounts of each account group and of its descendant groups.
+
+    Two hierarchies are stored:
+
+    * relation: the account belongs to the group or to one of its
+      descendant groups, through account.account group_id and
+      account.group parent_id;
+    * computed: the account code starts with the code prefix of the group.
+
+    The Trial Balance rolls its account values up to the groups with a
+    single join on this table. The rows of an account are refreshed when
+    its code or its group change, or when the groups of its closure
+    change.
+    """
+
+    _name = 'account.group.closure'
+    _description = 'Account Group Closure'
+    _log_access = False
+
+    hierarchy = fields.Selection(
+        selection=[
+            ('relation', 'Child Accounts'),
+            ('computed', 'Computed Accounts'),
+        ],
+        readonly=True,
+    )
+    ancestor_id = fields.Many2one(
+        comodel_name='account.group',
+        readonly=True,
+        ondelete='cascade',
+        index=True,
+    )
+    descendant_id = fields.Many2one(
+        comodel_name='account.group',
+        readonly=True,
+        ondelete='cascade',
+    )
+    account_id = fields.Many2one(
+        comodel_name='account.account',
+        readonly=True,
+        ondelete='cascade',
+    )
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountGroupClosure, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_group_closure_account_hierarchy_idx'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE INDEX account_group_closure_account_hierarchy_idx
+                ON account_group_closure (account_id, hierarchy, ancestor_id)
+            """)
+        self._cr.execute("SELECT 1 FROM account_group_closure LIMIT 1")
+        if not self._cr.fetchone():
+            self._rebuild_closure()
+        return res
+
+    def _get_insert_closure_query(self, where):
+        """ Return the query inserting the closure rows of the accounts
+        matching `where`, a condition on account_account acc. """
+        # pylint: disable=sql-injection
+        return """
+WITH RECURSIVE
+    ancestors AS
+        (
+            SELECT
+                g.id AS group_id,
+                g.id AS ancestor_id
+            FROM
+                account_group g
+            UNION ALL
+            SELECT
+                an.group_id,
+                g.parent_id
+            FROM
+                ancestors an
+            INNER JOIN
+                account_group g ON g.id = an.ancestor_id
+            WHERE
+                g.parent_id IS NOT NULL
+        )
+INSERT INTO
+    account_group_closure
+    (
+    hierarchy,
+    ancestor_id,
+    descendant_id,
+    account_id
+    )
+SELECT
+    'relation',
+    an.ancestor_id,
+    an.group_id,
+    acc.id
+FROM
+    account_account acc
+INNER JOIN
+    ancestors an ON an.group_id = acc.group_id
+WHERE
+    """ + where + """
+UNION ALL
+SELECT
+    'computed',
+    g.id,
+    acc.group_id,
+    acc.id
+FROM
+    (
+        SELECT
+            acc.id,
+            acc.group_id,
+            LEFT(acc.code, GENERATE_SERIES(1, LENGTH(acc.code))) AS prefix
+        FROM
+            account_account acc
+        WHERE
+            """ + where + """
+    ) acc
+INNER JOIN
+    account_group g ON g.code_prefix = acc.prefix
+        """
+
+    @api.model
+    def _rebuild_closure(self):
+        """ Recompute the closure of all the accounts. """
+        self.env.cr.execute("DELETE FROM account_group_closure")
+        self.env.cr.execute(self._get_insert_closure_query("TRUE"))
+
+    @api.model
+    def _get_group_account_ids(self, group_ids):
+        """ Return the accounts of the closure of the given groups, with
+        the accounts matching their code prefix: the accounts whose
+        closure changes with the groups. """
+        if not group_ids:
+            return []
+        pattern = self.env['account.group']._get_code_pattern_sql(
+            'g.code_prefix')
+        # pylint: disable=sql-injection
+        self.env.cr.execute("""
+            SELECT account_id
+            FROM account_group_closure
+            WHERE ancestor_id IN %(ids)s OR descendant_id IN %(ids)s
+            UNION
+            SELECT acc.id
+            FROM account_group g
+            INNER JOIN account_account acc ON acc.code LIKE """ + pattern + """
+            WHERE g.id IN %(ids)s
+        """, {'ids': tuple(group_ids)})
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _refresh_accounts(self, account_ids):
+        """ Recompute the closure of the given accounts. """
+        if not account_ids:
+            return
+        self.env.cr.execute(
+            "DELETE FROM account_group_closure WHERE account_id IN %(ids)s",
+            {'ids': tuple(account_ids)})
+        self.env.cr.execute(
+            self._get_insert_closure_query("acc.id IN %(ids)s"),
+            {'ids': tuple(account_ids)})
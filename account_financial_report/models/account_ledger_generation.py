@@ -0,0 +1,115 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import hashlib
+
+from odoo import api, fields, models
+
+# Period of the changes of the master data: before all the periods, so
+# that they change the generation of the ledger at all dates
+MASTER_DATA_PERIOD = '1900-01-01'
+
+
+class AccountLedgerGeneration(models.Model):
+    """ Changes of the journal items per company and month.
+
+    A row is appended each time journal items are created, changed,
+    deleted, posted or reconciled, and each time the accounts or the
+    account groups change. The rows of a company up to a date
+    give the generation of its ledger at this date, which is part of
+    the key of the cached reports.
+
+    Append only, so that posting journal items does not lock shared rows.
+    """
+
+    _name = 'account.ledger.generation'
+    _description = 'Account Ledger Generation'
+    _log_access = False
+
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+    )
+    # First day of the month
+    period = fields.Date(readonly=True)
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountLedgerGeneration, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_ledger_generation_company_period_idx'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE INDEX account_ledger_generation_company_period_idx
+                ON account_ledger_generation (company_id, period, id)
+            """)
+        return res
+
+    @api.model
+    def _bump_move_lines(self, move_line_ids):
+        """ Record a change of the given journal items. """
+        if not move_line_ids:
+            return
+        self.env.cr.execute("""
+            INSERT INTO account_ledger_generation (company_id, period)
+            SELECT DISTINCT
+                ml.company_id,
+                DATE_TRUNC('month', ml.date)::date
+            FROM account_move_line ml
+            WHERE ml.id IN %s
+        """, (tuple(move_line_ids),))
+
+    @api.model
+    def _bump_companies(self, company_ids=None):
+        """ Record a change of the master data of the given companies,
+        or of all the companies, e.g. their accounts or the account
+        groups, read by the reports at all dates. """
+        where = "TRUE"
+        params = {'period': MASTER_DATA_PERIOD}
+        if company_ids is not None:
+            if not company_ids:
+                return
+            where = "id IN %(company_ids)s"
+            params['company_ids'] = tuple(company_ids)
+        # pylint: disable=sql-injection
+        self.env.cr.execute("""
+            INSERT INTO account_ledger_generation (company_id, period)
+            SELECT id, %(period)s
+            FROM res_company
+            WHERE """ + where, params)
+
+    @api.model
+    def _get_generation(self, company_id, date):
+        """ Return the generation of the ledger of a company up to a date.
+
+        Given by the last id and the number of the changes of each period:
+        sequence values are not ordered by commit, a change committed late
+        may have a lower id than the last one. The compaction only changes
+        the generation of the periods changed since the former one.
+        """
+        self.env.cr.execute("""
+            SELECT period, MAX(id), COUNT(*)
+            FROM account_ledger_generation
+            WHERE company_id = %s AND period <= %s
+            GROUP BY period
+            ORDER BY period
+        """, (company_id, date))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return ''
+        return hashlib.md5(','.join(
+            '%s:%s:%s' % row for row in rows).encode('utf-8')).hexdigest()
+
+    @api.model
+    def compact_generations(self):
+        """ Only keep the last change of each company and month,
+        called by the scheduler. """
+        self.env.cr.execute("""
+            DELETE FROM account_ledger_generation g
+            USING account_ledger_generation last
+            WHERE last.company_id = g.company_id
+            AND last.period = g.period
+            AND last.id > g.id
+        """)
+        return True
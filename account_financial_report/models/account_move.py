@@ -0,0 +1,40 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+# Fields of the moves read by the reports
+REPORT_FIELDS = ('state', 'date', 'name', 'ref', 'journal_id')
+
+
+class AccountMove(models.Model):
+    _inherit = 'account.move'
+
+    @api.multi
+    def write(self, vals):
+        # The state and the date of the journal items are read on the move,
+        # they are not written through account.move.line
+        queue_model = self.env['account.period.balance.queue']
+        generation_model = self.env['account.ledger.generation']
+        to_enqueue = 'state' in vals or 'date' in vals
+        if to_enqueue:
+            queue_model._enqueue_move_lines(self.mapped('line_ids').ids)
+            generation_model._bump_move_lines(self.mapped('line_ids').ids)
+        res = super(AccountMove, self).write(vals)
+        if to_enqueue:
+            queue_model._enqueue_move_lines(self.mapped('line_ids').ids)
+        # The reports also display the name and reference of the moves
+        if any(f in vals for f in REPORT_FIELDS):
+            generation_model._bump_move_lines(self.mapped('line_ids').ids)
+        if 'date' in vals:
+            self.env['account.partial.reconcile.date']._refresh_move_lines(
+                self.mapped('line_ids').ids)
+        return res
+
+    @api.multi
+    def button_cancel(self):
+        res = super(AccountMove, self).button_cancel()
+        self.env['account.period.balance.queue']._enqueue_move_lines(
+            self.mapped('line_ids').ids)
+        self.env['account.ledger.generation']._bump_move_lines(
+            self.mapped('line_ids').ids)
+        return res
@@ -0,0 +1,56 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+# Fields changing the amounts aggregated in account.period.balance
+PERIOD_BALANCE_FIELDS = (
+    'account_id', 'partner_id', 'date', 'move_id',
+    'debit', 'credit', 'balance', 'amount_currency',
+)
+
+# Fields of the journal items read by the reports
+REPORT_FIELDS = PERIOD_BALANCE_FIELDS + (
+    'company_id', 'journal_id', 'currency_id', 'name', 'ref',
+    'date_maturity', 'analytic_account_id', 'tax_ids', 'tax_line_id',
+    'full_reconcile_id', 'reconciled', 'amount_residual',
+    'amount_residual_currency',
+)
+
+
+class AccountMoveLine(models.Model):
+    _inherit = 'account.move.line'
+
+    @api.model
+    def create(self, vals, apply_taxes=True):
+        line = super(AccountMoveLine, self).create(
+            vals, apply_taxes=apply_taxes)
+        self.env['account.period.balance.queue']._enqueue_move_lines(
+            line.ids)
+        self.env['account.ledger.generation']._bump_move_lines(line.ids)
+        return line
+
+    @api.multi
+    def write(self, vals, update_check=True):
+        queue_model = self.env['account.period.balance.queue']
+        generation_model = self.env['account.ledger.generation']
+        to_enqueue = any(f in vals for f in PERIOD_BALANCE_FIELDS)
+        if to_enqueue:
+            queue_model._enqueue_move_lines(self.ids)
+            generation_model._bump_move_lines(self.ids)
+        res = super(AccountMoveLine, self).write(
+            vals, update_check=update_check)
+        if to_enqueue:
+            queue_model._enqueue_move_lines(self.ids)
+        if any(f in vals for f in REPORT_FIELDS):
+            generation_model._bump_move_lines(self.ids)
+        if 'date' in vals:
+            self.env['account.partial.reconcile.date']._refresh_move_lines(
+                self.ids)
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['account.period.balance.queue']._enqueue_move_lines(
+            self.ids)
+        self.env['account.ledger.generation']._bump_move_lines(self.ids)
+        return super(AccountMoveLine, self).unlink()
@@ -0,0 +1,36 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = 'account.partial.reconcile'
+
+    def _get_reconciled_move_line_ids(self):
+        return (self.mapped('debit_move_id') |
+                self.mapped('credit_move_id')).ids
+
+    @api.model
+    def create(self, vals):
+        partial = super(AccountPartialReconcile, self).create(vals)
+        self.env['account.ledger.generation']._bump_move_lines(
+            partial._get_reconciled_move_line_ids())
+        self.env['account.partial.reconcile.date']._refresh_partials(
+            partial.ids)
+        return partial
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountPartialReconcile, self).write(vals)
+        if any(f in vals for f in (
+                'debit_move_id', 'credit_move_id',
+                'amount', 'amount_currency')):
+            self.env['account.partial.reconcile.date']._refresh_partials(
+                self.ids)
+        return res
+
+    @api.multi
+    def unlink(self):
+        self.env['account.ledger.generation']._bump_move_lines(
+            self._get_reconciled_move_line_ids())
+        return super(AccountPartialReconcile, self).unlink()
@@ -0,0 +1,128 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class AccountPartialReconcileDate(models.Model):
+    """ Partial reconciliations of each journal item with the date
+    of the counterpart journal item.
+
+    A partial reconciliation gives two rows: one for its debit journal
+    item, one for its credit journal item. The Open Items report sums
+    the amounts reconciled with a counterpart dated up to the report date
+    with a single range lookup per journal item, instead of joining
+    account_partial_reconcile and account_move_line twice.
+
+    The rows of a partial reconciliation are written when it is created,
+    and refreshed when the date of its journal items changes. They are
+    deleted with the partial reconciliation or the journal items.
+    """
+
+    _name = 'account.partial.reconcile.date'
+    _description = 'Partial Reconciliation with Counterpart Date'
+    _log_access = False
+
+    partial_id = fields.Many2one(
+        comodel_name='account.partial.reconcile',
+        readonly=True,
+        ondelete='cascade',
+        index=True,
+    )
+    move_line_id = fields.Many2one(
+        comodel_name='account.move.line',
+        readonly=True,
+        ondelete='cascade',
+    )
+    # The journal item is the debit journal item of the reconciliation
+    debit_move = fields.Boolean(readonly=True)
+    counterpart_date = fields.Date(readonly=True)
+    amount = fields.Float(digits=(16, 2), readonly=True)
+    amount_currency = fields.Float(digits=(16, 2), readonly=True)
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountPartialReconcileDate, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_partial_reconcile_date_move_line_idx'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE INDEX account_partial_reconcile_date_move_line_idx
+                ON account_partial_reconcile_date
+                (move_line_id, debit_move, counterpart_date)
+            """)
+        self._cr.execute(
+            "SELECT 1 FROM account_partial_reconcile_date LIMIT 1")
+        if not self._cr.fetchone():
+            self._cr.execute(self._get_insert_query("TRUE"))
+        return res
+
+    def _get_insert_query(self, where):
+        """ Return the query inserting the rows of the partial
+        reconciliations matching `where`, a condition on
+        account_partial_reconcile pr. """
+        # pylint: disable=sql-injection
+        return """
+INSERT INTO
+    account_partial_reconcile_date
+    (
+    partial_id,
+    move_line_id,
+    debit_move,
+    counterpart_date,
+    amount,
+    amount_currency
+    )
+SELECT
+    pr.id,
+    pr.debit_move_id,
+    TRUE,
+    ml.date,
+    pr.amount,
+    pr.amount_currency
+FROM
+    account_partial_reconcile pr
+INNER JOIN
+    account_move_line ml ON ml.id = pr.credit_move_id
+WHERE
+    """ + where + """
+UNION ALL
+SELECT
+    pr.id,
+    pr.credit_move_id,
+    FALSE,
+    ml.date,
+    pr.amount,
+    pr.amount_currency
+FROM
+    account_partial_reconcile pr
+INNER JOIN
+    account_move_line ml ON ml.id = pr.debit_move_id
+WHERE
+    """ + where
+
+    @api.model
+    def _refresh_partials(self, partial_ids):
+        """ Recompute the rows of the given partial reconciliations. """
+        if not partial_ids:
+            return
+        self.env.cr.execute(
+            "DELETE FROM account_partial_reconcile_date "
+            "WHERE partial_id IN %(ids)s",
+            {'ids': tuple(partial_ids)})
+        self.env.cr.execute(
+            self._get_insert_query("pr.id IN %(ids)s"),
+            {'ids': tuple(partial_ids)})
+
+    @api.model
+    def _refresh_move_lines(self, move_line_ids):
+        """ Recompute the rows of the partial reconciliations
+        of the given journal items. """
+        if not move_line_ids:
+            return
+        self.env.cr.execute("""
+            SELECT id FROM account_partial_reconcile
+            WHERE debit_move_id IN %(ids)s OR credit_move_id IN %(ids)s
+        """, {'ids': tuple(move_line_ids)})
+        self._refresh_partials([row[0] for row in self.env.cr.fetchall()])
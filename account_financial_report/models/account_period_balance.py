@@ -0,0 +1,242 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountPeriodBalance(models.Model):
+    """ Balance of the journal items per company, account, partner,
+    month and posted state.
+
+    The General Ledger reads the initial balances from this table instead
+    of scanning every journal item since the beginning of time.
+
+    The periods touched by created, changed or deleted journal items are
+    queued in account_period_balance_queue and recomputed by
+    `refresh_period_balances`. As long as a period before the report start
+    date is queued, the snapshot is stale and the reports fall back
+    on the journal items.
+    """
+
+    _name = 'account.period.balance'
+    _description = 'Account Period Balance'
+    _log_access = False
+    _order = 'period, account_id'
+
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+    )
+    account_id = fields.Many2one(
+        comodel_name='account.account',
+        readonly=True,
+        ondelete='cascade',
+    )
+    partner_id = fields.Many2one(
+        comodel_name='res.partner',
+        readonly=True,
+    )
+    # First day of the month
+    period = fields.Date(readonly=True)
+    posted = fields.Boolean(readonly=True)
+    debit = fields.Float(digits=(16, 2), readonly=True)
+    credit = fields.Float(digits=(16, 2), readonly=True)
+    balance = fields.Float(digits=(16, 2), readonly=True)
+    amount_currency = fields.Float(digits=(16, 2), readonly=True)
+
+    @api.model_cr
+    def init(self):
+        res = super(AccountPeriodBalance, self).init()
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_period_balance_account_period_idx'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE INDEX account_period_balance_account_period_idx
+                ON account_period_balance (account_id, period, partner_id)
+            """)
+        return res
+
+    def _get_insert_period_balance_query(self):
+        """ Return the query aggregating the journal items
+        into account_period_balance. """
+        return """
+INSERT INTO
+    account_period_balance
+    (
+    company_id,
+    account_id,
+    partner_id,
+    period,
+    posted,
+    debit,
+    credit,
+    balance,
+    amount_currency
+    )
+SELECT
+    ml.company_id,
+    ml.account_id,
+    ml.partner_id,
+    DATE_TRUNC('month', ml.date)::date AS period,
+    m.state = 'posted' AS posted,
+    SUM(ml.debit) AS debit,
+    SUM(ml.credit) AS credit,
+    SUM(ml.balance) AS balance,
+    SUM(COALESCE(ml.amount_currency, 0.0)) AS amount_currency
+FROM
+    account_move_line ml
+INNER JOIN
+    account_move m ON ml.move_id = m.id
+        """
+
+    def _get_insert_period_balance_group_by(self):
+        return """
+GROUP BY
+    ml.company_id,
+    ml.account_id,
+    ml.partner_id,
+    4,
+    5
+        """
+
+    @api.model
+    def _rebuild_period_balances(self, company):
+        """ Recompute the whole snapshot of a company. """
+        _logger.info(
+            "Rebuilding account period balances of company %s", company.name)
+        self.env.cr.execute(
+            "DELETE FROM account_period_balance_queue WHERE company_id = %s",
+            (company.id,))
+        self.env.cr.execute(
+            "DELETE FROM account_period_balance WHERE company_id = %s",
+            (company.id,))
+        query_insert = self._get_insert_period_balance_query()
+        query_insert += """
+WHERE
+    ml.company_id = %s
+        """
+        query_insert += self._get_insert_period_balance_group_by()
+        self.env.cr.execute(query_insert, (company.id,))
+        company.period_balance_date = fields.Datetime.now()
+
+    @api.model
+    def _refresh_queued_period_balances(self, company):
+        """ Recompute the queued periods of a company. """
+        # pylint: disable=sql-injection
+        query_refresh = """
+WITH
+    queued AS
+        (
+            DELETE FROM
+                account_period_balance_queue
+            WHERE
+                company_id = %s
+            RETURNING
+                account_id, period
+        ),
+    periods AS
+        (
+            SELECT DISTINCT
+                account_id,
+                period
+            FROM
+                queued
+        ),
+    deleted AS
+        (
+            DELETE FROM
+                account_period_balance pb
+            USING
+                periods p
+            WHERE
+                pb.account_id = p.account_id
+            AND pb.period = p.period
+        )
+        """
+        query_refresh += self._get_insert_period_balance_query()
+        query_refresh += """
+INNER JOIN
+    periods p
+        ON
+            ml.account_id = p.account_id
+            AND ml.date >= p.period
+            AND ml.date < p.period + INTERVAL '1 month'
+        """
+        query_refresh += self._get_insert_period_balance_group_by()
+        self.env.cr.execute(query_refresh, (company.id,))
+
+    @api.model
+    def refresh_period_balances(self, company_ids=None):
+        """ Bring the snapshot up to date, called by the scheduler.
+
+        Companies without snapshot are fully computed,
+        the others only get their queued periods recomputed.
+        """
+        companies = self.env['res.company'].browse(company_ids) \
+            if company_ids else self.env['res.company'].search([])
+        for company in companies:
+            if not company.period_balance_date:
+                self._rebuild_period_balances(company)
+            else:
+                self._refresh_queued_period_balances(company)
+        return True
+
+    @api.model
+    def _is_up_to_date(self, company, date):
+        """ Return True if the periods before `date` (first day of a month)
+        can be read from the snapshot. """
+        if not company.period_balance_date:
+            return False
+        self.env.cr.execute("""
+            SELECT 1
+            FROM account_period_balance_queue
+            WHERE company_id = %s AND period < %s
+            LIMIT 1
+        """, (company.id, date))
+        return not self.env.cr.fetchone()
+
+
+class AccountPeriodBalanceQueue(models.Model):
+    """ Periods of account_period_balance to recompute.
+
+    Append only, so that posting journal items does not lock
+    the snapshot rows.
+    """
+
+    _name = 'account.period.balance.queue'
+    _description = 'Account Period Balance Queue'
+    _log_access = False
+
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        readonly=True,
+        index=True,
+    )
+    account_id = fields.Many2one(
+        comodel_name='account.account',
+        readonly=True,
+        ondelete='cascade',
+    )
+    # First day of the month
+    period = fields.Date(readonly=True)
+
+    @api.model
+    def _enqueue_move_lines(self, move_line_ids):
+        """ Queue the periods of the given journal items. """
+        if not move_line_ids:
+            return
+        self.env.cr.execute("""
+            INSERT INTO account_period_balance_queue
+                (company_id, account_id, period)
+            SELECT DISTINCT
+                ml.company_id,
+                ml.account_id,
+                DATE_TRUNC('month', ml.date)::date
+            FROM account_move_line ml
+            WHERE ml.id IN %s
+        """, (tuple(move_line_ids),))
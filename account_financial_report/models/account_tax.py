@@ -0,0 +1,18 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+# Fields of the taxes displayed by the reports
+REPORT_FIELDS = ('name', 'description')
+
+
+class AccountTax(models.Model):
+    _inherit = 'account.tax'
+
+    @api.multi
+    def write(self, vals):
+        res = super(AccountTax, self).write(vals)
+        if any(f in vals for f in REPORT_FIELDS):
+            self.env['account.ledger.generation']._bump_companies(
+                self.mapped('company_id').ids)
+        return res
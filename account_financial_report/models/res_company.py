@@ -0,0 +1,14 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import fields, models
+
+
+class ResCompany(models.Model):
+    _inherit = 'res.company'
+
+    period_balance_date = fields.Datetime(
+        string='Period Balances Built On',
+        readonly=True,
+        copy=False,
+        help="Date of the last full computation of the account period "
+             "balances used by the General Ledger initial balances.")
@@ -0,0 +1,18 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, models
+
+# Fields of the partners displayed by the reports
+REPORT_FIELDS = ('name', 'ref', 'parent_id')
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    @api.multi
+    def write(self, vals):
+        res = super(ResPartner, self).write(vals)
+        # The partners are shared by the companies
+        if any(f in vals for f in REPORT_FIELDS):
+            self.env['account.ledger.generation']._bump_companies()
+        return res
@@ -3,9 +3,11 @@
 # © 2016 Julien Coux (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).-
 
+from . import abstract_report
 from . import abstract_report_xlsx
 from . import aged_partner_balance
 from . import aged_partner_balance_xlsx
+from . import bulk_writer
 from . import general_ledger
 from . import general_ledger_xlsx
 from . import journal_ledger
@@ -0,0 +1,140 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import hashlib
+import json
+import logging
+from collections import Counter
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Hits and misses of the report cache, per report model, in this process
+CACHE_STATS = Counter()
+
+# Lines rendered in each page of the paginated HTML reports, an account
+# header counting as a line
+HTML_PAGE_SIZE = 2000
+
+
+class AbstractReport(models.AbstractModel):
+    _name = 'account_financial_report_abstract'
+
+    # Key of the computed report in the cache, see `_get_cache_key`
+    cache_key = fields.Char(index=True, copy=False)
+
+    @api.model
+    def _get_cache_date(self, values):
+        """ Return the last date of the journal items read by the report. """
+        return values.get('date_to') or values.get('date_at')
+
+    @api.model
+    def _get_cache_key(self, values):
+        """ Return the key of the report computed from `values`: a hash
+        of the values and of the generation of the ledger they cover.
+
+        The user is part of the key because the transient records
+        are only readable by their creator.
+        """
+        date = self._get_cache_date(values)
+        if not values.get('company_id') or not date:
+            return False
+        generation = self.env['account.ledger.generation']._get_generation(
+            values['company_id'], date)
+        key = json.dumps(
+            [self._name, self.env.uid, values, generation],
+            sort_keys=True, default=str)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @api.model
+    def _create_and_compute(self, values):
+        """ Return the report computed from `values`.
+
+        A report already computed from the same values on the same ledger
+        generation is reused. The cached reports are deleted with the
+        other transient records by the vacuum.
+        """
+        key = self._get_cache_key(values)
+        report = self.search([('cache_key', '=', key)], limit=1) \
+            if key else self.browse()
+        CACHE_STATS[(self._name, 'hit' if report else 'miss')] += 1
+        _logger.debug(
+            "%s cache %s (hits: %s, misses: %s)", self._name,
+            'hit' if report else 'miss',
+            CACHE_STATS[(self._name, 'hit')],
+            CACHE_STATS[(self._name, 'miss')])
+        if not report:
+            report = self.create(values)
+            report.compute_data_for_report()
+            # Only once computed: the computation may commit on the way
+            report.cache_key = key
+        return report
+
+    def _run_compute_steps(self, steps):
+        """ Run the (label, function) steps computing the report.
+
+        When the report is computed by a background job, the job progress
+        is updated before each step.
+        """
+        job = self.env['account.financial.report.job'].browse(
+            self.env.context.get('report_job_id'))
+        for index, (label, step) in enumerate(steps):
+            if job:
+                job._set_progress(label, index, len(steps) + 1)
+            step()
+
+    def _get_html_line_counts(self):
+        """ Return the number of journal items of each account of the
+        report, as {report account id: count}, for the reports paginated
+        in HTML. """
+        return {}
+
+    def _get_html_page_template(self):
+        """ Return the XML id of the template rendering the accounts
+        of a page of the HTML report, None for the reports rendered in a
+        single page. """
+        return None
+
+    def _get_html_pages(self):
+        """ Return the pages of the HTML report, as the (offset, end) of
+        their report accounts.
+
+        A page holds the next accounts up to HTML_PAGE_SIZE lines, at least
+        one account, and all of them without page template. The pages are
+        computed once, when the report is displayed: the widget fetches
+        each next page by its offsets.
+        """
+        account_ids = self.account_ids.ids
+        if not self._get_html_page_template():
+            return [(0, len(account_ids))]
+        counts = self._get_html_line_counts()
+        pages = []
+        offset = lines = 0
+        for index, account_id in enumerate(account_ids):
+            # The account itself counts as a line, for its header
+            count = 1 + counts.get(account_id, 0)
+            if index > offset and lines + count > HTML_PAGE_SIZE:
+                pages.append((offset, index))
+                offset, lines = index, 0
+            lines += count
+        pages.append((offset, len(account_ids)))
+        return pages
+
+    def _get_html_page(self, offset, end):
+        """ Return the report accounts from `offset` to `end`, read alone
+        so that only the accounts of the page are prefetched. """
+        field = self._fields['account_ids']
+        return self.env[field.comodel_name].search(
+            [(field.inverse_name, '=', self.id)],
+            offset=offset, limit=end - offset)
+
+    @api.model
+    def get_html_page(self, given_context=None, offset=0, end=0):
+        """ Return the HTML of the page of the report from the account
+        `offset` to `end`, fetched by the widget as the user scrolls. """
+        report = self.browse(self.env.context.get('active_id'))
+        accounts = report._get_html_page(offset, end)
+        return {
+            'html': self.env.ref(report._get_html_page_template()).render(
+                {'o': report, 'accounts': accounts}),
+        }
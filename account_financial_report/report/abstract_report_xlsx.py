@@ -4,6 +4,9 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from odoo import models
 
+# Number of rows fetched at once by the streaming exports
+STREAM_BATCH_SIZE = 10000
+
 
 class AbstractReportXslx(models.AbstractModel):
     _name = 'report.account_financial_report.abstract_report_xlsx'
@@ -29,6 +32,7 @@ class AbstractReportXslx(models.AbstractModel):
         self.format_header_amount = None
         self.format_amount = None
         self.format_percent_bold_italic = None
+        self.currency_formats = None
 
     def get_workbook_options(self):
         return {'constant_memory': True}
@@ -37,6 +41,7 @@ class AbstractReportXslx(models.AbstractModel):
         report = objects
 
         self.row_pos = 0
+        self.currency_formats = {}
 
         self._define_formats(workbook)
 
@@ -186,6 +191,73 @@ class AbstractReportXslx(models.AbstractModel):
                     )
         self.row_pos += 1
 
+    def write_line_values(self, line_values):
+        """Write a line on current line from a dict of values
+        keyed by the columns field name.
+        Unlike `write_line`, no ORM access is done, so it is used
+        to write the rows streamed by `_stream_query`.
+        Many2one values are expected as names, with the currency decimal
+        places given under the `currency_decimal_places` key.
+        Columns are defined with `_get_report_columns` method.
+        """
+        for col_pos, column in self.columns.items():
+            value = line_values.get(column['field'])
+            cell_type = column.get('type', 'string')
+            if cell_type == 'many2one':
+                self.sheet.write_string(
+                    self.row_pos, col_pos, value or '', self.format_right)
+            elif cell_type == 'string':
+                self.sheet.write_string(self.row_pos, col_pos, value or '')
+            elif cell_type == 'amount':
+                self.sheet.write_number(
+                    self.row_pos, col_pos, float(value or 0.0),
+                    self.format_amount
+                )
+            elif cell_type == 'amount_currency':
+                if line_values.get('currency_id'):
+                    format_amt = self._get_currency_format(
+                        line_values['currency_id'],
+                        line_values['currency_decimal_places'],
+                    )
+                    self.sheet.write_number(
+                        self.row_pos, col_pos, float(value or 0.0),
+                        format_amt
+                    )
+        self.row_pos += 1
+
+    def _get_currency_format(self, currency_name, decimal_places):
+        """ Return amount format of a currency, created once per workbook. """
+        format_amt = self.currency_formats.get(currency_name)
+        if not format_amt:
+            format_amt = self.workbook.add_format()
+            format_amt.set_num_format('#,##0.' + ('0' * decimal_places))
+            self.currency_formats[currency_name] = format_amt
+        return format_amt
+
+    def _stream_query(self, query, params, batch_size=STREAM_BATCH_SIZE):
+        """ Yield the rows of `query` as dicts, fetched by batches
+        through a server side cursor, so that memory usage does not depend
+        on the number of rows. """
+        cr = self.env.cr
+        cursor_name = 'xlsx_stream_%s' % id(self)
+        # pylint: disable=sql-injection
+        cr.execute(
+            'DECLARE ' + cursor_name + ' NO SCROLL CURSOR FOR ' + query,
+            params
+        )
+        try:
+            while True:
+                cr.execute(
+                    'FETCH FORWARD %s FROM ' + cursor_name, (batch_size,)
+                )
+                rows = cr.dictfetchall()
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cr.execute('CLOSE ' + cursor_name)
+
     def write_initial_balance(self, my_object, label):
         """Write a specific initial balance line on current line
         using defined columns field_initial_balance name.
@@ -1,8 +1,24 @@
 # © 2016 Julien Coux (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import logging
+
 from odoo import models, fields, api
 
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    _logger.debug("Cannot import numpy, the NumPy aging engine is disabled")
+    numpy = None
+
+# Age columns, from the journal items not due to the oldest ones
+AGE_COLUMNS = (
+    'current', 'age_30_days', 'age_60_days', 'age_90_days', 'age_120_days',
+    'older',
+)
+
 
 class AgedPartnerBalanceReport(models.TransientModel):
     """ Here, we just define class fields.
@@ -18,6 +34,7 @@ class AgedPartnerBalanceReport(models.TransientModel):
     """
 
     _name = 'report_aged_partner_balance'
+    _inherit = 'account_financial_report_abstract'
 
     # Filters fields, used for data computation
     date_at = fields.Date()
@@ -26,6 +43,11 @@ class AgedPartnerBalanceReport(models.TransientModel):
     filter_account_ids = fields.Many2many(comodel_name='account.account')
     filter_partner_ids = fields.Many2many(comodel_name='res.partner')
     show_move_line_details = fields.Boolean()
+    # Upper limits, in days overdue, of the age columns
+    age_days_1 = fields.Integer(default=30)
+    age_days_2 = fields.Integer(default=60)
+    age_days_3 = fields.Integer(default=90)
+    age_days_4 = fields.Integer(default=120)
 
     # Open Items Report Data fields, used as base for compute the data reports
     open_items_id = fields.Many2one(comodel_name='report_open_items')
@@ -231,11 +253,12 @@ class AgedPartnerBalanceReportCompute(models.TransientModel):
         # Compute report data
         self._inject_account_values()
         self._inject_partner_values()
-        self._inject_line_values()
-        self._inject_line_values(only_empty_partner_line=True)
-        if self.show_move_line_details:
-            self._inject_move_line_values()
-            self._inject_move_line_values(only_empty_partner_line=True)
+        if self._get_aging_engine() == 'numpy':
+            self._inject_aging_values_numpy()
+        else:
+            self._inject_line_values()
+            if self.show_move_line_details:
+                self._inject_move_line_values()
         self._compute_accounts_cumul()
         # Refresh cache because all data are computed with SQL requests
         self.invalidate_cache()
@@ -307,143 +330,80 @@ AND ra.report_id = %s
         )
         self.env.cr.execute(query_inject_partner, query_inject_partner_params)
 
-    def _inject_line_values(self, only_empty_partner_line=False):
-        """ Inject report values for report_aged_partner_balance_line.
+    def _get_age_limits(self):
+        """ Return the first day overdue of each age column after
+        the current one, see account.aging. """
+        return [
+            1, self.age_days_1 + 1, self.age_days_2 + 1,
+            self.age_days_3 + 1, self.age_days_4 + 1,
+        ]
 
-        The "only_empty_partner_line" value is used
-        to compute data without partner.
-        """
-        query_inject_line = """
-WITH
-    date_range AS
-        (
-            SELECT
-                DATE %s AS date_current,
-                DATE %s - INTEGER '30' AS date_less_30_days,
-                DATE %s - INTEGER '60' AS date_less_60_days,
-                DATE %s - INTEGER '90' AS date_less_90_days,
-                DATE %s - INTEGER '120' AS date_less_120_days
-        )
-INSERT INTO
-    report_aged_partner_balance_line
-    (
-        report_partner_id,
-        create_uid,
-        create_date,
-        partner,
-        amount_residual,
-        current,
-        age_30_days,
-        age_60_days,
-        age_90_days,
-        age_120_days,
-        older
-    )
-SELECT
-    rp.id AS report_partner_id,
-    %s AS create_uid,
-    NOW() AS create_date,
-    rp.name,
-    SUM(rlo.amount_residual) AS amount_residual,
-    SUM(
-        CASE
-            WHEN rlo.date_due >= date_range.date_current
-            THEN rlo.amount_residual
-        END
-    ) AS current,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_30_days
-                AND rlo.date_due < date_range.date_current
-            THEN rlo.amount_residual
-        END
-    ) AS age_30_days,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_60_days
-                AND rlo.date_due < date_range.date_less_30_days
-            THEN rlo.amount_residual
-        END
-    ) AS age_60_days,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_90_days
-                AND rlo.date_due < date_range.date_less_60_days
-            THEN rlo.amount_residual
-        END
-    ) AS age_90_days,
-    SUM(
-        CASE
-            WHEN
-                rlo.date_due >= date_range.date_less_120_days
-                AND rlo.date_due < date_range.date_less_90_days
-            THEN rlo.amount_residual
-        END
-    ) AS age_120_days,
-    SUM(
-        CASE
-            WHEN rlo.date_due < date_range.date_less_120_days
-            THEN rlo.amount_residual
-        END
-    ) AS older
+    def _get_age_params(self):
+        """ Return the parameters of the queries computing the ages. """
+        return {
+            'date_at': self.date_at,
+            'user_id': self.env.uid,
+            'open_items_id': self.open_items_id.id,
+            'report_id': self.id,
+        }
+
+    def _get_aged_move_lines_sql(self):
+        """ Return the FROM clause of the open items, with and without
+        partner, and of their partner in the report. """
+        return """
 FROM
-    date_range,
     report_open_items_move_line rlo
 INNER JOIN
     report_open_items_partner rpo ON rlo.report_partner_id = rpo.id
 INNER JOIN
     report_open_items_account rao ON rpo.report_account_id = rao.id
 INNER JOIN
-    report_aged_partner_balance_account ra ON rao.code = ra.code
+    report_aged_partner_balance_account ra ON rao.account_id = ra.account_id
 INNER JOIN
     report_aged_partner_balance_partner rp
         ON
             ra.id = rp.report_account_id
-        """
-        if not only_empty_partner_line:
-            query_inject_line += """
-        AND rpo.partner_id = rp.partner_id
-            """
-        elif only_empty_partner_line:
-            query_inject_line += """
-        AND rpo.partner_id IS NULL
-        AND rp.partner_id IS NULL
-            """
-        query_inject_line += """
+        AND rpo.partner_id IS NOT DISTINCT FROM rp.partner_id
 WHERE
-    rao.report_id = %s
-AND ra.report_id = %s
-GROUP BY
-    rp.id
+    rao.report_id = %(open_items_id)s
+AND ra.report_id = %(report_id)s
         """
-        query_inject_line_params = (self.date_at,) * 5
-        query_inject_line_params += (
-            self.env.uid,
-            self.open_items_id.id,
-            self.id,
-        )
-        self.env.cr.execute(query_inject_line, query_inject_line_params)
-
-    def _inject_move_line_values(self, only_empty_partner_line=False):
-        """ Inject report values for report_aged_partner_balance_move_line
 
-        The "only_empty_partner_line" value is used
-        to compute data without partner.
-        """
+    def _inject_line_values(self):
+        """ Inject report values for report_aged_partner_balance_line,
+        with and without partner, summed by the aging service. """
+        # pylint: disable=sql-injection
+        query_select_move_lines = """
+SELECT
+    rp.id AS report_partner_id,
+    rp.name,
+    DATE %(date_at)s - rlo.date_due AS days_overdue,
+    rlo.amount_residual AS amount
+        """ + self._get_aged_move_lines_sql()
+        aging = self.env['account.aging']._compute_aging(
+            query_select_move_lines, self._get_age_params(),
+            ('report_partner_id', 'name'), self._get_age_limits())
+        create_date = fields.Datetime.now()
+        self.env['account.financial.report.bulk.writer']._copy_rows(
+            'report_aged_partner_balance_line',
+            ('report_partner_id', 'create_uid', 'create_date', 'partner',
+             'amount_residual') + AGE_COLUMNS,
+            (
+                (report_partner_id, self.env.uid, create_date, name, total) +
+                tuple(amounts)
+                for (report_partner_id, name), (total, amounts)
+                in sorted(aging.items())
+            ))
+
+    def _inject_move_line_values(self):
+        """ Inject report values for report_aged_partner_balance_move_line,
+        with and without partner. """
+        limits = self._get_age_limits()
+        bucket = self.env['account.aging']._get_bucket_sql(
+            'DATE %(date_at)s - rlo.date_due', limits)
+        # The bucket is computed once per open item, in a subquery
+        # pylint: disable=sql-injection
         query_inject_move_line = """
-WITH
-    date_range AS
-        (
-            SELECT
-                DATE %s AS date_current,
-                DATE %s - INTEGER '30' AS date_less_30_days,
-                DATE %s - INTEGER '60' AS date_less_60_days,
-                DATE %s - INTEGER '90' AS date_less_90_days,
-                DATE %s - INTEGER '120' AS date_less_120_days
-        )
 INSERT INTO
     report_aged_partner_balance_move_line
     (
@@ -459,17 +419,86 @@ INSERT INTO
         partner,
         label,
         amount_residual,
-        current,
-        age_30_days,
-        age_60_days,
-        age_90_days,
-        age_120_days,
-        older
+        """ + ',\n        '.join(AGE_COLUMNS) + """
     )
 SELECT
-    rp.id AS report_partner_id,
-    %s AS create_uid,
+    l.report_partner_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
+    l.move_line_id,
+    l.date,
+    l.date_due,
+    l.entry,
+    l.journal,
+    l.account,
+    l.partner,
+    l.label,
+    l.amount_residual,
+    """ + ',\n    '.join(
+            "CASE WHEN l.bucket = %d THEN l.amount_residual END AS %s" % (
+                index, column)
+            for index, column in enumerate(AGE_COLUMNS)) + """
+FROM
+    (
+        SELECT
+            rlo.id,
+            rp.id AS report_partner_id,
+            rlo.move_line_id,
+            rlo.date,
+            rlo.date_due,
+            rlo.entry,
+            rlo.journal,
+            rlo.account,
+            rlo.partner,
+            rlo.label,
+            rlo.amount_residual,
+            """ + bucket + """ AS bucket
+        """ + self._get_aged_move_lines_sql() + """
+    ) l
+ORDER BY
+    l.id
+        """
+        query_inject_move_line_params = self._get_age_params()
+        query_inject_move_line_params.update(
+            self.env['account.aging']._get_aging_params(limits))
+        self.env.cr.execute(query_inject_move_line,
+                            query_inject_move_line_params)
+
+    def _get_aging_engine(self):
+        """ Return the engine computing the ages: 'sql', the default,
+        or 'numpy' when set in the system parameters. """
+        engine = self.env['ir.config_parameter'].sudo().get_param(
+            'account_financial_report.aging_engine', 'sql')
+        if engine == 'numpy' and numpy is None:
+            _logger.warning(
+                "NumPy is not installed, the ages are computed in SQL")
+            return 'sql'
+        return engine
+
+    def _get_age_buckets(self, days_overdue):
+        """ Return the index in AGE_COLUMNS of each number of days overdue,
+        -1 for the journal items without due date. """
+        buckets = numpy.searchsorted(
+            numpy.array(self._get_age_limits()), days_overdue, side='right')
+        buckets[numpy.isnan(days_overdue)] = -1
+        return buckets
+
+    def _inject_aging_values_numpy(self):
+        """ Inject report values for report_aged_partner_balance_line
+        and report_aged_partner_balance_move_line with NumPy.
+
+        The open items are read once, with and without partner. Their age
+        column is found by a binary search on the age limits, and their
+        amounts are summed per partner in arrays.
+        """
+        columns = """
+    rp.id,
+    rp.name,
+    DATE %(date_at)s - rlo.date_due AS days_overdue,
+    rlo.amount_residual
+        """
+        if self.show_move_line_details:
+            columns += """,
     rlo.move_line_id,
     rlo.date,
     rlo.date_due,
@@ -477,76 +506,66 @@ SELECT
     rlo.journal,
     rlo.account,
     rlo.partner,
-    rlo.label,
-    rlo.amount_residual AS amount_residual,
-    CASE
-        WHEN rlo.date_due >= date_range.date_current
-        THEN rlo.amount_residual
-    END AS current,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_30_days
-            AND rlo.date_due < date_range.date_current
-        THEN rlo.amount_residual
-    END AS age_30_days,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_60_days
-            AND rlo.date_due < date_range.date_less_30_days
-        THEN rlo.amount_residual
-    END AS age_60_days,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_90_days
-            AND rlo.date_due < date_range.date_less_60_days
-        THEN rlo.amount_residual
-    END AS age_90_days,
-    CASE
-        WHEN
-            rlo.date_due >= date_range.date_less_120_days
-            AND rlo.date_due < date_range.date_less_90_days
-        THEN rlo.amount_residual
-    END AS age_120_days,
-    CASE
-        WHEN rlo.date_due < date_range.date_less_120_days
-        THEN rlo.amount_residual
-    END AS older
-FROM
-    date_range,
-    report_open_items_move_line rlo
-INNER JOIN
-    report_open_items_partner rpo ON rlo.report_partner_id = rpo.id
-INNER JOIN
-    report_open_items_account rao ON rpo.report_account_id = rao.id
-INNER JOIN
-    report_aged_partner_balance_account ra ON rao.code = ra.code
-INNER JOIN
-    report_aged_partner_balance_partner rp
-        ON
-            ra.id = rp.report_account_id
-        """
-        if not only_empty_partner_line:
-            query_inject_move_line += """
-        AND rpo.partner_id = rp.partner_id
+    rlo.label
             """
-        elif only_empty_partner_line:
-            query_inject_move_line += """
-        AND rpo.partner_id IS NULL
-        AND rp.partner_id IS NULL
-            """
-        query_inject_move_line += """
-WHERE
-    rao.report_id = %s
-AND ra.report_id = %s
+        # pylint: disable=sql-injection
+        query_select_move_lines = """
+SELECT """ + columns + self._get_aged_move_lines_sql() + """
+ORDER BY
+    rlo.id
         """
-        query_inject_move_line_params = (self.date_at,) * 5
-        query_inject_move_line_params += (
-            self.env.uid,
-            self.open_items_id.id,
-            self.id,
-        )
-        self.env.cr.execute(query_inject_move_line,
-                            query_inject_move_line_params)
+        self.env.cr.execute(query_select_move_lines, self._get_age_params())
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return
+        report_partner_ids = numpy.array([row[0] for row in rows])
+        days_overdue = numpy.array([row[2] for row in rows], dtype=float)
+        amounts = numpy.array([row[3] for row in rows], dtype=float)
+        buckets = self._get_age_buckets(days_overdue)
+        create_date = fields.Datetime.now()
+
+        partner_ids, partners = numpy.unique(
+            report_partner_ids, return_inverse=True)
+        names = dict((row[0], row[1]) for row in rows)
+        amount_residuals = numpy.bincount(
+            partners, weights=amounts, minlength=len(partner_ids))
+        aged = buckets >= 0
+        cells = partners[aged] * len(AGE_COLUMNS) + buckets[aged]
+        shape = (len(partner_ids), len(AGE_COLUMNS))
+        ages = numpy.bincount(
+            cells, weights=amounts[aged], minlength=shape[0] * shape[1],
+        ).reshape(shape)
+        counts = numpy.bincount(
+            cells, minlength=shape[0] * shape[1]).reshape(shape)
+        self.env['account.financial.report.bulk.writer']._copy_rows(
+            'report_aged_partner_balance_line',
+            ('report_partner_id', 'create_uid', 'create_date', 'partner',
+             'amount_residual') + AGE_COLUMNS,
+            (
+                (int(partner_id), self.env.uid, create_date,
+                 names[partner_id], float(amount_residuals[index])) +
+                tuple(
+                    float(ages[index, column])
+                    if counts[index, column] else None
+                    for column in range(len(AGE_COLUMNS)))
+                for index, partner_id in enumerate(partner_ids)
+            ))
+
+        if self.show_move_line_details:
+            self.env['account.financial.report.bulk.writer']._copy_rows(
+                'report_aged_partner_balance_move_line',
+                ('report_partner_id', 'create_uid', 'create_date',
+                 'move_line_id', 'date', 'date_due', 'entry', 'journal',
+                 'account', 'partner', 'label', 'amount_residual') +
+                AGE_COLUMNS,
+                (
+                    (row[0], self.env.uid, create_date) + row[4:] +
+                    (row[3],) +
+                    tuple(
+                        row[3] if column == bucket else None
+                        for column in range(len(AGE_COLUMNS)))
+                    for row, bucket in zip(rows, buckets)
+                ))
 
     def _compute_accounts_cumul(self):
         """ Compute cumulative amount for
@@ -28,25 +28,25 @@ class AgedPartnerBalanceXslx(models.AbstractModel):
                     'field_footer_percent': 'percent_current',
                     'type': 'amount',
                     'width': 14},
-                3: {'header': _(u'Age ≤ 30 d.'),
+                3: {'header': _(u'Age ≤ %s d.') % report.age_days_1,
                     'field': 'age_30_days',
                     'field_footer_total': 'cumul_age_30_days',
                     'field_footer_percent': 'percent_age_30_days',
                     'type': 'amount',
                     'width': 14},
-                4: {'header': _(u'Age ≤ 60 d.'),
+                4: {'header': _(u'Age ≤ %s d.') % report.age_days_2,
                     'field': 'age_60_days',
                     'field_footer_total': 'cumul_age_60_days',
                     'field_footer_percent': 'percent_age_60_days',
                     'type': 'amount',
                     'width': 14},
-                5: {'header': _(u'Age ≤ 90 d.'),
+                5: {'header': _(u'Age ≤ %s d.') % report.age_days_3,
                     'field': 'age_90_days',
                     'field_footer_total': 'cumul_age_90_days',
                     'field_footer_percent': 'percent_age_90_days',
                     'type': 'amount',
                     'width': 14},
-                6: {'header': _(u'Age ≤ 120 d.'),
+                6: {'header': _(u'Age ≤ %s d.') % report.age_days_4,
                     'field': 'age_120_days',
                     'field_footer_total': 'cumul_age_120_days',
                     'field_footer_percent': 'percent_age_120_days',
@@ -80,28 +80,28 @@ class AgedPartnerBalanceXslx(models.AbstractModel):
                 'field_final_balance': 'current',
                 'type': 'amount',
                 'width': 14},
-            9: {'header': _(u'Age ≤ 30 d.'),
+            9: {'header': _(u'Age ≤ %s d.') % report.age_days_1,
                 'field': 'age_30_days',
                 'field_footer_total': 'cumul_age_30_days',
                 'field_footer_percent': 'percent_age_30_days',
                 'field_final_balance': 'age_30_days',
                 'type': 'amount',
                 'width': 14},
-            10: {'header': _(u'Age ≤ 60 d.'),
+            10: {'header': _(u'Age ≤ %s d.') % report.age_days_2,
                  'field': 'age_60_days',
                  'field_footer_total': 'cumul_age_60_days',
                  'field_footer_percent': 'percent_age_60_days',
                  'field_final_balance': 'age_60_days',
                  'type': 'amount',
                  'width': 14},
-            11: {'header': _(u'Age ≤ 90 d.'),
+            11: {'header': _(u'Age ≤ %s d.') % report.age_days_3,
                  'field': 'age_90_days',
                  'field_footer_total': 'cumul_age_90_days',
                  'field_footer_percent': 'percent_age_90_days',
                  'field_final_balance': 'age_90_days',
                  'type': 'amount',
                  'width': 14},
-            12: {'header': _(u'Age ≤ 120 d.'),
+            12: {'header': _(u'Age ≤ %s d.') % report.age_days_4,
                  'field': 'age_120_days',
                  'field_footer_total': 'cumul_age_120_days',
                  'field_footer_percent': 'percent_age_120_days',
@@ -0,0 +1,71 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+
+import io
+
+from odoo import api, models
+
+# Rows formatted at once for each read of COPY
+CHUNK_SIZE = 10000
+
+
+def _format_value(value):
+    """ Return `value` in the text format of COPY. """
+    if value is None:
+        return r'\N'
+    return str(value).replace('\\', '\\\\').replace(
+        '\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class RowsFile(io.TextIOBase):
+    """ File reading `rows` in the text format of COPY.
+
+    The rows are formatted by chunks, as COPY reads the file: the rows
+    computed by a generator are streamed to the database, without
+    holding all of them in memory.
+    """
+
+    def __init__(self, rows, chunk_size=CHUNK_SIZE):
+        super(RowsFile, self).__init__()
+        self._rows = iter(rows)
+        self._chunk_size = chunk_size
+        self._chunk = io.StringIO()
+
+    def readable(self):
+        return True
+
+    def _read_chunk(self):
+        lines = []
+        for row in self._rows:
+            lines.append('\t'.join(_format_value(value) for value in row))
+            if len(lines) == self._chunk_size:
+                break
+        return ''.join(line + '\n' for line in lines)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._chunk.read() + ''.join(iter(self._read_chunk, ''))
+        res = self._chunk.read(size)
+        if not res:
+            self._chunk = io.StringIO(self._read_chunk())
+            res = self._chunk.read(size)
+        return res
+
+
+class AccountFinancialReportBulkWriter(models.AbstractModel):
+    """ Insertion of the rows computed in Python into the report tables.
+
+    The rows are streamed to a single COPY, which inserts them much
+    faster than one INSERT per row, with `create` or `executemany`.
+    """
+
+    _name = 'account.financial.report.bulk.writer'
+    _description = 'Financial Report Bulk Writer'
+
+    @api.model
+    def _copy_rows(self, table, columns, rows, chunk_size=CHUNK_SIZE):
+        """ Insert the `rows`, an iterable of tuples of values of the
+        `columns`, in `table`. """
+        # pylint: disable=sql-injection
+        self.env.cr.copy_expert(
+            'COPY %s (%s) FROM STDIN' % (table, ', '.join(columns)),
+            RowsFile(rows, chunk_size=chunk_size))
@@ -2,8 +2,14 @@
 # © 2016 Julien Coux (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from odoo import models, fields, api, _
 
+_logger = logging.getLogger(__name__)
+
 
 class GeneralLedgerReport(models.TransientModel):
     """ Here, we just define class fields.
@@ -22,6 +28,7 @@ class GeneralLedgerReport(models.TransientModel):
     """
 
     _name = 'report_general_ledger'
+    _inherit = 'account_financial_report_abstract'
 
     # Filters fields, used for data computation
     date_from = fields.Date()
@@ -220,160 +227,431 @@ class GeneralLedgerReportCompute(models.TransientModel):
         context = dict(self.env.context)
         report = self.browse(context.get('active_id'))
         if report:
+            # Only the first page of the accounts, the widget fetches
+            # the next pages with `get_html_page`
+            pages = report._get_html_pages()
+            accounts = report._get_html_page(*pages[0])
             rcontext['o'] = report
+            rcontext['accounts'] = accounts
             result['html'] = self.env.ref(
                 'account_financial_report.report_general_ledger').render(
                     rcontext)
+            result['next_pages'] = pages[1:]
         return result
 
     @api.model
     def get_html(self, given_context=None):
         return self._get_html()
 
+    def _get_html_line_counts(self):
+        self.env.cr.execute("""
+            SELECT report_account_id, COUNT(*)
+            FROM (
+                SELECT ml.report_account_id
+                FROM report_general_ledger_move_line ml
+                INNER JOIN report_general_ledger_account ra
+                    ON ra.id = ml.report_account_id
+                WHERE ra.report_id = %(report_id)s
+                UNION ALL
+                SELECT rp.report_account_id
+                FROM report_general_ledger_move_line ml
+                INNER JOIN report_general_ledger_partner rp
+                    ON rp.id = ml.report_partner_id
+                INNER JOIN report_general_ledger_account ra
+                    ON ra.id = rp.report_account_id
+                WHERE ra.report_id = %(report_id)s
+            ) l
+            GROUP BY report_account_id
+        """, {'report_id': self.id})
+        return dict(self.env.cr.fetchall())
+
+    def _get_html_page_template(self):
+        return 'account_financial_report.report_general_ledger_accounts'
+
     @api.multi
     def compute_data_for_report(self,
                                 with_line_details=True,
                                 with_partners=True):
         self.ensure_one()
         # Compute report data
-        self._inject_account_values()
-
-        if with_partners:
-            self._inject_partner_values()
-            if not self.filter_partner_ids:
-                self._inject_partner_values(only_empty_partner=True)
+        steps = [(_('Accounts'), self._inject_account_values)]
 
         # Add unaffected earnings account
         if (not self.filter_account_ids or
                 self.unaffected_earnings_account.id in
                 self.filter_account_ids.ids):
-            self._inject_unaffected_earnings_account_values()
+            steps.append((
+                _('Unaffected earnings'),
+                self._inject_unaffected_earnings_account_values))
+
+        # Steps only reading and writing the report accounts they are
+        # given in context, as (label, method name, arguments)
+        account_steps = []
+        if with_partners:
+            account_steps.append((
+                _('Partners'), '_inject_partner_values', {}))
+            if not self.filter_partner_ids:
+                account_steps.append((
+                    _('Partners'), '_inject_partner_values',
+                    {'only_empty_partner': True}))
 
         # Call this function even if we don't want line details because,
         # we need to compute
         # at least the values for unaffected earnings account
         # In this case, only unaffected earnings account values are computed
         only_unaffected_earnings_account = not with_line_details
-        self._inject_line_not_centralized_values(
-            only_unaffected_earnings_account=only_unaffected_earnings_account
-        )
+        account_steps.append((
+            _('Account move lines'), '_inject_line_not_centralized_values',
+            {'only_unaffected_earnings_account':
+                only_unaffected_earnings_account}))
 
         if with_line_details:
-            self._inject_line_not_centralized_values(
-                is_account_line=False,
-                is_partner_line=True)
+            account_steps.append((
+                _('Partner move lines'), '_inject_line_not_centralized_values',
+                {'is_account_line': False,
+                 'is_partner_line': True}))
+            account_steps.append((
+                _('Partner move lines'), '_inject_line_not_centralized_values',
+                {'is_account_line': False,
+                 'is_partner_line': True,
+                 'only_empty_partner_line': True}))
+
+        workers = self._get_parallel_workers()
+        if workers > 1:
+            steps.append((
+                _('Account move lines'),
+                partial(self._compute_account_shards, account_steps, workers)))
+        else:
+            steps += [
+                (label, partial(getattr(self, method), **kwargs))
+                for label, method, kwargs in account_steps
+            ]
 
-            self._inject_line_not_centralized_values(
-                is_account_line=False,
-                is_partner_line=True,
-                only_empty_partner_line=True)
+        if with_line_details and self.centralize:
+            steps.append((
+                _('Centralized move lines'),
+                self._inject_line_centralized_values))
 
-            if self.centralize:
-                self._inject_line_centralized_values()
+        self._run_compute_steps(steps)
 
         # Refresh cache because all data are computed with SQL requests
         self.invalidate_cache()
 
-    def _get_account_sub_subquery_sum_amounts(
-            self, include_initial_balance, date_included):
-        """ Return subquery used to compute sum amounts on accounts """
-        sub_subquery_sum_amounts = """
-            SELECT
-                a.id AS account_id,
-                SUM(ml.debit) AS debit,
-                SUM(ml.credit) AS credit,
-                SUM(ml.balance) AS balance,
-                c.id AS currency_id,
-                CASE
-                    WHEN c.id IS NOT NULL
-                    THEN SUM(ml.amount_currency)
-                    ELSE NULL
-                END AS balance_currency
-            FROM
-                accounts a
-            INNER JOIN
-                account_account_type at ON a.user_type_id = at.id
-            INNER JOIN
-                account_move_line ml
-                    ON a.id = ml.account_id
+    def _get_parallel_workers(self):
+        """ Return the number of connections computing the report accounts
+        in parallel, the report is computed on a single connection below 2.
+
+        The parallel computation commits the report accounts so that
+        the other connections can read them, it is only used when the
+        report is computed by a background job. """
+        if not self.env.context.get('report_job_id'):
+            return 0
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'account_financial_report.general_ledger_workers', 0))
+
+    def _get_account_shards(self, workers):
+        """ Split the report accounts in `workers` shards
+        with about the same number of journal items. """
+        self.env.cr.execute("""
+            SELECT ra.id, COUNT(ml.id)
+            FROM report_general_ledger_account ra
+            LEFT JOIN account_move_line ml
+                ON ml.account_id = ra.account_id
+                AND ml.date BETWEEN %s AND %s
+            WHERE ra.report_id = %s
+            GROUP BY ra.id
+            ORDER BY COUNT(ml.id) DESC, ra.id
+        """, (self.date_from, self.date_to, self.id))
+        shards = [[] for i in range(workers)]
+        loads = [0] * workers
+        for report_account_id, count in self.env.cr.fetchall():
+            index = loads.index(min(loads))
+            shards[index].append(report_account_id)
+            loads[index] += count
+        return [shard for shard in shards if shard]
+
+    def _compute_account_shards(self, account_steps, workers):
+        """ Run the account steps on shards of the report accounts,
+        each shard in its own transaction.
+
+        The report accounts and the shards done are committed: when a
+        shard fails, the lines of the report are deleted in a new
+        transaction, which the rollback of the job could not undo, and the
+        error is raised again. The report itself gets no cache key, it is
+        never reused. """
+        shards = self._get_account_shards(workers)
+        # The report accounts must be visible from the other connections,
+        # and this transaction must not read anything before they are done:
+        # its next snapshot includes the values they commit
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+        try:
+            with ThreadPoolExecutor(
+                    max_workers=len(shards) or 1) as executor:
+                futures = [
+                    executor.submit(
+                        self._compute_account_shard, account_steps, shard)
+                    for shard in shards
+                ]
+                for future in futures:
+                    future.result()
+        except Exception:
+            _logger.exception(
+                "General ledger %s failed, its lines are deleted", self.id)
+            self._delete_committed_lines()
+            raise
+
+    def _delete_committed_lines(self):
+        """ Delete the lines of the report in a new transaction, committed
+        at once. The lines of the accounts cascade. """
+        with api.Environment.manage():
+            with self.pool.cursor() as cr:
+                cr.execute("""
+                    DELETE FROM report_general_ledger_account
+                    WHERE report_id = %s
+                """, (self.id,))
+
+    def _compute_account_shard(self, account_steps, report_account_ids):
+        """ Run the account steps on the given report accounts,
+        with a new cursor committed at the end. """
+        with api.Environment.manage():
+            with self.pool.cursor() as cr:
+                report = self.with_env(self.env(cr=cr)).with_context(
+                    report_account_ids=tuple(report_account_ids))
+                for label, method, kwargs in account_steps:
+                    getattr(report, method)(**kwargs)
+
+    def _get_period_balance_date(self):
+        """ Return the first day of the month of the report start date,
+        the initial balances are read from account.period.balance
+        before this date and from the journal items after. """
+        date_from = fields.Date.from_string(self.date_from)
+        return fields.Date.to_string(date_from.replace(day=1))
+
+    def _use_period_balance(self):
+        """ Return True if the initial balances can be computed
+        from account.period.balance.
+
+        The snapshot has no analytic dimension and only covers whole months,
+        so it is only used without cost center filter and when the fiscal
+        year starts on the first day of a month. It must also be up to date
+        for the months before the report start date.
         """
+        if self.filter_cost_center_ids or not self.fy_start_date:
+            return False
+        fy_start_date = fields.Date.from_string(self.fy_start_date)
+        if fy_start_date.day != 1:
+            return False
+        return self.env['account.period.balance']._is_up_to_date(
+            self.company_id, self._get_period_balance_date()
+        )
 
-        if date_included:
-            sub_subquery_sum_amounts += """
-                AND ml.date <= %s
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                AND ml.date < %s
-            """
+    def _get_sum_amounts_params(self, use_period_balance):
+        """ Return the parameters of the sum amounts subqueries """
+        params = {
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'fy_start_date': self.fy_start_date,
+        }
+        if use_period_balance:
+            params['period_balance_date'] = self._get_period_balance_date()
+        if self.filter_cost_center_ids:
+            params['cost_center_ids'] = tuple(self.filter_cost_center_ids.ids)
+        return params
 
-        if not include_initial_balance:
-            sub_subquery_sum_amounts += """
-                AND at.include_initial_balance != TRUE AND ml.date >= %s
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                AND at.include_initial_balance = TRUE
-            """
+    def _get_move_line_sum_amounts_columns(self):
+        """ Return the columns splitting the journal items between initial
+        and period sum amounts, so both are computed in one pass """
+        return """
+                SUM(
+                    CASE WHEN ml.date < %(date_from)s
+                    THEN ml.debit ELSE 0.0 END
+                ) AS initial_debit,
+                SUM(
+                    CASE WHEN ml.date < %(date_from)s
+                    THEN ml.credit ELSE 0.0 END
+                ) AS initial_credit,
+                SUM(
+                    CASE WHEN ml.date < %(date_from)s
+                    THEN ml.balance ELSE 0.0 END
+                ) AS initial_balance,
+                SUM(
+                    CASE WHEN ml.date < %(date_from)s
+                    THEN ml.amount_currency ELSE 0.0 END
+                ) AS initial_balance_currency,
+                SUM(
+                    CASE WHEN ml.date >= %(date_from)s
+                    THEN ml.debit ELSE 0.0 END
+                ) AS period_debit,
+                SUM(
+                    CASE WHEN ml.date >= %(date_from)s
+                    THEN ml.credit ELSE 0.0 END
+                ) AS period_credit,
+                SUM(
+                    CASE WHEN ml.date >= %(date_from)s
+                    THEN ml.balance ELSE 0.0 END
+                ) AS period_balance,
+                SUM(
+                    CASE WHEN ml.date >= %(date_from)s
+                    THEN ml.amount_currency ELSE 0.0 END
+                ) AS period_balance_currency
+        """
+
+    def _get_period_balance_sum_amounts_columns(self):
+        """ Return the columns of the initial sum amounts
+        read from account.period.balance """
+        return """
+                SUM(pb.debit) AS initial_debit,
+                SUM(pb.credit) AS initial_credit,
+                SUM(pb.balance) AS initial_balance,
+                SUM(pb.amount_currency) AS initial_balance_currency,
+                0.0 AS period_debit,
+                0.0 AS period_credit,
+                0.0 AS period_balance,
+                0.0 AS period_balance_currency
+        """
 
+    def _get_move_line_sum_amounts_joins(self, use_period_balance):
+        """ Return the conditions and joins restricting the journal items
+        of the sum amounts subqueries """
+        sub_subquery_joins = ""
+        if use_period_balance:
+            sub_subquery_joins += """
+                    AND ml.date >= %(period_balance_date)s
+            """
         if self.only_posted_moves:
-            sub_subquery_sum_amounts += """
-        INNER JOIN
-            account_move m ON ml.move_id = m.id AND m.state = 'posted'
+            sub_subquery_joins += """
+            INNER JOIN
+                account_move m ON ml.move_id = m.id AND m.state = 'posted'
             """
         if self.filter_cost_center_ids:
-            sub_subquery_sum_amounts += """
-        INNER JOIN
-            account_analytic_account aa
-                ON
-                    ml.analytic_account_id = aa.id
-                    AND aa.id IN %s
+            sub_subquery_joins += """
+            INNER JOIN
+                account_analytic_account aa
+                    ON
+                        ml.analytic_account_id = aa.id
+                        AND aa.id IN %(cost_center_ids)s
             """
-        sub_subquery_sum_amounts += """
-        LEFT JOIN
-            res_currency c ON a.currency_id = c.id
-        """
-        sub_subquery_sum_amounts += """
-        GROUP BY
-            a.id, c.id
-        """
-        return sub_subquery_sum_amounts
+        return sub_subquery_joins
 
-    def _get_final_account_sub_subquery_sum_amounts(self, date_included):
-        """ Return final subquery used to compute sum amounts on accounts """
+    def _get_account_subquery_sum_amounts(self, use_period_balance):
+        """ Return subquery used to compute initial and period
+        sum amounts on accounts """
         subquery_sum_amounts = """
             SELECT
                 sub.account_id AS account_id,
-                SUM(COALESCE(sub.debit, 0.0)) AS debit,
-                SUM(COALESCE(sub.credit, 0.0)) AS credit,
-                SUM(COALESCE(sub.balance, 0.0)) AS balance,
-                MAX(sub.currency_id) AS currency_id,
-                SUM(COALESCE(sub.balance_currency, 0.0)) AS balance_currency
+                SUM(COALESCE(sub.initial_debit, 0.0)) AS initial_debit,
+                SUM(COALESCE(sub.initial_credit, 0.0)) AS initial_credit,
+                SUM(COALESCE(sub.initial_balance, 0.0)) AS initial_balance,
+                SUM(COALESCE(sub.initial_balance_currency, 0.0))
+                    AS initial_balance_currency,
+                SUM(COALESCE(sub.period_debit, 0.0)) AS period_debit,
+                SUM(COALESCE(sub.period_credit, 0.0)) AS period_credit,
+                SUM(COALESCE(sub.period_balance, 0.0)) AS period_balance,
+                SUM(COALESCE(sub.period_balance_currency, 0.0))
+                    AS period_balance_currency
             FROM
             (
         """
-        subquery_sum_amounts += self._get_account_sub_subquery_sum_amounts(
-            include_initial_balance=False, date_included=date_included
-        )
+        if use_period_balance:
+            subquery_sum_amounts += """
+            SELECT
+                a.id AS account_id,
+            """ + self._get_period_balance_sum_amounts_columns() + """
+            FROM
+                accounts a
+            INNER JOIN
+                account_account_type at ON a.user_type_id = at.id
+            INNER JOIN
+                account_period_balance pb
+                    ON a.id = pb.account_id
+                    AND pb.period < %(period_balance_date)s
+                    AND (at.include_initial_balance = TRUE
+                         OR pb.period >= %(fy_start_date)s)
+            """
+            if self.only_posted_moves:
+                subquery_sum_amounts += """
+                    AND pb.posted = TRUE
+                """
+            subquery_sum_amounts += """
+            GROUP BY
+                a.id
+            UNION ALL
+            """
         subquery_sum_amounts += """
-                UNION
+            SELECT
+                a.id AS account_id,
+        """ + self._get_move_line_sum_amounts_columns() + """
+            FROM
+                accounts a
+            INNER JOIN
+                account_account_type at ON a.user_type_id = at.id
+            INNER JOIN
+                account_move_line ml
+                    ON a.id = ml.account_id
+                    AND ml.date <= %(date_to)s
+                    AND (at.include_initial_balance = TRUE
+                         OR ml.date >= %(fy_start_date)s)
         """
-        subquery_sum_amounts += self._get_account_sub_subquery_sum_amounts(
-            include_initial_balance=True, date_included=date_included
+        subquery_sum_amounts += self._get_move_line_sum_amounts_joins(
+            use_period_balance
         )
         subquery_sum_amounts += """
+            GROUP BY
+                a.id
             ) sub
             GROUP BY
                 sub.account_id
         """
         return subquery_sum_amounts
 
-    def _inject_account_values(self):
-        """Inject report values for report_general_ledger_account."""
-        query_inject_account = """
-WITH
-    accounts AS
-        (
+    def _get_sum_amounts_select(self):
+        """ Return the initial and final amounts columns
+        of the report_general_ledger_account/partner injection """
+        return """
+    s.initial_debit,
+    s.initial_credit,
+    s.initial_balance,
+    c.id AS currency_id,
+    CASE
+        WHEN c.id IS NOT NULL
+        THEN s.initial_balance_currency
+        ELSE 0.0
+    END AS initial_balance_foreign_currency,
+    s.initial_debit + s.period_debit AS final_debit,
+    s.initial_credit + s.period_credit AS final_credit,
+    s.initial_balance + s.period_balance AS final_balance,
+    CASE
+        WHEN c.id IS NOT NULL
+        THEN s.initial_balance_currency + s.period_balance_currency
+        ELSE 0.0
+    END AS final_balance_foreign_currency
+        """
+
+    def _get_sum_amounts_where(self):
+        """ Return the filter on initial and final amounts
+        of the report_general_ledger_account/partner injection """
+        query_where = """
+WHERE
+    (
+        s.initial_debit != 0
+        OR s.initial_credit != 0
+        OR s.initial_balance != 0
+        OR s.initial_debit + s.period_debit != 0
+        OR s.initial_credit + s.period_credit != 0
+        OR s.initial_balance + s.period_balance != 0
+    )
+        """
+        if self.hide_account_balance_at_0:
+            query_where += """
+AND
+    s.initial_balance + s.period_balance != 0
+            """
+        return query_where
+
+    def _get_accounts_query(self):
+        """ Return the query selecting the accounts of the report,
+        except the unaffected earnings account """
+        query_accounts = """
             SELECT
                 a.id,
                 a.code,
@@ -386,55 +664,70 @@ WITH
                 account_account a
             """
         if self.filter_partner_ids or self.filter_cost_center_ids:
-            query_inject_account += """
+            query_accounts += """
             INNER JOIN
                 account_move_line ml ON a.id = ml.account_id
             """
         if self.filter_partner_ids:
-            query_inject_account += """
+            query_accounts += """
             INNER JOIN
                 res_partner p ON ml.partner_id = p.id
             """
         if self.filter_cost_center_ids:
-            query_inject_account += """
+            query_accounts += """
             INNER JOIN
                 account_analytic_account aa
                     ON
                         ml.analytic_account_id = aa.id
-                        AND aa.id IN %s
+                        AND aa.id IN %(cost_center_ids)s
             """
-        query_inject_account += """
+        query_accounts += """
             WHERE
-                a.company_id = %s
-            AND a.id != %s
+                a.company_id = %(company_id)s
+            AND a.id != %(unaffected_earnings_account_id)s
                     """
         if self.filter_account_ids:
-            query_inject_account += """
+            query_accounts += """
             AND
-                a.id IN %s
+                a.id IN %(account_ids)s
             """
         if self.filter_partner_ids:
-            query_inject_account += """
+            query_accounts += """
             AND
-                p.id IN %s
+                p.id IN %(partner_ids)s
             """
         if self.filter_partner_ids or self.filter_cost_center_ids:
-            query_inject_account += """
+            query_accounts += """
             GROUP BY
                 a.id
             """
+        return query_accounts
 
-        init_subquery = self._get_final_account_sub_subquery_sum_amounts(
-            date_included=False
-        )
-        final_subquery = self._get_final_account_sub_subquery_sum_amounts(
-            date_included=True
-        )
+    def _get_accounts_query_params(self):
+        """ Return the parameters of the accounts query """
+        params = {
+            'company_id': self.company_id.id,
+            'unaffected_earnings_account_id':
+                self.unaffected_earnings_account.id,
+        }
+        if self.filter_account_ids:
+            params['account_ids'] = tuple(self.filter_account_ids.ids)
+        if self.filter_partner_ids:
+            params['partner_ids'] = tuple(self.filter_partner_ids.ids)
+        return params
 
-        query_inject_account += """
+    def _inject_account_values(self):
+        """Inject report values for report_general_ledger_account."""
+        use_period_balance = self._use_period_balance()
+        # pylint: disable=sql-injection
+        query_inject_account = """
+WITH
+    accounts AS
+        ( """ + self._get_accounts_query() + """
         ),
-    initial_sum_amounts AS ( """ + init_subquery + """ ),
-    final_sum_amounts AS ( """ + final_subquery + """ )
+    sum_amounts AS ( """ + self._get_account_subquery_sum_amounts(
+            use_period_balance
+        ) + """ )
 INSERT INTO
     report_general_ledger_account
     (
@@ -456,199 +749,112 @@ INSERT INTO
     is_partner_account
     )
 SELECT
-    %s AS report_id,
-    %s AS create_uid,
+    %(report_id)s AS report_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     a.id AS account_id,
     a.code,
     a.name,
-    COALESCE(i.debit, 0.0) AS initial_debit,
-    COALESCE(i.credit, 0.0) AS initial_credit,
-    COALESCE(i.balance, 0.0) AS initial_balance,
-    c.id AS currency_id,
-    COALESCE(i.balance_currency, 0.0) AS initial_balance_foreign_currency,
-    COALESCE(f.debit, 0.0) AS final_debit,
-    COALESCE(f.credit, 0.0) AS final_credit,
-    COALESCE(f.balance, 0.0) AS final_balance,
-    COALESCE(f.balance_currency, 0.0) AS final_balance_foreign_currency,
+        """ + self._get_sum_amounts_select() + """,
     a.is_partner_account
 FROM
     accounts a
-LEFT JOIN
-    initial_sum_amounts i ON a.id = i.account_id
-LEFT JOIN
-    final_sum_amounts f ON a.id = f.account_id
+INNER JOIN
+    sum_amounts s ON a.id = s.account_id
 LEFT JOIN
     res_currency c ON c.id = a.currency_id
-WHERE
-    (
-        i.debit IS NOT NULL AND i.debit != 0
-        OR i.credit IS NOT NULL AND i.credit != 0
-        OR i.balance IS NOT NULL AND i.balance != 0
-        OR f.debit IS NOT NULL AND f.debit != 0
-        OR f.credit IS NOT NULL AND f.credit != 0
-        OR f.balance IS NOT NULL AND f.balance != 0
-    )
         """
-        if self.hide_account_balance_at_0:
-            query_inject_account += """
-AND
-    f.balance IS NOT NULL AND f.balance != 0
-            """
-        query_inject_account_params = ()
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.company_id.id,
-            self.unaffected_earnings_account.id,
-        )
-        if self.filter_account_ids:
-            query_inject_account_params += (
-                tuple(self.filter_account_ids.ids),
-            )
-        if self.filter_partner_ids:
-            query_inject_account_params += (
-                tuple(self.filter_partner_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_from,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_from,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_to,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.date_to,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_account_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_account_params += (
-            self.id,
-            self.env.uid,
+        query_inject_account += self._get_sum_amounts_where()
+        query_inject_account_params = self._get_sum_amounts_params(
+            use_period_balance
         )
+        query_inject_account_params.update(self._get_accounts_query_params())
+        query_inject_account_params.update({
+            'report_id': self.id,
+            'user_id': self.env.uid,
+        })
         self.env.cr.execute(query_inject_account, query_inject_account_params)
 
-    def _get_partner_sub_subquery_sum_amounts(
-            self, only_empty_partner, include_initial_balance, date_included
+    def _get_partner_subquery_sum_amounts(
+            self, only_empty_partner, use_period_balance
     ):
-        """ Return subquery used to compute sum amounts on partners """
-        sub_subquery_sum_amounts = """
+        """ Return subquery used to compute initial and period
+        sum amounts on partners.
+
+        With `only_empty_partner` at None, the journal items with and
+        without partner are both summed.
+        """
+        if only_empty_partner is None:
+            partner_join = \
+                "COALESCE(ap.partner_id, 0) = COALESCE({0}.partner_id, 0)"
+        elif not only_empty_partner:
+            partner_join = "ap.partner_id = {0}.partner_id"
+        else:
+            partner_join = \
+                "ap.partner_id IS NULL AND {0}.partner_id IS NULL"
+        subquery_sum_amounts = """
+            SELECT
+                sub.account_id AS account_id,
+                sub.partner_id AS partner_id,
+                SUM(COALESCE(sub.initial_debit, 0.0)) AS initial_debit,
+                SUM(COALESCE(sub.initial_credit, 0.0)) AS initial_credit,
+                SUM(COALESCE(sub.initial_balance, 0.0)) AS initial_balance,
+                SUM(COALESCE(sub.initial_balance_currency, 0.0))
+                    AS initial_balance_currency,
+                SUM(COALESCE(sub.period_debit, 0.0)) AS period_debit,
+                SUM(COALESCE(sub.period_credit, 0.0)) AS period_credit,
+                SUM(COALESCE(sub.period_balance, 0.0)) AS period_balance,
+                SUM(COALESCE(sub.period_balance_currency, 0.0))
+                    AS period_balance_currency
+            FROM
+            (
+        """
+        if use_period_balance:
+            subquery_sum_amounts += """
             SELECT
                 ap.account_id AS account_id,
                 ap.partner_id AS partner_id,
-                SUM(ml.debit) AS debit,
-                SUM(ml.credit) AS credit,
-                SUM(ml.balance) AS balance,
-                c.id as currency_id,
-                CASE
-                    WHEN c.id IS NOT NULL
-                    THEN SUM(ml.amount_currency)
-                    ELSE NULL
-                END AS balance_currency
+            """ + self._get_period_balance_sum_amounts_columns() + """
             FROM
                 accounts_partners ap
-            INNER JOIN account_account ac
-                ON ac.id = ap.account_id
-            LEFT JOIN
-                res_currency c ON ac.currency_id = c.id
-            INNER JOIN
-                account_move_line ml
-                    ON ap.account_id = ml.account_id
-            """
-        if date_included:
-            sub_subquery_sum_amounts += """
-                    AND ml.date <= %s
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                    AND ml.date < %s
-            """
-        if not only_empty_partner:
-            sub_subquery_sum_amounts += """
-                    AND ap.partner_id = ml.partner_id
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                    AND ap.partner_id IS NULL AND ml.partner_id IS NULL
-            """
-        if not include_initial_balance:
-            sub_subquery_sum_amounts += """
-                    AND ap.include_initial_balance != TRUE AND ml.date >= %s
-            """
-        else:
-            sub_subquery_sum_amounts += """
-                    AND ap.include_initial_balance = TRUE
-            """
-        if self.only_posted_moves:
-            sub_subquery_sum_amounts += """
             INNER JOIN
-                account_move m ON ml.move_id = m.id AND m.state = 'posted'
-            """
-        if self.filter_cost_center_ids:
-            sub_subquery_sum_amounts += """
-        INNER JOIN
-            account_analytic_account aa
-                ON
-                    ml.analytic_account_id = aa.id
-                    AND aa.id IN %s
+                account_period_balance pb
+                    ON ap.account_id = pb.account_id
+                    AND """ + partner_join.format('pb') + """
+                    AND pb.period < %(period_balance_date)s
+                    AND (ap.include_initial_balance = TRUE
+                         OR pb.period >= %(fy_start_date)s)
             """
-        sub_subquery_sum_amounts += """
+            if self.only_posted_moves:
+                subquery_sum_amounts += """
+                    AND pb.posted = TRUE
+                """
+            subquery_sum_amounts += """
             GROUP BY
-                ap.account_id, ap.partner_id, c.id
-        """
-        return sub_subquery_sum_amounts
-
-    def _get_final_partner_sub_subquery_sum_amounts(self, only_empty_partner,
-                                                    date_included):
-        """Return final subquery used to compute sum amounts on partners"""
-
-        subquery_sum_amounts = """
-
+                ap.account_id, ap.partner_id
+            UNION ALL
+            """
+        subquery_sum_amounts += """
             SELECT
-                sub.account_id AS account_id,
-                sub.partner_id AS partner_id,
-                SUM(COALESCE(sub.debit, 0.0)) AS debit,
-                SUM(COALESCE(sub.credit, 0.0)) AS credit,
-                SUM(COALESCE(sub.balance, 0.0)) AS balance,
-                MAX(sub.currency_id) AS currency_id,
-                SUM(COALESCE(sub.balance_currency, 0.0)) AS balance_currency
+                ap.account_id AS account_id,
+                ap.partner_id AS partner_id,
+        """ + self._get_move_line_sum_amounts_columns() + """
             FROM
-            (
-        """
-        subquery_sum_amounts += self._get_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            include_initial_balance=False,
-            date_included=date_included
-        )
-        subquery_sum_amounts += """
-            UNION
+                accounts_partners ap
+            INNER JOIN
+                account_move_line ml
+                    ON ap.account_id = ml.account_id
+                    AND """ + partner_join.format('ml') + """
+                    AND ml.date <= %(date_to)s
+                    AND (ap.include_initial_balance = TRUE
+                         OR ml.date >= %(fy_start_date)s)
         """
-        subquery_sum_amounts += self._get_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            include_initial_balance=True,
-            date_included=date_included
+        subquery_sum_amounts += self._get_move_line_sum_amounts_joins(
+            use_period_balance
         )
         subquery_sum_amounts += """
+            GROUP BY
+                ap.account_id, ap.partner_id
             ) sub
             GROUP BY
                 sub.account_id, sub.partner_id
@@ -660,6 +866,7 @@ AND
 
         Only for "partner" accounts (payable and receivable).
         """
+        use_period_balance = self._use_period_balance()
         # pylint: disable=sql-injection
         query_inject_partner = """
 WITH
@@ -697,14 +904,19 @@ WITH
                 account_analytic_account aa
                     ON
                         ml.analytic_account_id = aa.id
-                        AND aa.id IN %s
+                        AND aa.id IN %(cost_center_ids)s
             """
         query_inject_partner += """
             WHERE
-                ra.report_id = %s
+                ra.report_id = %(report_id)s
             AND
                 ra.is_partner_account = TRUE
         """
+        if self.env.context.get('report_account_ids'):
+            query_inject_partner += """
+            AND
+                ra.id IN %(report_account_ids)s
+            """
         if not only_empty_partner:
             query_inject_partner += """
             AND
@@ -724,18 +936,8 @@ WITH
         if self.filter_partner_ids:
             query_inject_partner += """
             AND
-                p.id IN %s
+                p.id IN %(partner_ids)s
             """
-
-        init_subquery = self._get_final_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            date_included=False
-        )
-        final_subquery = self._get_final_partner_sub_subquery_sum_amounts(
-            only_empty_partner,
-            date_included=True
-        )
-
         query_inject_partner += """
             GROUP BY
                 ra.id,
@@ -743,8 +945,9 @@ WITH
                 p.id,
                 at.include_initial_balance
         ),
-    initial_sum_amounts AS ( """ + init_subquery + """ ),
-    final_sum_amounts AS ( """ + final_subquery + """ )
+    sum_amounts AS ( """ + self._get_partner_subquery_sum_amounts(
+            only_empty_partner, use_period_balance
+        ) + """ )
 INSERT INTO
     report_general_ledger_partner
     (
@@ -765,113 +968,48 @@ INSERT INTO
     )
 SELECT
     ap.report_account_id,
-    %s AS create_uid,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     ap.partner_id,
     ap.partner_name,
-    COALESCE(i.debit, 0.0) AS initial_debit,
-    COALESCE(i.credit, 0.0) AS initial_credit,
-    COALESCE(i.balance, 0.0) AS initial_balance,
-    i.currency_id AS currency_id,
-    COALESCE(i.balance_currency, 0.0) AS initial_balance_foreign_currency,
-    COALESCE(f.debit, 0.0) AS final_debit,
-    COALESCE(f.credit, 0.0) AS final_credit,
-    COALESCE(f.balance, 0.0) AS final_balance,
-    COALESCE(f.balance_currency, 0.0) AS final_balance_foreign_currency
+        """ + self._get_sum_amounts_select() + """
 FROM
     accounts_partners ap
-LEFT JOIN
-    initial_sum_amounts i
+INNER JOIN
+    sum_amounts s
         ON
             (
         """
         if not only_empty_partner:
             query_inject_partner += """
-                ap.partner_id = i.partner_id
+                ap.partner_id = s.partner_id
             """
         else:
             query_inject_partner += """
-                ap.partner_id IS NULL AND i.partner_id IS NULL
+                ap.partner_id IS NULL AND s.partner_id IS NULL
             """
         query_inject_partner += """
             )
-            AND ap.account_id = i.account_id
+            AND ap.account_id = s.account_id
+INNER JOIN
+    account_account ac ON ac.id = ap.account_id
 LEFT JOIN
-    final_sum_amounts f
-        ON
-            (
-        """
-        if not only_empty_partner:
-            query_inject_partner += """
-                ap.partner_id = f.partner_id
-            """
-        else:
-            query_inject_partner += """
-                ap.partner_id IS NULL AND f.partner_id IS NULL
-            """
-        query_inject_partner += """
-            )
-            AND ap.account_id = f.account_id
-WHERE
-    (
-        i.debit IS NOT NULL AND i.debit != 0
-        OR i.credit IS NOT NULL AND i.credit != 0
-        OR i.balance IS NOT NULL AND i.balance != 0
-        OR f.debit IS NOT NULL AND f.debit != 0
-        OR f.credit IS NOT NULL AND f.credit != 0
-        OR f.balance IS NOT NULL AND f.balance != 0
-    )
+    res_currency c ON ac.currency_id = c.id
         """
-        if self.hide_account_balance_at_0:
-            query_inject_partner += """
-AND
-    f.balance IS NOT NULL AND f.balance != 0
-            """
-        query_inject_partner_params = ()
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.id,
+        query_inject_partner += self._get_sum_amounts_where()
+        query_inject_partner_params = self._get_sum_amounts_params(
+            use_period_balance
         )
+        query_inject_partner_params.update({
+            'report_id': self.id,
+            'user_id': self.env.uid,
+        })
+        if self.env.context.get('report_account_ids'):
+            query_inject_partner_params['report_account_ids'] = \
+                self.env.context['report_account_ids']
         if self.filter_partner_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_partner_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.date_from,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.date_from,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.date_to,
-            self.fy_start_date,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.date_to,
-        )
-        if self.filter_cost_center_ids:
-            query_inject_partner_params += (
-                tuple(self.filter_cost_center_ids.ids),
-            )
-        query_inject_partner_params += (
-            self.env.uid,
-        )
+            query_inject_partner_params['partner_ids'] = \
+                tuple(self.filter_partner_ids.ids)
         self.env.cr.execute(query_inject_partner, query_inject_partner_params)
 
     def _inject_line_not_centralized_values(
@@ -1070,6 +1208,11 @@ WHERE
     ra.report_id = %s
 AND
         """
+        if self.env.context.get('report_account_ids'):
+            query_inject_move_line += """
+    ra.id IN %s
+AND
+            """
         if only_unaffected_earnings_account:
             query_inject_move_line += """
     a.id = %s
@@ -1130,6 +1273,10 @@ ORDER BY
         query_inject_move_line_params += (
             self.id,
         )
+        if self.env.context.get('report_account_ids'):
+            query_inject_move_line_params += (
+                self.env.context['report_account_ids'],
+            )
         if only_unaffected_earnings_account:
             query_inject_move_line_params += (
                 self.unaffected_earnings_account.id,
@@ -1255,104 +1402,62 @@ ORDER BY
             query_inject_move_line_centralized_params
         )
 
-    def _get_unaffected_earnings_account_sub_subquery_sum_initial(
-            self
-    ):
-        """ Return subquery used to compute sum amounts on
-        unaffected earnings accounts """
-        sub_subquery_sum_amounts = """
+    def _get_unaffected_earnings_account_subquery_sum_amounts(self):
+        """ Return subquery used to compute in one pass the initial and
+        final sum amounts on unaffected earnings accounts """
+        subquery_sum_amounts = """
         SELECT
-            SUM(ml.balance) AS initial_balance,
-            0.0 AS final_balance
+            SUM(
+                CASE WHEN ml.date < %(date_from)s
+                THEN ml.balance ELSE 0.0 END
+            ) AS initial_balance,
+            SUM(ml.balance) AS final_balance
         FROM
             account_account a
-        INNER JOIN
-            account_account_type at ON a.user_type_id = at.id
         INNER JOIN
             account_move_line ml
                 ON a.id = ml.account_id
-                AND ml.date < %(date_from)s
+                AND ml.date <= %(date_to)s
             """
         if self.only_posted_moves:
-            sub_subquery_sum_amounts += """
+            subquery_sum_amounts += """
         INNER JOIN
             account_move m ON ml.move_id = m.id AND m.state = 'posted'
             """
         if self.filter_cost_center_ids:
-            sub_subquery_sum_amounts += """
+            subquery_sum_amounts += """
         INNER JOIN
             account_analytic_account aa
                 ON
                     ml.analytic_account_id = aa.id
                     AND aa.id IN %(cost_center_ids)s
             """
-        sub_subquery_sum_amounts += """
+        subquery_sum_amounts += """
         WHERE
             a.company_id = %(company_id)s
         AND a.id IN %(unaffected_earnings_account_ids)s
         """
-        return sub_subquery_sum_amounts
-
-    def _get_unaffected_earnings_account_sub_subquery_sum_final(self):
-        """ Return subquery used to compute sum amounts on
-                unaffected earnings accounts """
+        return subquery_sum_amounts
 
-        sub_subquery_sum_amounts = """
-            SELECT
-                0.0 AS initial_balance,
-                SUM(ml.balance) AS final_balance
-                """
-        sub_subquery_sum_amounts += """
-                FROM
-                    account_account a
-                INNER JOIN
-                    account_account_type at ON a.user_type_id = at.id
-                INNER JOIN
-                    account_move_line ml
-                        ON a.id = ml.account_id
-                        AND ml.date <= %(date_to)s
-                """
-        if self.only_posted_moves:
-            sub_subquery_sum_amounts += """
-                INNER JOIN
-                    account_move m ON ml.move_id = m.id AND m.state = 'posted'
-                    """
-        if self.filter_cost_center_ids:
-            sub_subquery_sum_amounts += """
-                INNER JOIN
-                    account_analytic_account aa
-                        ON
-                            ml.analytic_account_id = aa.id
-                            AND aa.id IN %(cost_center_ids)s
-                    """
-        sub_subquery_sum_amounts += """
-                WHERE
-                    a.company_id = %(company_id)s
-                AND a.id IN %(unaffected_earnings_account_ids)s
-                """
-        return sub_subquery_sum_amounts
+    def _get_unaffected_earnings_account_ids(self):
+        """ Return the profit and loss accounts
+        and the unaffected earnings account """
+        query_unaffected_earnings_account_ids = """
+            SELECT a.id
+            FROM account_account as a
+            INNER JOIN account_account_type as at
+            ON at.id = a.user_type_id
+            WHERE at.include_initial_balance = FALSE
+        """
+        self.env.cr.execute(query_unaffected_earnings_account_ids)
+        pl_account_ids = [r[0] for r in self.env.cr.fetchall()]
+        return tuple(pl_account_ids + [self.unaffected_earnings_account.id])
 
     def _inject_unaffected_earnings_account_values(self):
         """Inject the report values of the unaffected earnings account
         for report_general_ledger_account."""
-        subquery_sum_amounts = """
-            SELECT
-                SUM(COALESCE(sub.initial_balance, 0.0)) AS initial_balance,
-                SUM(COALESCE(sub.final_balance, 0.0)) AS final_balance
-            FROM
-            (
-        """
-        # Initial balances
-        subquery_sum_amounts += \
-            self._get_unaffected_earnings_account_sub_subquery_sum_initial()
-        subquery_sum_amounts += """
-                UNION
-        """
-        subquery_sum_amounts += \
-            self._get_unaffected_earnings_account_sub_subquery_sum_final()
-        subquery_sum_amounts += """
-            ) sub
-        """
+        subquery_sum_amounts = \
+            self._get_unaffected_earnings_account_subquery_sum_amounts()
 
         # pylint: disable=sql-injection
         query_inject_account = """
@@ -1406,17 +1511,7 @@ ORDER BY
         query_inject_account_params['report_id'] = self.id
         query_inject_account_params['user_id'] = self.env.uid
 
-        # Fetch the profit and loss accounts
-        query_unaffected_earnings_account_ids = """
-            SELECT a.id
-            FROM account_account as a
-            INNER JOIN account_account_type as at
-            ON at.id = a.user_type_id
-            WHERE at.include_initial_balance = FALSE
-        """
-        self.env.cr.execute(query_unaffected_earnings_account_ids)
-        pl_account_ids = [r[0] for r in self.env.cr.fetchall()]
         query_inject_account_params['unaffected_earnings_account_ids'] = \
-            tuple(pl_account_ids + [self.unaffected_earnings_account.id])
+            self._get_unaffected_earnings_account_ids()
         self.env.cr.execute(query_inject_account,
                             query_inject_account_params)
@@ -96,13 +96,121 @@ class GeneralLedgerXslx(models.AbstractModel):
     def _get_col_pos_final_balance_label(self):
         return 5
 
+    def _get_report_account_records(self, report):
+        """ Return the report accounts in the order of the streamed lines """
+        self.env.cr.execute("""
+            SELECT id
+            FROM report_general_ledger_account
+            WHERE report_id = %s
+            ORDER BY code, id
+        """, (report.id,))
+        return self.env['report_general_ledger_account'].browse(
+            [r[0] for r in self.env.cr.fetchall()]
+        )
+
+    def _get_report_partner_records(self, report):
+        """ Return the report partners by report account,
+        in the order of the streamed lines """
+        self.env.cr.execute("""
+            SELECT rp.report_account_id, rp.id
+            FROM report_general_ledger_partner rp
+            INNER JOIN report_general_ledger_account ra
+                ON rp.report_account_id = ra.id
+            WHERE ra.report_id = %s
+            ORDER BY
+                rp.report_account_id,
+                CASE WHEN rp.partner_id IS NOT NULL THEN 0 ELSE 1 END,
+                rp.name,
+                rp.id
+        """, (report.id,))
+        partner_ids = {}
+        for report_account_id, report_partner_id in self.env.cr.fetchall():
+            partner_ids.setdefault(report_account_id, []).append(
+                report_partner_id
+            )
+        partner_model = self.env['report_general_ledger_partner']
+        return {
+            report_account_id: partner_model.browse(ids)
+            for report_account_id, ids in partner_ids.items()
+        }
+
+    def _get_move_line_stream_query(self):
+        """ Return the query of the report move lines,
+        ordered by account, partner and line """
+        return """
+            SELECT
+                ra.id AS report_account_id,
+                ml.report_partner_id,
+                TO_CHAR(ml.date, 'YYYY-MM-DD') AS date,
+                ml.entry,
+                ml.journal,
+                ml.account,
+                ml.taxes_description,
+                ml.partner,
+                ml.label,
+                ml.cost_center,
+                ml.matching_number,
+                ml.debit,
+                ml.credit,
+                ml.cumul_balance,
+                c.name AS currency_id,
+                c.decimal_places AS currency_decimal_places,
+                ml.amount_currency
+            FROM
+                report_general_ledger_move_line ml
+            LEFT JOIN
+                report_general_ledger_partner rp
+                    ON ml.report_partner_id = rp.id
+            INNER JOIN
+                report_general_ledger_account ra
+                    ON ra.id = COALESCE(
+                        ml.report_account_id, rp.report_account_id
+                    )
+            LEFT JOIN
+                res_currency c ON ml.currency_id = c.id
+            WHERE
+                ra.report_id = %s
+            ORDER BY
+                ra.code,
+                ra.id,
+                CASE WHEN rp.partner_id IS NOT NULL THEN 0 ELSE 1 END,
+                rp.name,
+                rp.id,
+                ml.id
+        """
+
+    def _write_streamed_lines(self, report_account_id, report_partner_id):
+        """ Write the streamed lines of a report account or partner """
+        line = self.next_line
+        while line and line['report_account_id'] == report_account_id \
+                and line['report_partner_id'] == report_partner_id:
+            self.write_line_values(line)
+            line = next(self.move_lines, None)
+        self.next_line = line
+
+    def _skip_streamed_lines(self, report_account_id):
+        """ Skip the remaining streamed lines of a report account """
+        line = self.next_line
+        while line and line['report_account_id'] == report_account_id:
+            line = next(self.move_lines, None)
+        self.next_line = line
+
     def _generate_report_content(self, workbook, report):
+        # Move lines are read with a server side cursor,
+        # in the same order as accounts and partners are written
+        self.move_lines = self._stream_query(
+            self._get_move_line_stream_query(), (report.id,)
+        )
+        self.next_line = next(self.move_lines, None)
+        partners_by_account = self._get_report_partner_records(report)
+
         # For each account
-        for account in report.account_ids:
+        for account in self._get_report_account_records(report):
             # Write account title
             self.write_array_title(account.code + ' - ' + account.name)
 
-            if not account.partner_ids:
+            partners = partners_by_account.get(account.id)
+            if not partners:
                 # Display array header for move lines
                 self.write_array_header()
 
@@ -110,12 +218,11 @@ class GeneralLedgerXslx(models.AbstractModel):
                 self.write_initial_balance(account)
 
                 # Display account move lines
-                for line in account.move_line_ids:
-                    self.write_line(line)
+                self._write_streamed_lines(account.id, None)
 
             else:
                 # For each partner
-                for partner in account.partner_ids:
+                for partner in partners:
                     # Write partner title
                     self.write_array_title(partner.name)
 
@@ -126,8 +233,7 @@ class GeneralLedgerXslx(models.AbstractModel):
                     self.write_initial_balance(partner)
 
                     # Display account move lines
-                    for line in partner.move_line_ids:
-                        self.write_line(line)
+                    self._write_streamed_lines(account.id, partner.id)
 
                     # Display ending balance line for partner
                     self.write_ending_balance(partner)
@@ -135,12 +241,17 @@ class GeneralLedgerXslx(models.AbstractModel):
                     # Line break
                     self.row_pos += 1
 
+            self._skip_streamed_lines(account.id)
+
             # Display ending balance line for account
             self.write_ending_balance(account)
 
             # 2 lines break
             self.row_pos += 2
 
+        # Release the server side cursor
+        self.move_lines.close()
+
     def write_initial_balance(self, my_object):
         """Specific function to write initial balance for General Ledger"""
         if 'partner' in my_object._name:
@@ -77,7 +77,12 @@ class ReportJournalLedger(models.TransientModel):
 
     @api.multi
     def compute_data_for_report(self):
+        """ Compute the lines of the report, only inserted: a report
+        already computed is left as is, see
+        `compute_data_for_fresh_report` to compute it again. """
         self.ensure_one()
+        if self._has_report_values():
+            return
         self._inject_journal_values()
         self._inject_move_values()
         self._inject_move_line_values()
@@ -91,17 +96,34 @@ class ReportJournalLedger(models.TransientModel):
         self.invalidate_cache()
 
     @api.multi
-    def _inject_journal_values(self):
+    def compute_data_for_fresh_report(self):
+        """ Return the report computed, into a copy when it was computed
+        before.
+
+        Recomputing a report in place would delete its lines first, which
+        leaves as many dead rows to vacuum. The lines of a fresh report are
+        only inserted: the former report is left as is, and dropped with
+        the other transient records by the vacuum.
+        """
         self.ensure_one()
-        sql = """
-            DELETE
+        report = self.copy() if self._has_report_values() else self
+        report.compute_data_for_report()
+        return report
+
+    @api.multi
+    def _has_report_values(self):
+        self.ensure_one()
+        self.env.cr.execute("""
+            SELECT 1
             FROM report_journal_ledger_journal
             WHERE report_id = %s
-        """
-        params = (
-            self.id,
-        )
-        self.env.cr.execute(sql, params)
+            LIMIT 1
+        """, (self.id,))
+        return bool(self.env.cr.fetchone())
+
+    @api.multi
+    def _inject_journal_values(self):
+        self.ensure_one()
         sql = """
             INSERT INTO report_journal_ledger_journal (
                 create_uid,
@@ -144,15 +166,6 @@ class ReportJournalLedger(models.TransientModel):
     @api.multi
     def _inject_move_values(self):
         self.ensure_one()
-        sql = """
-            DELETE
-            FROM report_journal_ledger_move
-            WHERE report_id = %s
-        """
-        params = (
-            self.id,
-        )
-        self.env.cr.execute(sql, params)
         sql = self._get_inject_move_insert()
         sql += self._get_inject_move_select()
         sql += self._get_inject_move_where_clause()
@@ -239,16 +252,33 @@ class ReportJournalLedger(models.TransientModel):
     @api.multi
     def _inject_move_line_values(self):
         self.ensure_one()
+        # The taxes of the base lines are aggregated once for all the lines
+        # of the report, instead of once per line
         sql = """
-            DELETE
-            FROM report_journal_ledger_move_line
-            WHERE report_id = %s
-        """
-        params = (
-            self.id,
-        )
-        self.env.cr.execute(sql, params)
-        sql = """
+            WITH
+                base_taxes AS (
+                    SELECT
+                        aml_at_rel.account_move_line_id,
+                        array_to_string(
+                            array_agg(COALESCE(at.description, at.name)),
+                            ', ') AS taxes_description
+                    FROM
+                        report_journal_ledger_move rjqm
+                    INNER JOIN
+                        account_move_line aml
+                            on (aml.move_id = rjqm.move_id)
+                    INNER JOIN
+                        account_move_line_account_tax_rel aml_at_rel
+                            on (aml_at_rel.account_move_line_id = aml.id)
+                    LEFT JOIN
+                        account_tax at
+                            on (at.id = aml_at_rel.account_tax_id)
+                    WHERE
+                        rjqm.report_id = %s
+                    AND aml.tax_line_id is null
+                    GROUP BY
+                        aml_at_rel.account_move_line_id
+                )
             INSERT INTO report_journal_ledger_move_line (
                 create_uid,
                 create_date,
@@ -303,21 +333,8 @@ class ReportJournalLedger(models.TransientModel):
                       aml.tax_line_id is not null
                 THEN
                     COALESCE(at.description, at.name)
-                WHEN
-                    aml.tax_line_id is null
-                THEN
-                    (SELECT
-                      array_to_string(
-                          array_agg(COALESCE(at.description, at.name)
-                      ), ', ')
-                    FROM
-                        account_move_line_account_tax_rel aml_at_rel
-                    LEFT JOIN
-                        account_tax at on (at.id = aml_at_rel.account_tax_id)
-                    WHERE
-                        aml_at_rel.account_move_line_id = aml.id)
                 ELSE
-                    ''
+                    base_taxes.taxes_description
                 END as taxes_description,
                 aml.company_id as company_id
             FROM
@@ -337,10 +354,14 @@ class ReportJournalLedger(models.TransientModel):
             LEFT JOIN
                 res_currency currency
                     on (currency.id = aml.currency_id)
+            LEFT JOIN
+                base_taxes
+                    on (base_taxes.account_move_line_id = aml.id)
             WHERE
                 rjqm.report_id = %s
         """
         params = (
+            self.id,
             self.env.uid,
             self.id,
         )
@@ -437,15 +458,6 @@ class ReportJournalLedger(models.TransientModel):
     @api.multi
     def _inject_journal_tax_values(self):
         self.ensure_one()
-        sql = """
-            DELETE
-            FROM report_journal_ledger_journal_tax_line
-            WHERE report_id = %s
-        """
-        params = (
-            self.id,
-        )
-        self.env.cr.execute(sql, params)
         sql_distinct_tax_id = """
             SELECT
                 distinct(jrqml.tax_id)
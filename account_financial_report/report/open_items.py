@@ -2,6 +2,8 @@
 # © 2016 Julien Coux (Camptocamp)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+from functools import partial
+
 from odoo import models, fields, api, _
 
 
@@ -17,6 +19,7 @@ class OpenItemsReport(models.TransientModel):
     """
 
     _name = 'report_open_items'
+    _inherit = 'account_financial_report_abstract'
 
     # Filters fields, used for data computation
     date_at = fields.Date()
@@ -164,30 +167,58 @@ class OpenItemsReportCompute(models.TransientModel):
         context = dict(self.env.context)
         report = self.browse(context.get('active_id'))
         if report:
+            # Only the first page of the accounts, the widget fetches
+            # the next pages with `get_html_page`
+            pages = report._get_html_pages()
+            accounts = report._get_html_page(*pages[0])
             rcontext['o'] = report
+            rcontext['accounts'] = accounts
             result['html'] = self.env.ref(
                 'account_financial_report.report_open_items').render(
                     rcontext)
+            result['next_pages'] = pages[1:]
         return result
 
     @api.model
     def get_html(self, given_context=None):
         return self._get_html()
 
+    def _get_html_line_counts(self):
+        self.env.cr.execute("""
+            SELECT rp.report_account_id, COUNT(*)
+            FROM report_open_items_move_line ml
+            INNER JOIN report_open_items_partner rp
+                ON rp.id = ml.report_partner_id
+            INNER JOIN report_open_items_account ra
+                ON ra.id = rp.report_account_id
+            WHERE ra.report_id = %(report_id)s
+            GROUP BY rp.report_account_id
+        """, {'report_id': self.id})
+        return dict(self.env.cr.fetchall())
+
+    def _get_html_page_template(self):
+        return 'account_financial_report.report_open_items_accounts'
+
     @api.multi
     def compute_data_for_report(self):
         self.ensure_one()
         # Compute report data
-        self._inject_account_values()
-        self._inject_partner_values()
-        self._inject_line_values()
-        self._inject_line_values(only_empty_partner_line=True)
-        self._clean_partners_and_accounts()
-        self._compute_partners_and_accounts_cumul()
+        steps = [
+            (_('Accounts'), self._inject_account_values),
+            (_('Partners'), self._inject_partner_values),
+            (_('Move lines'), self._inject_line_values),
+            (_('Move lines'),
+             partial(self._inject_line_values, only_empty_partner_line=True)),
+            (_('Cleaning'), self._clean_partners_and_accounts),
+            (_('Cumulative amounts'),
+             self._compute_partners_and_accounts_cumul),
+        ]
         if self.hide_account_balance_at_0:
-            self._clean_partners_and_accounts(
-                only_delete_account_balance_at_0=True
-            )
+            steps.append((
+                _('Cleaning'),
+                partial(self._clean_partners_and_accounts,
+                        only_delete_account_balance_at_0=True)))
+        self._run_compute_steps(steps)
         # Refresh cache because all data are computed with SQL requests
         self.invalidate_cache()
 
@@ -364,28 +395,26 @@ FROM
         )
         self.env.cr.execute(query_inject_partner, query_inject_partner_params)
 
-    def _get_line_sub_query_move_lines(self,
-                                       only_empty_partner_line=False,
-                                       positive_balance=True):
-        """ Return subquery used to compute sum amounts on lines """
+    def _get_line_sub_query_move_lines(self, only_empty_partner_line=False):
+        """ Return subquery used to compute sum amounts on lines.
+
+        The amounts reconciled at the report date are read from
+        account_partial_reconcile_date: the partial reconciliations of the
+        debit lines with a positive balance, of the credit lines with a
+        negative balance, with a counterpart dated up to the report date.
+        """
         sub_query = """
             SELECT
                 ml.id,
                 ml.balance,
                 SUM(
-                    CASE
-                        WHEN ml_past.id IS NOT NULL
-                        THEN pr.amount
-                        ELSE NULL
-                    END
+                    CASE WHEN prd.counterpart_date <= %(date_at)s
+                    THEN prd.amount END
                 ) AS partial_amount,
                 ml.amount_currency,
                 SUM(
-                    CASE
-                        WHEN ml_past.id IS NOT NULL
-                        THEN pr.amount_currency
-                        ELSE NULL
-                    END
+                    CASE WHEN prd.counterpart_date <= %(date_at)s
+                    THEN prd.amount_currency END
                 ) AS partial_amount_currency,
                 ml.currency_id
             FROM
@@ -405,37 +434,14 @@ FROM
             sub_query += """
                     AND ml.partner_id IS NULL
             """
-        if not positive_balance:
-            sub_query += """
-            LEFT JOIN
-                account_partial_reconcile pr
-                    ON ml.balance < 0 AND pr.credit_move_id = ml.id
-            LEFT JOIN
-                account_move_line ml_future
-                    ON ml.balance < 0 AND pr.debit_move_id = ml_future.id
-                    AND ml_future.date > %s
-            LEFT JOIN
-                account_move_line ml_past
-                    ON ml.balance < 0 AND pr.debit_move_id = ml_past.id
-                    AND ml_past.date <= %s
-            """
-        else:
-            sub_query += """
-            LEFT JOIN
-                account_partial_reconcile pr
-                    ON ml.balance > 0 AND pr.debit_move_id = ml.id
-            LEFT JOIN
-                account_move_line ml_future
-                    ON ml.balance > 0 AND pr.credit_move_id = ml_future.id
-                    AND ml_future.date > %s
-            LEFT JOIN
-                account_move_line ml_past
-                    ON ml.balance > 0 AND pr.credit_move_id = ml_past.id
-                    AND ml_past.date <= %s
-        """
         sub_query += """
+            LEFT JOIN
+                account_partial_reconcile_date prd
+                    ON prd.move_line_id = ml.id
+                    AND ml.balance != 0
+                    AND prd.debit_move = (ml.balance > 0)
             WHERE
-                ra.report_id = %s
+                ra.report_id = %(report_id)s
             GROUP BY
                 ml.id,
                 ml.balance,
@@ -443,7 +449,7 @@ FROM
             HAVING
                 (
                     ml.full_reconcile_id IS NULL
-                    OR MAX(ml_future.id) IS NOT NULL
+                    OR BOOL_OR(prd.counterpart_date > %(date_at)s)
                 )
         """
         return sub_query
@@ -461,14 +467,6 @@ WITH
         """
         query_inject_move_line += self._get_line_sub_query_move_lines(
             only_empty_partner_line=only_empty_partner_line,
-            positive_balance=True
-        )
-        query_inject_move_line += """
-            UNION
-        """
-        query_inject_move_line += self._get_line_sub_query_move_lines(
-            only_empty_partner_line=only_empty_partner_line,
-            positive_balance=False
         )
         query_inject_move_line += """
         ),
@@ -527,7 +525,7 @@ INSERT INTO
     )
 SELECT
     rp.id AS report_partner_id,
-    %s AS create_uid,
+    %(uid)s AS create_uid,
     NOW() AS create_date,
     ml.id AS move_line_id,
     ml.date,
@@ -587,9 +585,9 @@ LEFT JOIN
 LEFT JOIN
     res_currency c ON ml2.currency_id = c.id
 WHERE
-    ra.report_id = %s
+    ra.report_id = %(report_id)s
 AND
-    ml.date <= %s
+    ml.date <= %(date_at)s
         """
         if self.only_posted_moves:
             query_inject_move_line += """
@@ -615,15 +613,9 @@ ORDER BY
             """
         self.env.cr.execute(
             query_inject_move_line,
-            (self.date_at,
-             self.date_at,
-             self.id,
-             self.date_at,
-             self.date_at,
-             self.id,
-             self.env.uid,
-             self.id,
-             self.date_at,)
+            {'date_at': self.date_at,
+             'report_id': self.id,
+             'uid': self.env.uid}
         )
 
     def _compute_partners_and_accounts_cumul(self):
@@ -634,210 +626,111 @@ ORDER BY
         self._compute_account_cumul()
 
     def _compute_partner_cumul(self):
-        where_condition_partner_by_account = """
-WHERE
-    id IN
-        (
-            SELECT
-                rp.id
-            FROM
-                report_open_items_account ra
-            INNER JOIN
-                report_open_items_partner rp
-                    ON ra.id = rp.report_account_id
-            WHERE
-                ra.report_id = %s
-        )"""
-        query_computer_partner_residual_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    final_amount_residual =
-        (
-            SELECT
-                SUM(rml.amount_residual) AS final_amount_residual
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account
-        params_compute_partners_residual_cumul = (self.id,)
-        self.env.cr.execute(query_computer_partner_residual_cumul,
-                            params_compute_partners_residual_cumul)
-
-        query_compute_partners_due_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    final_amount_total_due =
-        (
-            SELECT
-                SUM(rml.amount_total_due) AS final_amount_total_due
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account
-        params_compute_partner_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_due_cumul,
-                            params_compute_partner_due_cumul)
+        """ Compute all the cumulative amounts of the partners
+        from their move lines in a single pass.
 
-        # Manage currency in partner
-        where_condition_partner_by_account_cur = """
-WHERE
-    id IN
+        The currency amounts are only computed for the accounts
+        with a currency. """
+        query_compute_partners_cumul = """
+WITH
+    cumul AS
         (
             SELECT
-                rp.id
+                rp.id,
+                ra.currency_id IS NOT NULL AS with_currency,
+                SUM(rml.amount_residual) AS final_amount_residual,
+                SUM(rml.amount_total_due) AS final_amount_total_due,
+                MAX(rml.currency_id) AS currency_id,
+                SUM(rml.amount_residual_currency)
+                    AS final_amount_residual_currency,
+                SUM(rml.amount_total_due_currency)
+                    AS final_amount_total_due_currency
             FROM
                 report_open_items_account ra
             INNER JOIN
                 report_open_items_partner rp
                     ON ra.id = rp.report_account_id
-            WHERE
-                ra.report_id = %s AND ra.currency_id IS NOT NULL
-        )
-        """
-        query_compute_partners_cur_id_cumul = """
-UPDATE
-    report_open_items_partner
-SET
-    currency_id =
-        (
-            SELECT
-                MAX(currency_id) as currency_id
-            FROM
+            LEFT JOIN
                 report_open_items_move_line rml
+                    ON rml.report_partner_id = rp.id
             WHERE
-                rml.report_partner_id = report_open_items_partner.id
+                ra.report_id = %s
+            GROUP BY
+                rp.id,
+                ra.currency_id
         )
-""" + where_condition_partner_by_account_cur
-        params_compute_partners_cur_id_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_cur_id_cumul,
-                            params_compute_partners_cur_id_cumul)
-
-        query_compute_partners_cur_residual_cumul = """
 UPDATE
     report_open_items_partner
 SET
+    final_amount_residual = cumul.final_amount_residual,
+    final_amount_total_due = cumul.final_amount_total_due,
+    currency_id =
+        CASE
+            WHEN cumul.with_currency
+            THEN cumul.currency_id
+            ELSE report_open_items_partner.currency_id
+        END,
     final_amount_residual_currency =
-        (
-            SELECT
-                SUM(rml.amount_residual_currency)
-                    AS final_amount_residual_currency
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account_cur
-        params_compute_partners_cur_residual_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_cur_residual_cumul,
-                            params_compute_partners_cur_residual_cumul)
-
-        query_compute_partners_cur_due_cumul = """
-UPDATE
-    report_open_items_partner
-SET
+        CASE
+            WHEN cumul.with_currency
+            THEN cumul.final_amount_residual_currency
+            ELSE report_open_items_partner.final_amount_residual_currency
+        END,
     final_amount_total_due_currency =
-        (
-            SELECT
-                SUM(rml.amount_total_due_currency)
-                    AS  final_amount_total_due_currency
-            FROM
-                report_open_items_move_line rml
-            WHERE
-                rml.report_partner_id = report_open_items_partner.id
-        )
-""" + where_condition_partner_by_account_cur
-        params_compute_partners_cur_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_partners_cur_due_cumul,
-                            params_compute_partners_cur_due_cumul)
-
-    def _compute_account_cumul(self):
-        query_compute_accounts_residual_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_residual =
-        (
-            SELECT
-                SUM(rp.final_amount_residual) AS final_amount_residual
-            FROM
-                report_open_items_partner rp
-            WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
+        CASE
+            WHEN cumul.with_currency
+            THEN cumul.final_amount_total_due_currency
+            ELSE report_open_items_partner.final_amount_total_due_currency
+        END
+FROM
+    cumul
 WHERE
-    report_id  = %s
+    report_open_items_partner.id = cumul.id
         """
-        params_compute_accounts_residual_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_residual_cumul,
-                            params_compute_accounts_residual_cumul)
+        params_compute_partners_cumul = (self.id,)
+        self.env.cr.execute(query_compute_partners_cumul,
+                            params_compute_partners_cumul)
 
-        query_compute_accounts_cur_residual_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_residual_currency =
+    def _compute_account_cumul(self):
+        """ Compute all the cumulative amounts of the accounts
+        from their partners in a single pass. """
+        query_compute_accounts_cumul = """
+WITH
+    cumul AS
         (
             SELECT
+                ra.id,
+                SUM(rp.final_amount_residual) AS final_amount_residual,
                 SUM(rp.final_amount_residual_currency)
-                    AS final_amount_residual_currency
-            FROM
-                report_open_items_partner rp
-            WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
-WHERE
-    report_id = %s
-        """
-        params_compute_accounts_cur_residual_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_cur_residual_cumul,
-                            params_compute_accounts_cur_residual_cumul)
-
-        query_compute_accounts_due_cumul = """
-UPDATE
-    report_open_items_account
-SET
-    final_amount_total_due =
-        (
-            SELECT
-                SUM(rp.final_amount_total_due) AS final_amount_total_due
+                    AS final_amount_residual_currency,
+                SUM(rp.final_amount_total_due) AS final_amount_total_due,
+                SUM(rp.final_amount_total_due_currency)
+                    AS final_amount_total_due_currency
             FROM
+                report_open_items_account ra
+            LEFT JOIN
                 report_open_items_partner rp
+                    ON rp.report_account_id = ra.id
             WHERE
-                rp.report_account_id = report_open_items_account.id
+                ra.report_id = %s
+            GROUP BY
+                ra.id
         )
-WHERE
-    report_id = %s
-        """
-        params_compute_accounts_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_due_cumul,
-                            params_compute_accounts_due_cumul)
-
-        query_compute_accounts_cur_due_cumul = """
 UPDATE
     report_open_items_account
 SET
-    final_amount_total_due_currency =
-        (
-            SELECT
-                SUM(rp.final_amount_total_due_currency)
-                    AS final_amount_total_due_currency
-            FROM
-                report_open_items_partner rp
-            WHERE
-                rp.report_account_id = report_open_items_account.id
-        )
+    final_amount_residual = cumul.final_amount_residual,
+    final_amount_residual_currency = cumul.final_amount_residual_currency,
+    final_amount_total_due = cumul.final_amount_total_due,
+    final_amount_total_due_currency = cumul.final_amount_total_due_currency
+FROM
+    cumul
 WHERE
-    report_id = %s
+    report_open_items_account.id = cumul.id
         """
-        params_compute_accounts_cur_due_cumul = (self.id,)
-        self.env.cr.execute(query_compute_accounts_cur_due_cumul,
-                            params_compute_accounts_cur_due_cumul)
+        params_compute_accounts_cumul = (self.id,)
+        self.env.cr.execute(query_compute_accounts_cumul,
+                            params_compute_accounts_cumul)
 
     def _clean_partners_and_accounts(self,
                                      only_delete_account_balance_at_0=False):
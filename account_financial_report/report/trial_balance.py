@@ -2,7 +2,9 @@
 # © 2018 Forest and Biomass Romania SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import models, fields, api
+from functools import partial
+
+from odoo import models, fields, api, _
 
 
 class TrialBalanceReport(models.TransientModel):
@@ -17,6 +19,7 @@ class TrialBalanceReport(models.TransientModel):
     """
 
     _name = 'report_trial_balance'
+    _inherit = 'account_financial_report_abstract'
 
     # Filters fields, used for data computation
     date_from = fields.Date()
@@ -37,6 +40,8 @@ class TrialBalanceReport(models.TransientModel):
 
     # General Ledger Report Data fields,
     # used as base for compute the data reports
+    # if compute_from_general_ledger is selected
+    compute_from_general_ledger = fields.Boolean()
     general_ledger_id = fields.Many2one(
         comodel_name='report_general_ledger'
     )
@@ -80,6 +85,9 @@ class TrialBalanceReportAccount(models.TransientModel):
         string="Accounts")
     compute_account_ids = fields.Many2many(
         'account.account',
+        relation='account_account_report_trial_balance_account_rel',
+        column1='report_trial_balance_account_id',
+        column2='account_account_id',
         string="Accounts", store=True)
 
     # Data fields, used for report display
@@ -193,44 +201,145 @@ class TrialBalanceReportCompute(models.TransientModel):
     @api.multi
     def compute_data_for_report(self):
         self.ensure_one()
-        # Compute General Ledger Report Data.
-        # The data of Trial Balance Report
-        # are based on General Ledger Report data.
-        model = self.env['report_general_ledger']
         if self.filter_account_ids:
             account_ids = self.filter_account_ids
         else:
             account_ids = self.env['account.account'].search(
                 [('company_id', '=', self.company_id.id)])
-        self.general_ledger_id = model.create(
-            self._prepare_report_general_ledger(account_ids)
-        )
-        self.general_ledger_id.compute_data_for_report(
-            with_line_details=False, with_partners=self.show_partner_details
-        )
+        steps = []
+        if self.compute_from_general_ledger:
+            # Compute General Ledger Report Data.
+            # The data of Trial Balance Report
+            # are based on General Ledger Report data.
+            model = self.env['report_general_ledger']
+            self.general_ledger_id = model.create(
+                self._prepare_report_general_ledger(account_ids)
+            )
+            # The General Ledger is a single step of the Trial Balance,
+            # it does not report its own progress.
+            general_ledger = self.general_ledger_id.with_context(
+                report_job_id=False)
+            steps.append((
+                _('General ledger'),
+                partial(general_ledger.compute_data_for_report,
+                        with_line_details=False,
+                        with_partners=self.show_partner_details)))
 
         # Compute report data
-        self._inject_account_values(account_ids)
+        steps.append((
+            _('Accounts'), partial(self._inject_account_values, account_ids)))
         if self.show_partner_details:
-            self._inject_partner_values()
+            steps.append((_('Partners'), self._inject_partner_values))
         if not self.filter_account_ids:
-            self._inject_account_group_values()
+            steps.append((
+                _('Account groups'), self._inject_account_group_values))
             if self.hierarchy_on == 'computed':
-                self._update_account_group_computed_values()
+                steps.append((
+                    _('Account groups'),
+                    self._update_account_group_computed_values))
             else:
-                self._update_account_group_child_values()
-            self._update_account_sequence()
-            self._add_account_group_account_values()
+                steps.append((
+                    _('Account groups'),
+                    self._update_account_group_child_values))
+            steps.append((_('Account groups'), self._update_account_sequence))
+            steps.append((
+                _('Account groups'), self._add_account_group_account_values))
+        self._run_compute_steps(steps)
         self.refresh()
-        if not self.filter_account_ids:
-            self._compute_group_accounts()
-        else:
+        if self.filter_account_ids:
             for line in self.account_ids:
                 line.write({'level': 0})
 
+    def _new_report_general_ledger(self, account_ids):
+        """ Return a General Ledger report in memory, only used to build
+        the queries computing the values from the journal items. """
+        return self.env['report_general_ledger'].new(
+            self._prepare_report_general_ledger(account_ids))
+
+    def _get_general_ledger_query(self, account_ids):
+        """ Return the query selecting the General Ledger account values
+        directly from the journal items, without injecting them
+        in report_general_ledger_account, and its parameters. """
+        general_ledger = self._new_report_general_ledger(account_ids)
+        use_period_balance = general_ledger._use_period_balance()
+        # pylint: disable=sql-injection
+        query_general_ledger = """
+    accounts AS
+        ( """ + general_ledger._get_accounts_query() + """
+        ),
+    sum_amounts AS ( """ + general_ledger._get_account_subquery_sum_amounts(
+            use_period_balance
+        ) + """ ),
+    unaffected_sum_amounts AS ( """ + general_ledger.\
+            _get_unaffected_earnings_account_subquery_sum_amounts() + """ ),
+    general_ledger_accounts AS
+        (
+            SELECT
+                a.id AS account_id,
+                """ + general_ledger._get_sum_amounts_select() + """
+            FROM
+                accounts a
+            INNER JOIN
+                sum_amounts s ON a.id = s.account_id
+            LEFT JOIN
+                res_currency c ON c.id = a.currency_id
+            """ + general_ledger._get_sum_amounts_where() + """
+            UNION ALL
+            SELECT
+                a.id AS account_id,
+                NULL AS initial_debit,
+                NULL AS initial_credit,
+                COALESCE(i.initial_balance, 0.0) AS initial_balance,
+                c.id AS currency_id,
+                NULL AS initial_balance_foreign_currency,
+                NULL AS final_debit,
+                NULL AS final_credit,
+                COALESCE(i.final_balance, 0.0) AS final_balance,
+                NULL AS final_balance_foreign_currency
+            FROM
+                account_account a
+            LEFT JOIN
+                res_currency c ON c.id = a.currency_id,
+                unaffected_sum_amounts i
+            WHERE
+                a.company_id = %(company_id)s
+            AND a.id = %(unaffected_earnings_account_id)s
+        )
+        """
+        query_general_ledger_params = general_ledger._get_sum_amounts_params(
+            use_period_balance
+        )
+        query_general_ledger_params.update(
+            general_ledger._get_accounts_query_params())
+        query_general_ledger_params['unaffected_earnings_account_ids'] = \
+            general_ledger._get_unaffected_earnings_account_ids()
+        return query_general_ledger, query_general_ledger_params
+
     def _inject_account_values(self, account_ids):
-        """Inject report values for report_trial_balance_account"""
-        query_inject_account = """
+        """Inject report values for report_trial_balance_account.
+
+        Without General Ledger report, the account values are computed
+        from the journal items in the same query.
+        """
+        if self.general_ledger_id:
+            query_inject_account = ""
+            general_ledger_accounts_join = """
+    LEFT OUTER JOIN report_general_ledger_account AS rag
+        ON rag.account_id = acc.id AND rag.report_id = %(general_ledger_id)s
+            """
+            query_inject_account_params = {
+                'general_ledger_id': self.general_ledger_id.id,
+            }
+        else:
+            query_general_ledger, query_inject_account_params = \
+                self._get_general_ledger_query(account_ids)
+            query_inject_account = "WITH " + query_general_ledger
+            general_ledger_accounts_join = """
+    LEFT OUTER JOIN general_ledger_accounts AS rag
+        ON rag.account_id = acc.id
+            """
+        # pylint: disable=sql-injection
+        query_inject_account += """
 INSERT INTO
     report_trial_balance_account
     (
@@ -250,8 +359,8 @@ INSERT INTO
     final_balance_foreign_currency
     )
 SELECT
-    %s AS report_id,
-    %s AS create_uid,
+    %(report_id)s AS report_id,
+    %(user_id)s AS create_uid,
     NOW() AS create_date,
     acc.id,
     acc.group_id,
@@ -268,24 +377,24 @@ SELECT
         AS final_balance_foreign_currency
 FROM
     account_account acc
-    LEFT OUTER JOIN report_general_ledger_account AS rag
-        ON rag.account_id = acc.id AND rag.report_id = %s
+        """ + general_ledger_accounts_join + """
 WHERE
-    acc.id in %s
+    acc.id in %(trial_balance_account_ids)s
         """
         if self.hide_account_balance_at_0:
             query_inject_account += """ AND
     final_balance IS NOT NULL AND final_balance != 0"""
-        query_inject_account_params = (
-            self.id,
-            self.env.uid,
-            self.general_ledger_id.id,
-            account_ids._ids,
-        )
+        query_inject_account_params.update({
+            'report_id': self.id,
+            'user_id': self.env.uid,
+            'trial_balance_account_ids': account_ids._ids,
+        })
         self.env.cr.execute(query_inject_account, query_inject_account_params)
 
     def _inject_partner_values(self):
         """Inject report values for report_trial_balance_partner"""
+        if not self.general_ledger_id:
+            return self._inject_partner_values_from_move_lines()
         query_inject_partner = """
 INSERT INTO
     report_trial_balance_partner
@@ -331,6 +440,125 @@ AND ra.report_id = %s
         )
         self.env.cr.execute(query_inject_partner, query_inject_partner_params)
 
+    def _inject_partner_values_from_move_lines(self):
+        """Inject report values for report_trial_balance_partner
+        directly from the journal items, in one query for the partners
+        and the journal items without partner."""
+        general_ledger = self._new_report_general_ledger(
+            self.filter_account_ids)
+        use_period_balance = general_ledger._use_period_balance()
+        # pylint: disable=sql-injection
+        query_inject_partner = """
+WITH
+    accounts_partners AS
+        (
+            SELECT
+                ra.id AS report_account_id,
+                a.id AS account_id,
+                at.include_initial_balance AS include_initial_balance,
+                p.id AS partner_id,
+                COALESCE(
+                    CASE
+                        WHEN
+                            NULLIF(p.name, '') IS NOT NULL
+                            AND NULLIF(p.ref, '') IS NOT NULL
+                        THEN p.name || ' (' || p.ref || ')'
+                        ELSE p.name
+                    END,
+                    '""" + _('No partner allocated') + """'
+                ) AS partner_name
+            FROM
+                report_trial_balance_account ra
+            INNER JOIN
+                account_account a ON ra.account_id = a.id
+            INNER JOIN
+                account_account_type at ON a.user_type_id = at.id
+            INNER JOIN
+                account_move_line ml ON a.id = ml.account_id
+            LEFT JOIN
+                res_partner p ON ml.partner_id = p.id
+            WHERE
+                ra.report_id = %(report_id)s
+            AND
+                a.internal_type IN ('payable', 'receivable')
+        """
+        if self.filter_partner_ids:
+            query_inject_partner += """
+            AND
+                p.id IN %(partner_ids)s
+            """
+        query_inject_partner += """
+            GROUP BY
+                ra.id,
+                a.id,
+                p.id,
+                at.include_initial_balance
+        ),
+    sum_amounts AS ( """ + general_ledger._get_partner_subquery_sum_amounts(
+            None, use_period_balance
+        ) + """ ),
+    general_ledger_partners AS
+        (
+            SELECT
+                ap.report_account_id,
+                ap.partner_id,
+                ap.partner_name,
+                """ + general_ledger._get_sum_amounts_select() + """
+            FROM
+                accounts_partners ap
+            INNER JOIN
+                sum_amounts s
+                    ON
+                        COALESCE(ap.partner_id, 0) = COALESCE(s.partner_id, 0)
+                        AND ap.account_id = s.account_id
+            INNER JOIN
+                account_account ac ON ac.id = ap.account_id
+            LEFT JOIN
+                res_currency c ON ac.currency_id = c.id
+            """ + general_ledger._get_sum_amounts_where() + """
+        )
+INSERT INTO
+    report_trial_balance_partner
+    (
+    report_account_id,
+    create_uid,
+    create_date,
+    partner_id,
+    name,
+    initial_balance,
+    initial_balance_foreign_currency,
+    debit,
+    credit,
+    final_balance,
+    final_balance_foreign_currency
+    )
+SELECT
+    rpg.report_account_id,
+    %(user_id)s AS create_uid,
+    NOW() AS create_date,
+    rpg.partner_id,
+    rpg.partner_name,
+    rpg.initial_balance AS initial_balance,
+    rpg.initial_balance_foreign_currency AS initial_balance_foreign_currency,
+    rpg.final_debit - rpg.initial_debit AS debit,
+    rpg.final_credit - rpg.initial_credit AS credit,
+    rpg.final_balance AS final_balance,
+    rpg.final_balance_foreign_currency AS final_balance_foreign_currency
+FROM
+    general_ledger_partners rpg
+        """
+        query_inject_partner_params = general_ledger._get_sum_amounts_params(
+            use_period_balance
+        )
+        query_inject_partner_params.update({
+            'report_id': self.id,
+            'user_id': self.env.uid,
+        })
+        if self.filter_partner_ids:
+            query_inject_partner_params['partner_ids'] = \
+                tuple(self.filter_partner_ids.ids)
+        self.env.cr.execute(query_inject_partner, query_inject_partner_params)
+
     def _inject_account_group_values(self):
         """Inject report values for report_trial_balance_account"""
         query_inject_account_group = """
@@ -366,36 +594,39 @@ FROM
         self.env.cr.execute(query_inject_account_group,
                             query_inject_account_params)
 
-    def _update_account_group_child_values(self):
-        """Compute values for report_trial_balance_account group in child."""
+    def _get_account_group_values_query(self):
+        """ Return the query summing the account values of the report
+        for each account group of a hierarchy,
+        through account_group_closure. """
+        return """
+SELECT
+    c.ancestor_id AS account_group_id,
+    coalesce(sum(ra.initial_balance), 0) AS initial_balance,
+    coalesce(sum(ra.initial_balance_foreign_currency), 0)
+        AS initial_balance_foreign_currency,
+    coalesce(sum(ra.debit), 0) AS debit,
+    coalesce(sum(ra.credit), 0) AS credit,
+    coalesce(sum(ra.final_balance), 0) AS final_balance,
+    coalesce(sum(ra.final_balance_foreign_currency), 0)
+        AS final_balance_foreign_currency,
+    array_agg(ra.account_id ORDER BY ra.account_id) AS child_account_ids
+FROM
+    report_trial_balance_account ra
+INNER JOIN
+    account_group_closure c
+        ON c.account_id = ra.account_id AND c.hierarchy = %(hierarchy)s
+WHERE
+    ra.report_id = %(report_id)s
+GROUP BY
+    c.ancestor_id
+        """
+
+    def _update_account_group_values(self, hierarchy):
+        """Compute values for report_trial_balance_account group."""
+        # pylint: disable=sql-injection
         query_update_account_group = """
-WITH computed AS (WITH RECURSIVE cte AS (
-   SELECT account_group_id, code, account_group_id AS parent_id,
-    initial_balance, initial_balance_foreign_currency, debit, credit,
-    final_balance, final_balance_foreign_currency
-   FROM   report_trial_balance_account
-   WHERE report_id = %s
-   GROUP BY report_trial_balance_account.id
-
-   UNION  ALL
-   SELECT c.account_group_id, c.code, p.account_group_id,
-    p.initial_balance, p.initial_balance_foreign_currency, p.debit, p.credit,
-    p.final_balance, p.final_balance_foreign_currency
-   FROM   cte c
-   JOIN   report_trial_balance_account p USING (parent_id)
-    WHERE p.report_id = %s
-)
-SELECT account_group_id, code,
-    sum(initial_balance) AS initial_balance,
-    sum(initial_balance_foreign_currency) AS initial_balance_foreign_currency,
-    sum(debit) AS debit,
-    sum(credit) AS credit,
-    sum(final_balance) AS final_balance,
-    sum(final_balance_foreign_currency) AS final_balance_foreign_currency
-FROM   cte
-GROUP BY cte.account_group_id, cte.code
-ORDER BY account_group_id
-)
+WITH
+    computed AS (""" + self._get_account_group_values_query() + """)
 UPDATE report_trial_balance_account
 SET initial_balance = computed.initial_balance,
     initial_balance_foreign_currency =
@@ -407,92 +638,61 @@ SET initial_balance = computed.initial_balance,
         computed.final_balance_foreign_currency
 FROM computed
 WHERE report_trial_balance_account.account_group_id = computed.account_group_id
-    AND report_trial_balance_account.report_id = %s
+    AND report_trial_balance_account.report_id = %(report_id)s
 """
-        query_update_account_params = (self.id, self.id, self.id,)
+        query_update_account_params = {
+            'report_id': self.id,
+            'hierarchy': hierarchy,
+        }
         self.env.cr.execute(query_update_account_group,
                             query_update_account_params)
 
-    def _add_account_group_account_values(self):
+    def _update_account_group_child_values(self):
         """Compute values for report_trial_balance_account group in child."""
+        self._update_account_group_values('relation')
+
+    def _add_account_group_account_values(self):
+        """Compute the child accounts of report_trial_balance_account group
+        and fill compute_account_ids of all the groups at once from the
+        aggregated array."""
+        # pylint: disable=sql-injection
         query_update_account_group = """
-DROP AGGREGATE IF EXISTS array_concat_agg(anyarray);
-CREATE AGGREGATE array_concat_agg(anyarray) (
-  SFUNC = array_cat,
-  STYPE = anyarray
-);
-WITH aggr AS(WITH computed AS (WITH RECURSIVE cte AS (
-   SELECT account_group_id, account_group_id AS parent_id,
-    ARRAY[account_id]::int[] as child_account_ids
-   FROM   report_trial_balance_account
-   WHERE report_id = %s
-   GROUP BY report_trial_balance_account.id
-
-   UNION  ALL
-   SELECT c.account_group_id, p.account_group_id, ARRAY[p.account_id]::int[]
-   FROM   cte c
-   JOIN   report_trial_balance_account p USING (parent_id)
-    WHERE p.report_id = %s
-)
-SELECT account_group_id,
-    array_concat_agg(DISTINCT child_account_ids)::int[] as child_account_ids
-FROM   cte
-GROUP BY cte.account_group_id, cte.child_account_ids
-ORDER BY account_group_id
-)
-SELECT account_group_id,
-    array_concat_agg(DISTINCT child_account_ids)::int[]
-        AS child_account_ids from computed
-GROUP BY account_group_id)
-UPDATE report_trial_balance_account
-SET child_account_ids = aggr.child_account_ids
-FROM aggr
-WHERE report_trial_balance_account.account_group_id = aggr.account_group_id
-    AND report_trial_balance_account.report_id = %s
+WITH
+    computed AS (""" + self._get_account_group_values_query() + """),
+    updated AS
+        (
+            UPDATE report_trial_balance_account
+            SET child_account_ids = computed.child_account_ids::text
+            FROM computed
+            WHERE report_trial_balance_account.account_group_id =
+                    computed.account_group_id
+                AND report_trial_balance_account.report_id = %(report_id)s
+            RETURNING
+                report_trial_balance_account.id,
+                computed.child_account_ids
+        )
+INSERT INTO
+    account_account_report_trial_balance_account_rel
+    (
+    report_trial_balance_account_id,
+    account_account_id
+    )
+SELECT
+    updated.id,
+    UNNEST(updated.child_account_ids)
+FROM
+    updated
 """
-        query_update_account_params = (self.id, self.id, self.id,)
+        query_update_account_params = {
+            'report_id': self.id,
+            'hierarchy': 'relation',
+        }
         self.env.cr.execute(query_update_account_group,
                             query_update_account_params)
 
     def _update_account_group_computed_values(self):
         """Compute values for report_trial_balance_account group in compute."""
-        query_update_account_group = """
-WITH RECURSIVE accgroup AS
-(SELECT
-    accgroup.id,
-    coalesce(sum(ra.initial_balance),0) as initial_balance,
-    coalesce(sum(ra.initial_balance_foreign_currency),0)
-        as initial_balance_foreign_currency,
-    coalesce(sum(ra.debit),0) as debit,
-    coalesce(sum(ra.credit),0) as credit,
-    coalesce(sum(ra.final_balance),0) as final_balance,
-    coalesce(sum(ra.final_balance_foreign_currency),0)
-        as final_balance_foreign_currency
- FROM
-    account_group accgroup
-    LEFT OUTER JOIN account_account AS acc
-        ON strpos(acc.code, accgroup.code_prefix) = 1
-    LEFT OUTER JOIN report_trial_balance_account AS ra
-        ON ra.account_id = acc.id
- WHERE ra.report_id = %s
- GROUP BY accgroup.id
-)
-UPDATE report_trial_balance_account
-SET initial_balance = accgroup.initial_balance,
-    initial_balance_foreign_currency =
-        accgroup.initial_balance_foreign_currency,
-    debit = accgroup.debit,
-    credit = accgroup.credit,
-    final_balance = accgroup.final_balance,
-    final_balance_foreign_currency =
-        accgroup.final_balance_foreign_currency
-
-FROM accgroup
-WHERE report_trial_balance_account.account_group_id = accgroup.id
-"""
-        query_update_account_params = (self.id,)
-        self.env.cr.execute(query_update_account_group,
-                            query_update_account_params)
+        self._update_account_group_values('computed')
 
     def _update_account_sequence(self):
         """Compute sequence, level for report_trial_balance_account account."""
@@ -508,20 +708,3 @@ WHERE newline.account_group_id = report_trial_balance_account.parent_id
         query_update_account_params = (self.id,)
         self.env.cr.execute(query_update_account_group,
                             query_update_account_params)
-
-    def _compute_group_accounts(self):
-        groups = self.account_ids.filtered(
-            lambda a: a.account_group_id is not False)
-        for group in groups:
-            if self.hierarchy_on == 'compute':
-                group.compute_account_ids = \
-                    group.account_group_id.compute_account_ids
-            else:
-                if group.child_account_ids:
-                    chacc = group.child_account_ids.replace(
-                        '}', '').replace('{', '').split(',')
-                    if 'NULL' in chacc:
-                        chacc.remove('NULL')
-                    if chacc:
-                        group.compute_account_ids = [
-                            (6, 0, [int(g) for g in chacc])]
@@ -2,6 +2,7 @@ odoo.define('account_financial_report.account_financial_report_backend', functio
 'use strict';
 
 var core = require('web.core');
+var _t = core._t;
 var Widget = require('web.Widget');
 var ControlPanelMixin = require('web.ControlPanelMixin');
 var ReportWidget = require('account_financial_report.account_financial_report_widget');
@@ -12,6 +13,7 @@ var report_backend = Widget.extend(ControlPanelMixin, {
      events: {
         'click .o_account_financial_reports_print': 'print',
         'click .o_account_financial_reports_export': 'export',
+        'click .o_account_financial_reports_load_more': 'load_next_page',
     },
     init: function(parent, action) {
         this.actionManager = parent;
@@ -38,12 +40,67 @@ var report_backend = Widget.extend(ControlPanelMixin, {
         }
         def.then(function () {
             self.report_widget.$el.html(self.html);
+            self.set_next_page();
         });
     },
+    // Appends the button loading the next page of the report, if any,
+    // also loaded when the button is scrolled into view
+    set_next_page: function() {
+        if (_.isEmpty(this.next_pages)) {
+            return;
+        }
+        this.$more = $('<div>', {class: 'o_account_financial_reports_more'})
+            .append($('<button>', {
+                class: 'o_account_financial_reports_load_more btn btn-sm oe_button',
+                text: _t('Load more'),
+            }));
+        this.report_widget.$('.page').append(this.$more);
+        this.on_scroll();
+    },
+    load_next_page: function() {
+        var self = this;
+        if (this.loading || !this.$more) {
+            return $.when();
+        }
+        this.loading = true;
+        var page = this.next_pages[0];
+        return this._rpc({
+                model: this.given_context.model,
+                method: 'get_html_page',
+                args: [self.given_context, page[0], page[1]],
+                context: self.odoo_context,
+            })
+            .then(function (result) {
+                self.$more.before(result.html);
+                self.next_pages = self.next_pages.slice(1);
+                if (_.isEmpty(self.next_pages)) {
+                    self.$more.remove();
+                    self.$more = null;
+                }
+            })
+            .always(function () {
+                self.loading = false;
+                self.on_scroll();
+            });
+    },
+    on_scroll: function() {
+        if (this.$more && this.$more.is(':visible') &&
+                this.$more.offset().top < $(window).height()) {
+            this.load_next_page();
+        }
+    },
     start: function() {
+        this.on_scroll = _.throttle(this.on_scroll.bind(this), 200);
+        // The scroll events do not bubble, they are captured on the
+        // document whatever the scrolled element
+        document.addEventListener('scroll', this.on_scroll, true);
         this.set_html();
         return this._super();
     },
+    destroy: function() {
+        document.removeEventListener('scroll', this.on_scroll, true);
+        this._super.apply(this, arguments);
+    },
     // Fetches the html and is previous report.context if any, else create it
     get_html: function() {
         var self = this;
@@ -56,6 +113,7 @@ var report_backend = Widget.extend(ControlPanelMixin, {
             })
             .then(function (result) {
                 self.html = result.html;
+                self.next_pages = result.next_pages;
                 defs.push(self.update_cp());
                 return $.when.apply($, defs);
             });
@@ -3,7 +3,10 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 import time
+import unittest
+
 from . import abstract_test
+from ..report.aged_partner_balance import AGE_COLUMNS, numpy
 
 
 class TestAgedPartnerBalance(abstract_test.AbstractTest):
@@ -39,3 +42,89 @@ class TestAgedPartnerBalance(abstract_test.AbstractTest):
             {'show_move_line_details': True},
             {'only_posted_moves': True, 'show_move_line_details': True},
         ]
+
+    def _get_age_values(self, report):
+        return sorted(
+            (line.report_partner_id.partner_id.id, line.amount_residual) +
+            tuple(line[column] for column in AGE_COLUMNS)
+            for line in report.mapped('account_ids.partner_ids.line_ids')
+        ) + sorted(
+            (line.move_line_id.id, line.amount_residual) +
+            tuple(line[column] for column in AGE_COLUMNS)
+            for line in report.mapped(
+                'account_ids.partner_ids.move_line_ids')
+        )
+
+    def test_age_limits(self):
+        report = self.model.create(dict(
+            self.base_filters,
+            age_days_1=36500, age_days_2=36501, age_days_3=36502,
+            age_days_4=36503))
+        report.compute_data_for_report()
+        lines = report.mapped('account_ids.partner_ids.line_ids')
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertAlmostEqual(
+                line.amount_residual, line.current + line.age_30_days)
+            self.assertFalse(
+                line.age_60_days or line.age_90_days or line.age_120_days or
+                line.older)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_engine(self):
+        filters = dict(
+            self.base_filters, show_move_line_details=True,
+            age_days_1=15, age_days_2=45, age_days_3=75, age_days_4=365)
+        report = self.model.create(filters)
+        report.compute_data_for_report()
+        self.env['ir.config_parameter'].sudo().set_param(
+            'account_financial_report.aging_engine', 'numpy')
+        numpy_report = self.model.create(filters)
+        numpy_report.compute_data_for_report()
+        self.assertEqual(
+            self._get_age_values(numpy_report), self._get_age_values(report))
+        self.assertEqual(
+            numpy_report.mapped('account_ids.cumul_amount_residual'),
+            report.mapped('account_ids.cumul_amount_residual'))
+
+    def test_account_aging(self):
+        query = """
+SELECT * FROM (VALUES
+    (1, -5, 10.0), (1, 0, 1.0), (1, 1, 2.0), (1, 12, 3.0),
+    (1, 13, 4.0), (1, NULL, 5.0), (2, 40, 6.0)
+) AS l (partner_id, days_overdue, amount)
+        """
+        aging = self.env['account.aging']._compute_aging(
+            query, {}, ('partner_id',), [1, 13, 31])
+        self.assertEqual(aging, {
+            (1,): (25.0, [11.0, 5.0, 4.0, None]),
+            (2,): (6.0, [None, None, None, 6.0]),
+        })
+        # Run twice as a prepared statement, prepared on the first run
+        for limits in ([1, 13, 31], [1, 2, 3]):
+            self.assertEqual(
+                self.env['account.aging']._compute_aging(
+                    query, {}, ('partner_id',), limits, prepared=True),
+                self.env['account.aging']._compute_aging(
+                    query, {}, ('partner_id',), limits))
+
+    def test_bulk_writer(self):
+        report = self.model.create(self.base_filters)
+        report.compute_data_for_report()
+        report_partner = report.mapped('account_ids.partner_ids')[:1]
+        self.assertTrue(report_partner)
+        computed_lines = report_partner.line_ids
+        names = ['Tab\tNew line\nBack\\slash', None, 'Plain']
+        self.env['account.financial.report.bulk.writer']._copy_rows(
+            'report_aged_partner_balance_line',
+            ('report_partner_id', 'partner', 'amount_residual', 'older'),
+            (
+                (report_partner.id, name, float(index), None)
+                for index, name in enumerate(names)),
+            chunk_size=2)
+        report_partner.invalidate_cache()
+        lines = report_partner.line_ids - computed_lines
+        self.assertEqual(
+            sorted(lines.mapped(lambda line: (
+                line.amount_residual, line.partner))),
+            [(0.0, names[0]), (1.0, False), (2.0, 'Plain')])
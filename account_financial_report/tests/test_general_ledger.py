@@ -2,7 +2,9 @@
 # Copyright 2016 Camptocamp SA
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
+import json
 import time
+from unittest.mock import patch
 
 from odoo.tests import common
 from . import abstract_test_foreign_currency as a_t_f_c
@@ -116,6 +118,7 @@ class TestGeneralLedgerReport(common.TransactionCase):
                 ]}
         move = self.env['account.move'].create(move_vals)
         move.post()
+        return move
 
     def _get_report_lines(self, with_partners=False):
         company = self.env.ref('base.main_company')
@@ -467,3 +470,344 @@ class TestGeneralLedgerReport(common.TransactionCase):
         self.assertEqual(lines['unaffected'].final_debit, 0)
         self.assertEqual(lines['unaffected'].final_credit, 0)
         self.assertEqual(lines['unaffected'].final_balance, 500)
+
+    def test_05_period_balance(self):
+        company = self.env.ref('base.main_company')
+        period_balance_model = self.env['account.period.balance']
+
+        # Add a move at the previous day of the first day of fiscal year
+        # and build the period balances
+        self._add_move(
+            date=self.previous_fy_date_end,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        period_balance_model.refresh_period_balances(company.ids)
+        self.assertTrue(
+            period_balance_model._is_up_to_date(company, self.fy_date_start)
+        )
+
+        # Initial balances are read from the period balances
+        lines = self._get_report_lines(with_partners=True)
+        self.assertEqual(lines['receivable'].initial_debit, 1000)
+        self.assertEqual(lines['receivable'].initial_credit, 0)
+        self.assertEqual(lines['receivable'].initial_balance, 1000)
+        self.assertEqual(lines['partner_receivable'].initial_balance, 1000)
+
+        # Add a back-dated move, the period balances are stale
+        # and the journal items are used
+        self._add_move(
+            date=self.before_previous_fy_year,
+            receivable_debit=500,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=500
+        )
+        self.assertFalse(
+            period_balance_model._is_up_to_date(company, self.fy_date_start)
+        )
+        lines = self._get_report_lines(with_partners=True)
+        self.assertEqual(lines['receivable'].initial_debit, 1500)
+        self.assertEqual(lines['receivable'].initial_balance, 1500)
+        self.assertEqual(lines['partner_receivable'].initial_balance, 1500)
+
+        # Refresh the queued periods
+        period_balance_model.refresh_period_balances(company.ids)
+        self.assertTrue(
+            period_balance_model._is_up_to_date(company, self.fy_date_start)
+        )
+        lines = self._get_report_lines(with_partners=True)
+        self.assertEqual(lines['receivable'].initial_debit, 1500)
+        self.assertEqual(lines['receivable'].initial_balance, 1500)
+        self.assertEqual(lines['receivable'].final_balance, 1500)
+        self.assertEqual(lines['partner_receivable'].initial_balance, 1500)
+
+    def test_06_background_export(self):
+        company = self.env.ref('base.main_company')
+        wizard = self.env['general.ledger.report.wizard'].create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': company.id,
+            'background_export': True,
+        })
+        action = wizard.button_export_xlsx()
+        self.assertEqual(action['res_model'], 'account.financial.report.job')
+        job = self.env['account.financial.report.job'].browse(
+            action['res_id'])
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.report_model, 'report_general_ledger')
+        self.assertEqual(job.report_type, 'xlsx')
+
+        # The progress is reported before each computation step
+        general_ledger = self.env[job.report_model].create(
+            json.loads(job.report_values))
+        job_class = type(job)
+        with patch.object(job_class, '_set_progress') as set_progress:
+            general_ledger.with_context(
+                report_job_id=job.id).compute_data_for_report()
+        self.assertTrue(set_progress.called)
+        progress = [call[0][1:] for call in set_progress.call_args_list]
+        total = progress[0][1]
+        self.assertEqual(
+            progress, [(done, total) for done in range(total - 1)])
+
+    def test_07_report_cache(self):
+        company = self.env.ref('base.main_company')
+        report_model = self.env['report_general_ledger']
+        values = {
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'only_posted_moves': True,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        }
+        report = report_model._create_and_compute(values)
+        self.assertTrue(report.cache_key)
+
+        # Same values on the same ledger, the report is reused
+        self.assertEqual(report_model._create_and_compute(values), report)
+        self.assertNotEqual(
+            report_model._create_and_compute(
+                dict(values, only_posted_moves=False)),
+            report)
+
+        # A move after the report end date does not change its ledger
+        self._add_move(
+            date='2017-01-15',
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        self.assertEqual(report_model._create_and_compute(values), report)
+
+        # A move in the report period changes its ledger
+        self._add_move(
+            date=self.fy_date_start,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        new_report = report_model._create_and_compute(values)
+        self.assertNotEqual(new_report, report)
+        receivable = new_report.account_ids.filtered(
+            lambda a: a.account_id == self.receivable_account)
+        self.assertEqual(receivable.final_balance, 1000)
+
+    def test_07_report_cache_generation(self):
+        company = self.env.ref('base.main_company')
+        generation_model = self.env['account.ledger.generation']
+
+        def get_generation():
+            return generation_model._get_generation(
+                company.id, self.fy_date_end)
+
+        move = self._add_move(
+            date=self.fy_date_start,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        generation = get_generation()
+        # The narration is not read by the reports
+        move.write({'narration': 'Note'})
+        move.line_ids.write({'blocked': True})
+        self.assertEqual(get_generation(), generation)
+        move.line_ids.write({'name': 'Label'})
+        self.assertNotEqual(get_generation(), generation)
+
+        # The master data displayed by the reports change it too
+        generation = get_generation()
+        self.income_account.write({'name': 'Renamed income'})
+        self.assertNotEqual(get_generation(), generation)
+        generation = get_generation()
+        self.env['account.group'].create({
+            'name': 'Group', 'code_prefix': 'ZZ'})
+        self.assertNotEqual(get_generation(), generation)
+        partner = self.env.ref('base.res_partner_12')
+        for record in (partner, move.journal_id,
+                       self.env['account.tax'].search([
+                           ('company_id', '=', company.id)], limit=1),
+                       self.env['account.analytic.account'].create({
+                           'name': 'Analytic'})):
+            generation = get_generation()
+            record.write({'name': 'Renamed %s' % record._name})
+            self.assertNotEqual(get_generation(), generation)
+        generation = get_generation()
+        partner.write({'comment': 'Note'})
+        self.assertEqual(get_generation(), generation)
+
+        # The compaction only changes the generation once
+        generation_model.compact_generations()
+        generation = get_generation()
+        generation_model.compact_generations()
+        self.assertEqual(get_generation(), generation)
+
+        # The changes of a period leave the former periods as is
+        previous_generation = generation_model._get_generation(
+            company.id, self.previous_fy_date_end)
+        move.line_ids.write({'name': 'Label again'})
+        self.assertEqual(
+            generation_model._get_generation(
+                company.id, self.previous_fy_date_end),
+            previous_generation)
+
+    def test_08_account_shards(self):
+        company = self.env.ref('base.main_company')
+        report_model = self.env['report_general_ledger']
+        values = {
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        }
+        report = report_model.create(values)
+        report.compute_data_for_report()
+
+        sharded_report = report_model.create(values)
+        sharded_report._inject_account_values()
+        sharded_report._inject_unaffected_earnings_account_values()
+        shards = sharded_report._get_account_shards(3)
+        self.assertEqual(
+            sorted(sum(shards, [])), sorted(sharded_report.account_ids.ids))
+
+        # The account steps only compute the accounts of their shard
+        for shard in shards:
+            sharded = sharded_report.with_context(
+                report_account_ids=tuple(shard))
+            sharded._inject_partner_values()
+            sharded._inject_partner_values(only_empty_partner=True)
+            sharded._inject_line_not_centralized_values()
+            sharded._inject_line_not_centralized_values(
+                is_account_line=False, is_partner_line=True)
+            sharded._inject_line_not_centralized_values(
+                is_account_line=False, is_partner_line=True,
+                only_empty_partner_line=True)
+        sharded_report.invalidate_cache()
+
+        def get_values(general_ledger):
+            return sorted(
+                (account.account_id.id,
+                 partner.partner_id.id,
+                 partner.final_balance,
+                 tuple(partner.move_line_ids.mapped('move_line_id').ids))
+                for account in general_ledger.account_ids
+                for partner in account.partner_ids
+            ) + sorted(
+                (account.account_id.id,
+                 account.final_balance,
+                 tuple(account.move_line_ids.mapped('move_line_id').ids))
+                for account in general_ledger.account_ids
+            )
+        self.assertEqual(get_values(sharded_report), get_values(report))
+
+    def test_09_unlogged_report_tables(self):
+        if self.env.cr._cnx.server_version < 90500:
+            self.skipTest("SET UNLOGGED needs PostgreSQL 9.5")
+        storage = self.env['account.financial.report.storage']
+        tables = storage._get_report_tables()
+        self.assertIn('report_general_ledger_move_line', tables)
+        ordered_tables = storage._sort_report_tables(tables)
+        self.assertLess(
+            ordered_tables.index('report_general_ledger_move_line'),
+            ordered_tables.index('report_general_ledger'))
+
+        def get_persistences():
+            self.env.cr.execute("""
+                SELECT DISTINCT relpersistence FROM pg_class
+                WHERE relkind = 'r' AND relname IN %s
+            """, (tuple(tables),))
+            return [row[0] for row in self.env.cr.fetchall()]
+
+        self.env['ir.config_parameter'].sudo().set_param(
+            'account_financial_report.unlogged_report_tables', '1')
+        storage._apply_report_tables_storage()
+        self.assertEqual(get_persistences(), ['u'])
+
+        company = self.env.ref('base.main_company')
+        report = self.env['report_general_ledger'].create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        })
+        report.compute_data_for_report()
+        self.assertTrue(report.account_ids)
+
+        self.env['ir.config_parameter'].sudo().set_param(
+            'account_financial_report.unlogged_report_tables', False)
+        storage._apply_report_tables_storage()
+        self.assertEqual(get_persistences(), ['p'])
+
+    def test_10_html_pages(self):
+        self._add_move(
+            date=self.fy_date_start,
+            receivable_debit=1000,
+            receivable_credit=0,
+            income_debit=0,
+            income_credit=1000
+        )
+        company = self.env.ref('base.main_company')
+        report = self.env['report_general_ledger'].create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': company.id,
+            'fy_start_date': self.fy_date_start,
+        })
+        report.compute_data_for_report()
+        self.assertGreater(len(report.account_ids), 1)
+
+        report_model = report.with_context(active_id=report.id)
+        with patch('odoo.addons.account_financial_report.report.'
+                   'abstract_report.HTML_PAGE_SIZE', 0):
+            result = report_model.get_html()
+            count = len(report.account_ids)
+            self.assertEqual(
+                result['next_pages'],
+                [(offset, offset + 1) for offset in range(1, count)])
+            self.assertIn(report.account_ids[0].code, result['html'])
+            accounts = report.account_ids[:1]
+            for offset, end in result['next_pages']:
+                page = report_model.get_html_page({}, offset, end)
+                self.assertIn(report.account_ids[offset].code, page['html'])
+                accounts |= report._get_html_page(offset, end)
+            self.assertEqual(accounts, report.account_ids)
+
+        # A single page up to the page size
+        self.assertEqual(report_model.get_html()['next_pages'], [])
+        self.assertEqual(
+            report._get_html_pages(), [(0, len(report.account_ids))])
+
+    def test_11_run_jobs(self):
+        company = self.env.ref('base.main_company')
+        wizard = self.env['general.ledger.report.wizard'].create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': company.id,
+            'background_export': True,
+        })
+        job_model = self.env['account.financial.report.job']
+        job = job_model.browse(wizard.button_export_xlsx()['res_id'])
+        failing_job = job.copy({'report_model': 'report_unknown'})
+        self.assertEqual(failing_job.state, 'pending')
+
+        job_model.process_pending_jobs()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.progress, 100.0)
+        self.assertTrue(job.date_done)
+        self.assertTrue(job.report_id)
+        self.assertTrue(job.attachment_id)
+        self.assertEqual(job.attachment_id.res_id, job.id)
+        self.assertTrue(job.filename.endswith('.xlsx'))
+
+        self.assertEqual(failing_job.state, 'failed')
+        self.assertTrue(failing_job.error)
+        self.assertFalse(failing_job.attachment_id)
+
+        # A failed job is run again from the start
+        failing_job.button_retry()
+        self.assertEqual(failing_job.state, 'pending')
@@ -364,3 +364,41 @@ class TestJournalReport(TransactionCase):
 
         self.check_report_journal_debit_credit(report, 250, 250)
         self.check_report_journal_debit_credit_taxes(report, 300, 0, 50, 0)
+
+    def test_04_compute_fresh_report(self):
+        def get_deleted_rows():
+            self.env.cr.execute("""
+                SELECT SUM(n_tup_del)
+                FROM pg_stat_xact_user_tables
+                WHERE relname LIKE 'report_journal_ledger%%'
+            """)
+            return self.env.cr.fetchone()[0]
+
+        today_date = Date.today()
+        self._add_move(today_date, self.journal_sale, 0, 100, 100, 0)
+
+        report = self.ReportJournalLedger.create({
+            'date_from': self.fy_date_start,
+            'date_to': self.fy_date_end,
+            'company_id': self.company.id,
+            'journal_ids': [(6, 0, self.journal_sale.ids)],
+            'group_option': 'none',
+        })
+        self.assertEqual(report.compute_data_for_fresh_report(), report)
+        self.check_report_journal_debit_credit(report, 100, 100)
+        move_lines = report.report_move_line_ids
+        tax_lines = report.report_tax_line_ids
+
+        self._add_move(today_date, self.journal_sale, 0, 100, 100, 0)
+        deleted_rows = get_deleted_rows()
+        fresh_report = report.compute_data_for_fresh_report()
+        self.assertNotEqual(fresh_report, report)
+        self.check_report_journal_debit_credit(fresh_report, 200, 200)
+        self.assertEqual(
+            len(fresh_report.report_tax_line_ids), len(tax_lines))
+        # The former report is left as is, no line is deleted
+        report.compute_data_for_report()
+        self.assertEqual(report.report_move_line_ids, move_lines)
+        self.assertEqual(report.report_tax_line_ids, tax_lines)
+        self.check_report_journal_debit_credit(report, 100, 100)
+        self.assertEqual(get_deleted_rows(), deleted_rows)
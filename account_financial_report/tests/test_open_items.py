@@ -39,3 +39,62 @@ class TestOpenItems(a_t_f_c.AbstractTestForeignCurrency):
             {'hide_account_balance_at_0': True},
             {'only_posted_moves': True, 'hide_account_balance_at_0': True},
         ]
+
+    def test_partial_reconcile_date(self):
+        partials = self.env['account.partial.reconcile'].search([])
+        rows = self.env['account.partial.reconcile.date'].search([
+            ('partial_id', 'in', partials.ids),
+        ])
+        self.assertEqual(len(rows), 2 * len(partials))
+        for row in rows:
+            partial = row.partial_id
+            if row.debit_move:
+                self.assertEqual(row.move_line_id, partial.debit_move_id)
+                counterpart = partial.credit_move_id
+            else:
+                self.assertEqual(row.move_line_id, partial.credit_move_id)
+                counterpart = partial.debit_move_id
+            self.assertEqual(row.counterpart_date, counterpart.date)
+            self.assertEqual(row.amount, partial.amount)
+
+    def test_residual_before_counterpart_date(self):
+        def create_move(date, debit, credit):
+            move = self.env['account.move'].create({
+                'journal_id': self.journal_sale.id,
+                'date': date,
+                'line_ids': [
+                    (0, 0, {
+                        'name': 'Receivable',
+                        'account_id': self.receivable.id,
+                        'partner_id': self.partner.id,
+                        'debit': debit,
+                        'credit': credit,
+                    }),
+                    (0, 0, {
+                        'name': 'Revenue',
+                        'account_id': self.revenue.id,
+                        'partner_id': self.partner.id,
+                        'debit': credit,
+                        'credit': debit,
+                    }),
+                ],
+            })
+            move.post()
+            return move.line_ids.filtered(
+                lambda line: line.account_id == self.receivable)
+        line = create_move(time.strftime('%Y-01-10'), 1000, 0)
+        counterpart = create_move(time.strftime('%Y-03-10'), 0, 600)
+        (line | counterpart).reconcile()
+
+        def get_residual(date_at):
+            report = self.model.create(dict(
+                self.base_filters, date_at=date_at))
+            report.compute_data_for_report()
+            return report.mapped(
+                'account_ids.partner_ids.move_line_ids').filtered(
+                    lambda report_line: report_line.move_line_id == line
+            ).amount_residual
+
+        # Before the date of the counterpart, nothing is reconciled yet
+        self.assertEqual(get_residual(time.strftime('%Y-02-01')), 1000)
+        self.assertEqual(get_residual(time.strftime('%Y-03-10')), 400)
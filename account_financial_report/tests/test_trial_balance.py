@@ -8,6 +8,35 @@ from odoo.tests import common
 from . import abstract_test_foreign_currency as a_t_f_c
 
 
+def get_trial_balance_values(trial_balance):
+    """ Return the amounts of the account and partner lines
+    of a trial balance, to compare reports. """
+    values = {}
+    for line in trial_balance.account_ids:
+        values[(line.account_id.id, line.account_group_id.id)] = (
+            line.code,
+            line.level,
+            line.currency_id.id,
+            round(line.initial_balance, 2),
+            round(line.debit, 2),
+            round(line.credit, 2),
+            round(line.final_balance, 2),
+            round(line.initial_balance_foreign_currency, 2),
+            round(line.final_balance_foreign_currency, 2),
+        )
+        for partner in line.partner_ids:
+            values[(line.account_id.id, 'partner', partner.partner_id.id)] = (
+                partner.name,
+                round(partner.initial_balance, 2),
+                round(partner.debit, 2),
+                round(partner.credit, 2),
+                round(partner.final_balance, 2),
+                round(partner.initial_balance_foreign_currency, 2),
+                round(partner.final_balance_foreign_currency, 2),
+            )
+    return values
+
+
 class TestTrialBalance(a_t_f_c.AbstractTestForeignCurrency):
     """
         Technical tests for Trial Balance Report.
@@ -62,6 +91,27 @@ class TestTrialBalance(a_t_f_c.AbstractTestForeignCurrency):
     def _partner_test_is_possible(self, filters):
         return 'show_partner_details' in filters
 
+    def test_05_general_ledger_engine(self):
+        """Check that the trial balance computed from the journal items
+        matches the one computed from a General Ledger report"""
+        for filters in [{}] + self.additional_filters:
+            current_filter = self.base_filters.copy()
+            current_filter.update(filters)
+
+            report = self.model.create(current_filter)
+            report.compute_data_for_report()
+            self.assertFalse(report.general_ledger_id)
+
+            current_filter['compute_from_general_ledger'] = True
+            gl_report = self.model.create(current_filter)
+            gl_report.compute_data_for_report()
+            self.assertTrue(gl_report.general_ledger_id)
+
+            self.assertEqual(
+                get_trial_balance_values(report),
+                get_trial_balance_values(gl_report),
+            )
+
 
 @common.at_install(False)
 @common.post_install(True)
@@ -180,6 +230,7 @@ class TestTrialBalanceReport(common.TransactionCase):
             'show_partner_details': with_partners,
             })
         trial_balance.compute_data_for_report()
+        self._check_general_ledger_engine(trial_balance)
         lines = {}
         report_account_model = self.env['report_trial_balance_account']
         lines['receivable'] = report_account_model.search([
@@ -212,10 +263,28 @@ class TestTrialBalanceReport(common.TransactionCase):
             ])
         return lines
 
+    def _check_general_ledger_engine(self, trial_balance):
+        """ Check that the trial balance computed from a General Ledger
+        report has the same values. """
+        gl_trial_balance = trial_balance.copy({
+            'compute_from_general_ledger': True,
+        })
+        gl_trial_balance.compute_data_for_report()
+        self.assertEqual(
+            get_trial_balance_values(trial_balance),
+            get_trial_balance_values(gl_trial_balance),
+        )
+
     def test_00_account_group(self):
         self.assertEqual(len(self.group1.compute_account_ids.ids), 19)
         self.assertEqual(len(self.group2.compute_account_ids.ids), 9)
 
+    def _get_closure_accounts(self, group, hierarchy):
+        return self.env['account.group.closure'].search([
+            ('ancestor_id', '=', group.id),
+            ('hierarchy', '=', hierarchy),
+        ]).mapped('account_id')
+
     def test_01_account_balance_computed(self):
         # Generate the general ledger line
         lines = self._get_report_lines()
@@ -492,3 +561,79 @@ class TestTrialBalanceReport(common.TransactionCase):
         self.assertEqual(lines['partner_receivable'].debit, 0)
         self.assertEqual(lines['partner_receivable'].credit, 2000)
         self.assertEqual(lines['partner_receivable'].final_balance, -1000)
+
+    def test_04_group_closure(self):
+        self.assertEqual(
+            self._get_closure_accounts(self.group1, 'relation'),
+            self.account100)
+        self.assertEqual(
+            self._get_closure_accounts(self.group2, 'relation'),
+            self.account200 | self.account301)
+        self.assertIn(
+            self.account200,
+            self._get_closure_accounts(self.group2, 'computed'))
+        self.assertNotIn(
+            self.account300,
+            self._get_closure_accounts(self.group2, 'computed'))
+
+        # The closure follows the changes of the accounts and groups
+        self.account300.write({'code': '250', 'group_id': self.group11.id})
+        self.assertEqual(
+            self._get_closure_accounts(self.group1, 'relation'),
+            self.account100 | self.account300)
+        self.assertIn(
+            self.account300,
+            self._get_closure_accounts(self.group2, 'computed'))
+        self.group11.parent_id = self.group2
+        self.assertEqual(
+            self._get_closure_accounts(self.group2, 'relation'),
+            self.account200 | self.account300 | self.account301)
+
+        # Only the accounts of the changed groups are refreshed, to the
+        # same rows as a rebuild of the whole closure
+        def get_closure():
+            self.env.cr.execute("""
+                SELECT hierarchy, ancestor_id, descendant_id, account_id
+                FROM account_group_closure
+                ORDER BY 1, 2, 3, 4
+            """)
+            return self.env.cr.fetchall()
+        group3 = self.env['account.group'].create({
+            'name': 'Group 3', 'code_prefix': '3', 'parent_id': self.group2.id,
+        })
+        group3.code_prefix = '30'
+        self.group11.unlink()
+        closure = get_closure()
+        self.env['account.group.closure']._rebuild_closure()
+        self.assertEqual(get_closure(), closure)
+        self.assertIn(
+            self.account301, self._get_closure_accounts(group3, 'computed'))
+
+    def test_05_group_accounts(self):
+        self.assertIn(self.account200, self.group2.compute_account_ids)
+        self.assertNotIn(self.account300, self.group2.compute_account_ids)
+
+        # The accounts of the groups follow the changes of the accounts
+        self.account300.code = '250'
+        self.assertIn(self.account300, self.group2.compute_account_ids)
+        self.account200.code = '900'
+        self.assertNotIn(self.account200, self.group2.compute_account_ids)
+
+        # and of the groups
+        self.group2.code_prefix = '25'
+        self.assertIn(self.account300, self.group2.compute_account_ids)
+        self.assertNotIn(self.account301, self.group2.compute_account_ids)
+        group3 = self.env['account.group'].create({
+            'code_prefix': '9',
+            'name': 'Group 9',
+        })
+        self.assertIn(self.account200, group3.compute_account_ids)
+
+        # The prefix is matched literally, not as a LIKE pattern
+        group3.code_prefix = '_'
+        self.assertFalse(group3.compute_account_ids)
+        groups = group3 | self.group2
+        groups.write({'code_prefix': '2'})
+        self.assertEqual(
+            group3.compute_account_ids, self.group2.compute_account_ids)
+        self.assertIn(self.account300, group3.compute_account_ids)
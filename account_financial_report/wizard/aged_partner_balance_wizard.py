@@ -4,7 +4,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from datetime import datetime
-from odoo import api, fields, models
+from odoo import api, fields, models, _
+from odoo.exceptions import ValidationError
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -38,6 +39,23 @@ class AgedPartnerBalanceWizard(models.TransientModel):
         string='Filter partners',
     )
     show_move_line_details = fields.Boolean()
+    age_days_1 = fields.Integer(
+        string='Age Limit 1 (Days)', required=True, default=30)
+    age_days_2 = fields.Integer(
+        string='Age Limit 2 (Days)', required=True, default=60)
+    age_days_3 = fields.Integer(
+        string='Age Limit 3 (Days)', required=True, default=90)
+    age_days_4 = fields.Integer(
+        string='Age Limit 4 (Days)', required=True, default=120)
+
+    @api.constrains('age_days_1', 'age_days_2', 'age_days_3', 'age_days_4')
+    def _check_age_days(self):
+        for wizard in self:
+            limits = [wizard.age_days_1, wizard.age_days_2,
+                      wizard.age_days_3, wizard.age_days_4]
+            if limits[0] <= 0 or limits != sorted(set(limits)):
+                raise ValidationError(_(
+                    "The age limits must be positive and increasing."))
 
     @api.onchange('receivable_accounts_only', 'payable_accounts_only')
     def onchange_type_accounts_only(self):
@@ -64,8 +82,8 @@ class AgedPartnerBalanceWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_aged_partner_balance']
-        report = model.create(self._prepare_report_aged_partner_balance())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_aged_partner_balance())
 
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
@@ -93,11 +111,15 @@ class AgedPartnerBalanceWizard(models.TransientModel):
             'filter_account_ids': [(6, 0, self.account_ids.ids)],
             'filter_partner_ids': [(6, 0, self.partner_ids.ids)],
             'show_move_line_details': self.show_move_line_details,
+            'age_days_1': self.age_days_1,
+            'age_days_2': self.age_days_2,
+            'age_days_3': self.age_days_3,
+            'age_days_4': self.age_days_4,
         }
 
     def _export(self, report_type):
         """Default export is PDF."""
         model = self.env['report_aged_partner_balance']
-        report = model.create(self._prepare_report_aged_partner_balance())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_aged_partner_balance())
         return report.print_report(report_type)
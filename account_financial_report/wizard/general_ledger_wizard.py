@@ -7,7 +7,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 
-from odoo import api, fields, models
+from odoo import api, fields, models, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -41,6 +41,11 @@ class GeneralLedgerReportWizard(models.TransientModel):
     )
     centralize = fields.Boolean(string='Activate centralization',
                                 default=True)
+    background_export = fields.Boolean(
+        string='Export in background',
+        help='Compute and render the PDF or XLSX export in background, '
+             'the file is attached to the report job once done.',
+    )
     hide_account_balance_at_0 = fields.Boolean(
         string='Hide account ending balance at 0',
         help='Use this filter to hide an account or a partner '
@@ -127,8 +132,8 @@ class GeneralLedgerReportWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_general_ledger']
-        report = model.create(self._prepare_report_general_ledger())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_general_ledger())
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
         vals['context'] = context1
@@ -164,7 +169,11 @@ class GeneralLedgerReportWizard(models.TransientModel):
 
     def _export(self, report_type):
         """Default export is PDF."""
+        if self.background_export:
+            return self.env['account.financial.report.job'].enqueue(
+                _('General Ledger'), 'report_general_ledger',
+                self._prepare_report_general_ledger(), report_type)
         model = self.env['report_general_ledger']
-        report = model.create(self._prepare_report_general_ledger())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_general_ledger())
         return report.print_report(report_type)
@@ -100,7 +100,7 @@ class JournalLedgerReportWizard(models.TransientModel):
             context1 = safe_eval(context1)
         model = self.env['report_journal_ledger']
         report = model.create(self._prepare_report_journal_ledger())
-        report.compute_data_for_report()
+        report = report.compute_data_for_fresh_report()
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
         vals['context'] = context1
@@ -138,5 +138,5 @@ class JournalLedgerReportWizard(models.TransientModel):
         self.ensure_one()
         model = self.env['report_journal_ledger']
         report = model.create(self._prepare_report_journal_ledger())
-        report.compute_data_for_report()
+        report = report.compute_data_for_fresh_report()
         return report.print_report(report_type)
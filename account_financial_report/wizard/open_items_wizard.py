@@ -4,7 +4,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
 from datetime import datetime
-from odoo import models, fields, api
+from odoo import models, fields, api, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -32,6 +32,11 @@ class OpenItemsReportWizard(models.TransientModel):
         string='Filter accounts',
         domain=[('reconcile', '=', True)],
     )
+    background_export = fields.Boolean(
+        string='Export in background',
+        help='Compute and render the PDF or XLSX export in background, '
+             'the file is attached to the report job once done.',
+    )
     hide_account_balance_at_0 = fields.Boolean(
         string='Hide account ending balance at 0',
         help='Use this filter to hide an account or a partner '
@@ -77,8 +82,8 @@ class OpenItemsReportWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_open_items']
-        report = model.create(self._prepare_report_open_items())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_open_items())
 
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
@@ -111,7 +116,11 @@ class OpenItemsReportWizard(models.TransientModel):
 
     def _export(self, report_type):
         """Default export is PDF."""
+        if self.background_export:
+            return self.env['account.financial.report.job'].enqueue(
+                _('Open Items'), 'report_open_items',
+                self._prepare_report_open_items(), report_type)
         model = self.env['report_open_items']
-        report = model.create(self._prepare_report_open_items())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_open_items())
         return report.print_report(report_type)
@@ -3,7 +3,7 @@
 # Copyright 2017 Akretion - Alexis de Lattre
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 
-from odoo import models, fields, api
+from odoo import models, fields, api, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.tools import pycompat
 
@@ -40,6 +40,11 @@ class TrialBalanceReportWizard(models.TransientModel):
         comodel_name='account.account',
         string='Filter accounts',
     )
+    background_export = fields.Boolean(
+        string='Export in background',
+        help='Compute and render the PDF or XLSX export in background, '
+             'the file is attached to the report job once done.',
+    )
     hide_account_balance_at_0 = fields.Boolean(
         string='Hide account ending balance at 0',
         help='Use this filter to hide an account or a partner '
@@ -126,8 +131,8 @@ class TrialBalanceReportWizard(models.TransientModel):
         if isinstance(context1, pycompat.string_types):
             context1 = safe_eval(context1)
         model = self.env['report_trial_balance']
-        report = model.create(self._prepare_report_trial_balance())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_trial_balance())
 
         context1['active_id'] = report.id
         context1['active_ids'] = report.ids
@@ -164,7 +169,11 @@ class TrialBalanceReportWizard(models.TransientModel):
 
     def _export(self, report_type):
         """Default export is PDF."""
+        if self.background_export:
+            return self.env['account.financial.report.job'].enqueue(
+                _('Trial Balance'), 'report_trial_balance',
+                self._prepare_report_trial_balance(), report_type)
         model = self.env['report_trial_balance']
-        report = model.create(self._prepare_report_trial_balance())
-        report.compute_data_for_report()
+        report = model._create_and_compute(
+            self._prepare_report_trial_balance())
         return report.print_report(report_type)
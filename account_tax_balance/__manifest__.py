@@ -6,7 +6,7 @@
 {
     "name": "Tax Balance",
     "summary": "Compute tax balances based on date range",
-    "version": "11.0.1.0.0",
+    "version": "11.0.1.1.0",
     "category": "Accounting & Finance",
     "website": "https://www.agilebg.com/",
     "author": "Agile Business Group, Therp BV, Tecnativa, ACSONE SA/NV, "
@@ -25,5 +25,7 @@
     ],
     "images": [
         'images/tax_balance.png',
-    ]
+    ],
+    "pre_init_hook": "pre_init_hook",
+    "post_init_hook": "post_init_hook",
 }
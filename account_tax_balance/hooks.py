@@ -0,0 +1,19 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, SUPERUSER_ID
+from odoo.tools.sql import column_exists
+
+
+def pre_init_hook(cr):
+    """ Create the move type column, so that the ORM does not compute
+    it for every move at the installation, see post_init_hook. """
+    if not column_exists(cr, 'account_move', 'move_type'):
+        cr.execute("""
+            ALTER TABLE account_move ADD COLUMN move_type VARCHAR
+        """)
+
+
+def post_init_hook(cr, registry):
+    """ Compute the move type of every move in SQL. """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['account.move']._recompute_move_type_sql()
@@ -0,0 +1,11 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    """ Recompute the move type of every move in SQL. """
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['account.move']._recompute_move_type_sql()
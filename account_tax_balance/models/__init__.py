@@ -1,5 +1,6 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+from . import account_account
 from . import account_move
 from . import account_tax
 from . import account_move_line
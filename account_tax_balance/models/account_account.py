@@ -0,0 +1,24 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class AccountAccount(models.Model):
+    _inherit = 'account.account'
+
+    @api.multi
+    def write(self, vals):
+        """ When the type of accounts changes, recompute the move type
+        of their moves in SQL instead of one move at a time. """
+        if 'user_type_id' not in vals:
+            return super(AccountAccount, self).write(vals)
+        with self.env.norecompute():
+            res = super(AccountAccount, self).write(vals)
+        field = self.env['account.move']._fields['move_type']
+        moves = self.env.field_todo(field)
+        self.env.remove_todo(field, moves)
+        # Store the internal type of the accounts before reading it in SQL
+        self.recompute()
+        if moves:
+            self.env['account.move']._recompute_move_type_sql(moves.ids)
+        return res
@@ -1,8 +1,12 @@
 # © 2016 Antonio Espinosa <antonio.espinosa@tecnativa.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import logging
+
 from openerp import models, fields, api
 
+_logger = logging.getLogger(__name__)
+
 
 class AccountMove(models.Model):
     _inherit = 'account.move'
@@ -42,3 +46,73 @@ class AccountMove(models.Model):
                     'receivable' if balance > 0 else 'receivable_refund')
             else:
                 move.move_type = 'other'
+
+    @api.model
+    def _recompute_move_type_sql(self, move_ids=None, chunk_size=100000):
+        """ Recompute the move type of the given moves, or of all the
+        moves, like _compute_move_type but in SQL.
+
+        The moves are updated by chunks of `chunk_size` ids, for the
+        installation of the module and for the changes of account types,
+        which reach a large part of the moves. The progress is logged.
+        """
+        if move_ids is None:
+            self.env.cr.execute("SELECT MIN(id), MAX(id) FROM account_move")
+            id_min, id_max = self.env.cr.fetchone()
+            if id_min is None:
+                return
+            chunks = [
+                ("m.id >= %(id_from)s AND m.id < %(id_to)s",
+                 {'id_from': id_from, 'id_to': id_from + chunk_size})
+                for id_from in range(id_min, id_max + 1, chunk_size)
+            ]
+        else:
+            move_ids = sorted(move_ids)
+            chunks = [
+                ("m.id = ANY(%(ids)s)",
+                 {'ids': move_ids[index:index + chunk_size]})
+                for index in range(0, len(move_ids), chunk_size)
+            ]
+        for index, (where, params) in enumerate(chunks):
+            # pylint: disable=sql-injection
+            self.env.cr.execute("""
+                UPDATE account_move am
+                SET move_type = t.move_type
+                FROM (
+                    SELECT m.id,
+                    CASE
+                        WHEN BOOL_OR(acc.internal_type = 'liquidity')
+                            THEN 'liquidity'
+                        WHEN BOOL_OR(acc.internal_type = 'payable')
+                            THEN CASE
+                                WHEN SUM(CASE
+                                    WHEN acc.internal_type = 'payable'
+                                        THEN aml.balance
+                                END) < 0
+                                    THEN 'payable'
+                                ELSE 'payable_refund'
+                            END
+                        WHEN BOOL_OR(acc.internal_type = 'receivable')
+                            THEN CASE
+                                WHEN SUM(CASE
+                                    WHEN acc.internal_type = 'receivable'
+                                        THEN aml.balance
+                                END) > 0
+                                    THEN 'receivable'
+                                ELSE 'receivable_refund'
+                            END
+                        ELSE 'other'
+                    END AS move_type
+                    FROM account_move m
+                    LEFT JOIN account_move_line aml ON aml.move_id = m.id
+                    LEFT JOIN account_account acc ON acc.id = aml.account_id
+                    WHERE """ + where + """
+                    GROUP BY m.id
+                ) t
+                WHERE am.id = t.id
+                AND am.move_type IS DISTINCT FROM t.move_type
+            """, params)
+            _logger.info(
+                "Move types computed for %s/%s chunks of moves",
+                index + 1, len(chunks))
+        self.invalidate_cache(['move_type'])
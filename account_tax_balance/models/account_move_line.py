@@ -20,4 +20,30 @@ class AccountMoveLine(models.Model):
                 CREATE INDEX account_move_line_date_tax_line_id_idx
                 ON account_move_line (date, tax_line_id)
             """)
+        # Journal items of a company in a period, with their tax
+        self._cr.execute("""
+            SELECT indexname FROM pg_indexes
+            WHERE indexname = 'account_move_line_company_date_tax_line_idx'
+        """)
+        if not self._cr.fetchone():
+            self._cr.execute("""
+                CREATE INDEX account_move_line_company_date_tax_line_idx
+                ON account_move_line (company_id, date, tax_line_id)
+            """)
         return res
+
+    @api.model
+    def create(self, vals, **kwargs):
+        self.env['account.tax']._invalidate_tax_ids_with_moves()
+        return super(AccountMoveLine, self).create(vals, **kwargs)
+
+    @api.multi
+    def write(self, vals, update_check=True):
+        self.env['account.tax']._invalidate_tax_ids_with_moves()
+        return super(AccountMoveLine, self).write(
+            vals, update_check=update_check)
+
+    @api.multi
+    def unlink(self):
+        self.env['account.tax']._invalidate_tax_ids_with_moves()
+        return super(AccountMoveLine, self).unlink()
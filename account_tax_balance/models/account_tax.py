@@ -4,6 +4,10 @@
 
 from openerp import models, fields, api, _
 
+# Key of the taxes with moves in the cache of the cursor, see
+# _account_tax_ids_with_moves
+TAX_IDS_WITH_MOVES = 'account_tax_balance.tax_ids_with_moves'
+
 
 class AccountTax(models.Model):
     _inherit = 'account.tax'
@@ -46,33 +50,54 @@ class AccountTax(models.Model):
         one account.move.line in the context period
         for the user company.
 
+        The journal items of the period are read once, through the index
+        on their company and date, instead of once per tax. The result is
+        kept in the cache of the cursor, i.e. for the current request, per
+        company and period, until journal items are changed.
+
         Caveat: this ignores record rules and ACL but it is good
         enough for filtering taxes with activity during the period.
         """
-        req = """
-            SELECT id
-            FROM account_tax at
-            WHERE
-            company_id = %s AND
-            EXISTS (
-              SELECT 1 FROM account_move_Line aml
-              WHERE
-                date >= %s AND
-                date <= %s AND
-                company_id = %s AND (
-                  tax_line_id = at.id OR
-                  EXISTS (
-                    SELECT 1 FROM account_move_line_account_tax_rel
-                    WHERE account_move_line_id = aml.id AND
-                      account_tax_id = at.id
-                  )
-                )
-            )
-        """
         from_date, to_date, company_id, target_move = self.get_context_values()
-        self.env.cr.execute(
-            req, (company_id, from_date, to_date, company_id))
-        return [r[0] for r in self.env.cr.fetchall()]
+        key = (company_id, from_date, to_date)
+        tax_ids_with_moves = self.env.cr.cache.setdefault(
+            TAX_IDS_WITH_MOVES, {})
+        if key not in tax_ids_with_moves:
+            req = """
+                SELECT id
+                FROM account_tax
+                WHERE
+                company_id = %(company_id)s AND
+                id IN (
+                  SELECT aml.tax_line_id
+                  FROM account_move_line aml
+                  WHERE
+                    aml.company_id = %(company_id)s AND
+                    aml.date >= %(from_date)s AND
+                    aml.date <= %(to_date)s AND
+                    aml.tax_line_id IS NOT NULL
+                  UNION
+                  SELECT rel.account_tax_id
+                  FROM account_move_line aml
+                  JOIN account_move_line_account_tax_rel rel
+                    ON rel.account_move_line_id = aml.id
+                  WHERE
+                    aml.company_id = %(company_id)s AND
+                    aml.date >= %(from_date)s AND
+                    aml.date <= %(to_date)s
+                )
+            """
+            self.env.cr.execute(req, {
+                'company_id': company_id,
+                'from_date': from_date,
+                'to_date': to_date,
+            })
+            tax_ids_with_moves[key] = [r[0] for r in self.env.cr.fetchall()]
+        return list(tax_ids_with_moves[key])
+
+    @api.model
+    def _invalidate_tax_ids_with_moves(self):
+        self.env.cr.cache.pop(TAX_IDS_WITH_MOVES, None)
 
     @api.multi
     def _compute_has_moves(self):
@@ -87,16 +112,78 @@ class AccountTax(models.Model):
         ids_with_moves = self._account_tax_ids_with_moves()
         return [('id', 'in', ids_with_moves)]
 
+    def _get_balances(self):
+        """ Return the balances of the taxes in the context period, as
+        {(tax id, tax_or_base, move_type): balance}, see compute_balance.
+
+        The balances of all the taxes are read with one query grouped by
+        tax and move type on the tax lines, and one on the base lines.
+
+        Caveat: like _account_tax_ids_with_moves, this ignores record rules.
+        """
+        if not self.ids:
+            return {}
+        from_date, to_date, company_id, target_move = self.get_context_values()
+        move_types = {}
+        for move_type in ('regular', 'refund'):
+            for target_type in self.get_target_type_list(move_type):
+                move_types[target_type] = move_type
+        params = {
+            'tax_ids': tuple(self.ids),
+            'states': self.get_target_state_list(target_move),
+            'from_date': from_date,
+            'to_date': to_date,
+            'company_id': company_id,
+        }
+        filters = """
+                aml.date >= %(from_date)s AND
+                aml.date <= %(to_date)s AND
+                aml.company_id = %(company_id)s AND
+                aml.tax_exigible AND
+                am.state = ANY(%(states)s)
+        """
+        queries = {
+            'tax': """
+            SELECT aml.tax_line_id, am.move_type, SUM(aml.balance)
+            FROM account_move_line aml
+            JOIN account_move am ON am.id = aml.move_id
+            WHERE
+                aml.tax_line_id IN %(tax_ids)s AND """ + filters + """
+            GROUP BY aml.tax_line_id, am.move_type
+            """,
+            'base': """
+            SELECT rel.account_tax_id, am.move_type, SUM(aml.balance)
+            FROM account_move_line_account_tax_rel rel
+            JOIN account_move_line aml ON aml.id = rel.account_move_line_id
+            JOIN account_move am ON am.id = aml.move_id
+            WHERE
+                rel.account_tax_id IN %(tax_ids)s AND """ + filters + """
+            GROUP BY rel.account_tax_id, am.move_type
+            """,
+        }
+        balances = {}
+        for tax_or_base, query in queries.items():
+            self.env.cr.execute(query, params)
+            for tax_id, move_type, balance in self.env.cr.fetchall():
+                if move_type not in move_types:
+                    continue
+                key = (tax_id, tax_or_base, move_types[move_type])
+                # See compute_balance for the sign
+                balances[key] = balances.get(key, 0.0) - (balance or 0.0)
+        return balances
+
+    @api.multi
     def _compute_balance(self):
+        balances = self._get_balances()
         for tax in self:
-            tax.balance_regular = tax.compute_balance(
-                tax_or_base='tax', move_type='regular')
-            tax.base_balance_regular = tax.compute_balance(
-                tax_or_base='base', move_type='regular')
-            tax.balance_refund = tax.compute_balance(
-                tax_or_base='tax', move_type='refund')
-            tax.base_balance_refund = tax.compute_balance(
-                tax_or_base='base', move_type='refund')
+            tax.balance_regular = balances.get(
+                (tax.id, 'tax', 'regular'), 0.0)
+            tax.base_balance_regular = balances.get(
+                (tax.id, 'base', 'regular'), 0.0)
+            tax.balance_refund = balances.get(
+                (tax.id, 'tax', 'refund'), 0.0)
+            tax.base_balance_refund = balances.get(
+                (tax.id, 'base', 'refund'), 0.0)
             tax.balance = tax.balance_regular + tax.balance_refund
             tax.base_balance = (
                 tax.base_balance_regular + tax.base_balance_refund)
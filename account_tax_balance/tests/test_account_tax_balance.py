@@ -7,6 +7,8 @@ from openerp.tests.common import HttpCase
 from datetime import datetime
 from dateutil.rrule import MONTHLY
 
+from ..models.account_tax import TAX_IDS_WITH_MOVES
+
 
 class TestAccountTaxBalance(HttpCase):
     at_install = False
@@ -101,6 +103,9 @@ class TestAccountTaxBalance(HttpCase):
         taxes = self.env['account.tax'].search([('has_moves', '=', True)])
         self.assertEqual(len(taxes), 1)
         self.assertEqual(taxes[0].name, "Tax 10.0%")
+        # The taxes with moves are kept until journal items change
+        self.assertIn(TAX_IDS_WITH_MOVES, self.env.cr.cache)
+        self.assertEqual(taxes.has_moves, True)
 
         # testing buttons
         tax_action = tax.view_tax_lines()
@@ -178,6 +183,40 @@ class TestAccountTaxBalance(HttpCase):
                 'tax_line_id': tax.id,
             })],
         }).post()
+        self.assertNotIn(TAX_IDS_WITH_MOVES, self.env.cr.cache)
         tax.refresh()
         self.assertEqual(tax.base_balance, 175.)
         self.assertEqual(tax.balance, 17.5)
+
+        # The balances of several taxes are computed together
+        taxes = self.env['account.tax'].search([])
+        for tax in taxes:
+            self.assertAlmostEqual(
+                tax.balance_refund,
+                tax.compute_balance(tax_or_base='tax', move_type='refund'))
+            self.assertAlmostEqual(
+                tax.base_balance_regular,
+                tax.compute_balance(tax_or_base='base', move_type='regular'))
+
+    def test_recompute_move_type_sql(self):
+        moves = self.env['account.move'].search([])
+        move_types = dict((move.id, move.move_type) for move in moves)
+        self.env.cr.execute("UPDATE account_move SET move_type = NULL")
+        self.env['account.move']._recompute_move_type_sql(chunk_size=7)
+        self.assertEqual(
+            dict((move.id, move.move_type) for move in moves), move_types)
+        self.env['account.move']._recompute_move_type_sql(
+            moves[:3].ids, chunk_size=2)
+        self.assertEqual(
+            dict((move.id, move.move_type) for move in moves), move_types)
+
+    def test_write_move_line(self):
+        # Also run through the overrides of the other modules installed,
+        # e.g. account_financial_report, with the standard arguments
+        move_line = self.env['account.move.line'].search([], limit=1)
+        self.env['account.tax'].search([('has_moves', '=', True)])
+        self.assertIn(TAX_IDS_WITH_MOVES, self.env.cr.cache)
+        move_line.write({'name': 'Renamed'})
+        self.assertNotIn(TAX_IDS_WITH_MOVES, self.env.cr.cache)
+        move_line.write({'name': 'Renamed again'}, update_check=False)
+        self.assertEqual(move_line.name, 'Renamed again')
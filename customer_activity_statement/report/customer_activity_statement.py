@@ -2,23 +2,67 @@
 #   (http://www.eficent.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
-from datetime import datetime, timedelta
+import logging
+from collections import Counter
+from datetime import datetime
 from odoo.tools.misc import DEFAULT_SERVER_DATE_FORMAT
 from odoo import api, fields, models
 
+_logger = logging.getLogger(__name__)
+
 
 class CustomerActivityStatement(models.AbstractModel):
     """Model of Customer Activity Statement"""
 
     _name = 'report.customer_activity_statement.statement'
 
+    def _get_date_formatter(self, partner_ids):
+        """ Return a function formatting a date in the language of one of
+        the partners: format_date(str_date, partner_id).
+
+        The partners and their languages are read once, and each date is
+        parsed and formatted once per language. The hits and misses of the
+        formatting cache are counted in format_date.stats.
+        """
+        lang_codes = dict(
+            (partner.id, partner.lang)
+            for partner in self.env['res.partner'].browse(partner_ids))
+        date_formats = dict(
+            (lang_code, self.env['res.lang']._lang_get(lang_code).date_format)
+            for lang_code in set(lang_codes.values()))
+        cache = {}
+        stats = Counter()
+
+        def format_date(str_date, partner_id):
+            key = (lang_codes[partner_id], str_date)
+            if key in cache:
+                stats['hit'] += 1
+            else:
+                stats['miss'] += 1
+                date = datetime.strptime(
+                    str_date, DEFAULT_SERVER_DATE_FORMAT).date()
+                cache[key] = date.strftime(date_formats[key[0]])
+            return cache[key]
+        format_date.stats = stats
+        return format_date
+
     def _format_date_to_partner_lang(self, str_date, partner_id):
-        lang_code = self.env['res.partner'].browse(partner_id).lang
-        lang = self.env['res.lang']._lang_get(lang_code)
-        date = datetime.strptime(str_date, DEFAULT_SERVER_DATE_FORMAT).date()
-        return date.strftime(lang.date_format)
+        return self._get_date_formatter([partner_id])(str_date, partner_id)
 
-    def _initial_balance_sql_q1(self, partners, date_start, account_type):
+    def _get_currencies(self, *lines_by_partner):
+        """ Return the currencies of the lines by id, browsed together
+        so that they are read at once. """
+        currency_ids = set(
+            line['currency_id']
+            for lines in lines_by_partner
+            for partner_lines in lines.values()
+            for line in partner_lines)
+        return dict(
+            (currency.id, currency)
+            for currency in self.env['res.currency'].browse(
+                list(currency_ids)))
+
+    def _initial_balance_sql_q1(self):
         return """
             SELECT l.partner_id, l.currency_id, l.company_id,
             CASE WHEN l.currency_id is not null AND l.amount_currency > 0.0
@@ -32,39 +76,40 @@ class CustomerActivityStatement(models.AbstractModel):
             FROM account_move_line l
             JOIN account_account_type at ON (at.id = l.user_type_id)
             JOIN account_move m ON (l.move_id = m.id)
-            WHERE l.partner_id IN (%s) AND at.type = '%s'
-                                AND l.date < '%s' AND not l.blocked
+            WHERE l.partner_id = ANY(%(partner_ids)s)
+                                AND at.type = %(account_type)s
+                                AND l.date < %(date_start)s AND not l.blocked
             GROUP BY l.partner_id, l.currency_id, l.amount_currency,
                                 l.company_id
-        """ % (partners, account_type, date_start)
+        """
 
-    def _initial_balance_sql_q2(self, company_id):
+    def _initial_balance_sql_q2(self):
         return """
             SELECT Q1.partner_id, debit-credit AS balance,
             COALESCE(Q1.currency_id, c.currency_id) AS currency_id
             FROM Q1
             JOIN res_company c ON (c.id = Q1.company_id)
-            WHERE c.id = %s
-        """ % company_id
+            WHERE c.id = %(company_id)s
+        """
 
     def _get_account_initial_balance(self, company_id, partner_ids,
                                      date_start, account_type):
         res = dict(map(lambda x: (x, []), partner_ids))
-        partners = ', '.join([str(i) for i in partner_ids])
-        date_start = datetime.strptime(
-            date_start, DEFAULT_SERVER_DATE_FORMAT).date()
-        # pylint: disable=E8103
-        self.env.cr.execute("""WITH Q1 AS (%s), Q2 AS (%s)
+        self.env['account.financial.report.query']._execute("""
+        WITH Q1 AS (""" + self._initial_balance_sql_q1() + """),
+        Q2 AS (""" + self._initial_balance_sql_q2() + """)
         SELECT partner_id, currency_id, balance
-        FROM Q2""" % (self._initial_balance_sql_q1(partners, date_start,
-                                                   account_type),
-                      self._initial_balance_sql_q2(company_id)))
+        FROM Q2""", {
+            'company_id': company_id,
+            'partner_ids': list(partner_ids),
+            'date_start': date_start,
+            'account_type': account_type,
+        })
         for row in self.env.cr.dictfetchall():
             res[row.pop('partner_id')].append(row)
         return res
 
-    def _display_lines_sql_q1(self, partners, date_start, date_end,
-                              account_type):
+    def _display_lines_sql_q1(self):
         return """
             SELECT m.name AS move_id, l.partner_id, l.date, l.name,
                                 l.ref, l.blocked, l.currency_id, l.company_id,
@@ -83,45 +128,46 @@ class CustomerActivityStatement(models.AbstractModel):
             FROM account_move_line l
             JOIN account_account_type at ON (at.id = l.user_type_id)
             JOIN account_move m ON (l.move_id = m.id)
-            WHERE l.partner_id IN (%s) AND at.type = '%s'
-                                AND '%s' <= l.date AND l.date <= '%s'
+            WHERE l.partner_id = ANY(%(partner_ids)s)
+                                AND at.type = %(account_type)s
+                                AND %(date_start)s <= l.date
+                                AND l.date <= %(date_end)s
             GROUP BY l.partner_id, m.name, l.date, l.date_maturity, l.name,
                                 l.ref, l.blocked, l.currency_id,
                                 l.amount_currency, l.company_id
-        """ % (partners, account_type, date_start, date_end)
+        """
 
-    def _display_lines_sql_q2(self, company_id):
+    def _display_lines_sql_q2(self):
         return """
             SELECT Q1.partner_id, move_id, date, date_maturity, Q1.name, ref,
                             debit, credit, debit-credit as amount, blocked,
             COALESCE(Q1.currency_id, c.currency_id) AS currency_id
             FROM Q1
             JOIN res_company c ON (c.id = Q1.company_id)
-            WHERE c.id = %s
-        """ % company_id
+            WHERE c.id = %(company_id)s
+        """
 
     def _get_account_display_lines(self, company_id, partner_ids, date_start,
                                    date_end, account_type):
         res = dict(map(lambda x: (x, []), partner_ids))
-        partners = ', '.join([str(i) for i in partner_ids])
-        date_start = datetime.strptime(
-            date_start, DEFAULT_SERVER_DATE_FORMAT).date()
-        date_end = datetime.strptime(
-            date_end, DEFAULT_SERVER_DATE_FORMAT).date()
-        # pylint: disable=E8103
-        self.env.cr.execute("""WITH Q1 AS (%s), Q2 AS (%s)
+        self.env['account.financial.report.query']._execute("""
+        WITH Q1 AS (""" + self._display_lines_sql_q1() + """),
+        Q2 AS (""" + self._display_lines_sql_q2() + """)
         SELECT partner_id, move_id, date, date_maturity, name, ref, debit,
                             credit, amount, blocked, currency_id
         FROM Q2
-        ORDER BY date, date_maturity, move_id""" % (
-            self._display_lines_sql_q1(partners, date_start, date_end,
-                                       account_type),
-            self._display_lines_sql_q2(company_id)))
+        ORDER BY date, date_maturity, move_id""", {
+            'company_id': company_id,
+            'partner_ids': list(partner_ids),
+            'date_start': date_start,
+            'date_end': date_end,
+            'account_type': account_type,
+        })
         for row in self.env.cr.dictfetchall():
             res[row.pop('partner_id')].append(row)
         return res
 
-    def _show_buckets_sql_q0(self, date_end):
+    def _show_buckets_sql_q0(self):
         return """
             SELECT l1.id,
             CASE WHEN l1.reconciled = TRUE and l1.balance > 0.0
@@ -135,18 +181,20 @@ class CustomerActivityStatement(models.AbstractModel):
                 FROM account_partial_reconcile pr
                 INNER JOIN account_move_line l2
                 ON pr.credit_move_id = l2.id
-                WHERE l2.date <= '%s'
+                WHERE l2.date <= %(date_end)s
             ) as pd ON pd.debit_move_id = l1.id
             LEFT JOIN (SELECT pr.*
                 FROM account_partial_reconcile pr
                 INNER JOIN account_move_line l2
                 ON pr.debit_move_id = l2.id
-                WHERE l2.date <= '%s'
+                WHERE l2.date <= %(date_end)s
             ) as pc ON pc.credit_move_id = l1.id
+            WHERE l1.partner_id = ANY(%(partner_ids)s)
+                AND l1.date <= %(date_end)s
             GROUP BY l1.id
-        """ % (date_end, date_end)
+        """
 
-    def _show_buckets_sql_q1(self, partners, date_end, account_type):
+    def _show_buckets_sql_q1(self):
         return """
             SELECT l.partner_id, l.currency_id, l.company_id, l.move_id,
             CASE WHEN l.balance > 0.0
@@ -169,142 +217,75 @@ class CustomerActivityStatement(models.AbstractModel):
                 FROM account_partial_reconcile pr
                 INNER JOIN account_move_line l2
                 ON pr.credit_move_id = l2.id
-                WHERE l2.date <= '%s'
+                WHERE l2.date <= %(date_end)s
             ) as pd ON pd.debit_move_id = l.id
             LEFT JOIN (SELECT pr.*
                 FROM account_partial_reconcile pr
                 INNER JOIN account_move_line l2
                 ON pr.debit_move_id = l2.id
-                WHERE l2.date <= '%s'
+                WHERE l2.date <= %(date_end)s
             ) as pc ON pc.credit_move_id = l.id
-            WHERE l.partner_id IN (%s) AND at.type = '%s'
+            WHERE l.partner_id = ANY(%(partner_ids)s)
+                                AND at.type = %(account_type)s
                                 AND (Q0.reconciled_date is null or
-                                    Q0.reconciled_date > '%s')
-                                AND l.date <= '%s' AND not l.blocked
+                                    Q0.reconciled_date > %(date_end)s)
+                                AND l.date <= %(date_end)s AND not l.blocked
             GROUP BY l.partner_id, l.currency_id, l.date, l.date_maturity,
                                 l.amount_currency, l.balance, l.move_id,
                                 l.company_id
-        """ % (date_end, date_end, partners, account_type, date_end, date_end)
+        """
 
-    def _show_buckets_sql_q2(self, date_end, minus_30, minus_60, minus_90,
-                             minus_120):
+    def _show_buckets_sql_q2(self):
         return """
-            SELECT partner_id, currency_id, date_maturity, open_due,
-                            open_due_currency, move_id, company_id,
-            CASE
-                WHEN '%s' <= date_maturity AND currency_id is null
-                                THEN open_due
-                WHEN '%s' <= date_maturity AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as current,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity < '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity < '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_1_30,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_30_60,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_60_90,
-            CASE
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is null THEN open_due
-                WHEN '%s' < date_maturity AND date_maturity <= '%s'
-                                AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_90_120,
-            CASE
-                WHEN date_maturity <= '%s' AND currency_id is null
-                                THEN open_due
-                WHEN date_maturity <= '%s' AND currency_id is not null
-                                THEN open_due_currency
-                ELSE 0.0
-            END as b_over_120
+            SELECT Q1.partner_id,
+            COALESCE(Q1.currency_id, c.currency_id) AS currency_id,
+            %(date_end)s::date - Q1.date_maturity AS days_overdue,
+            CASE WHEN Q1.currency_id is not null
+                    THEN open_due_currency
+                    ELSE open_due
+            END as amount
             FROM Q1
-            GROUP BY partner_id, currency_id, date_maturity, open_due,
-                                open_due_currency, move_id, company_id
-        """ % (date_end, date_end, minus_30, date_end, minus_30, date_end,
-               minus_60, minus_30, minus_60, minus_30, minus_90, minus_60,
-               minus_90, minus_60, minus_120, minus_90, minus_120, minus_90,
-               minus_120, minus_120)
-
-    def _show_buckets_sql_q3(self, company_id):
-        return """
-            SELECT Q2.partner_id, current, b_1_30, b_30_60, b_60_90, b_90_120,
-                                b_over_120,
-            COALESCE(Q2.currency_id, c.currency_id) AS currency_id
-            FROM Q2
-            JOIN res_company c ON (c.id = Q2.company_id)
-            WHERE c.id = %s
-        """ % company_id
-
-    def _show_buckets_sql_q4(self):
-        return """
-            SELECT partner_id, currency_id, sum(current) as current,
-                                sum(b_1_30) as b_1_30,
-                                sum(b_30_60) as b_30_60,
-                                sum(b_60_90) as b_60_90,
-                                sum(b_90_120) as b_90_120,
-                                sum(b_over_120) as b_over_120
-            FROM Q3
-            GROUP BY partner_id, currency_id
+            JOIN res_company c ON (c.id = Q1.company_id)
+            WHERE c.id = %(company_id)s
         """
 
-    def _get_bucket_dates(self, date_end):
-        return {
-            'date_end': date_end,
-            'minus_30': date_end - timedelta(days=30),
-            'minus_60': date_end - timedelta(days=60),
-            'minus_90': date_end - timedelta(days=90),
-            'minus_120': date_end - timedelta(days=120),
-        }
+    def _get_buckets(self):
+        """ Return the aging buckets as (name, first day overdue),
+        the first bucket holding the amounts not due. """
+        return [
+            ('current', None),
+            ('b_1_30', 1),
+            ('b_30_60', 30),
+            ('b_60_90', 60),
+            ('b_90_120', 90),
+            ('b_over_120', 120),
+        ]
 
     def _get_account_show_buckets(self, company_id, partner_ids, date_end,
                                   account_type):
         res = dict(map(lambda x: (x, []), partner_ids))
-        partners = ', '.join([str(i) for i in partner_ids])
-        date_end = datetime.strptime(
-            date_end, DEFAULT_SERVER_DATE_FORMAT).date()
-        full_dates = self._get_bucket_dates(date_end)
-        # pylint: disable=E8103
-        self.env.cr.execute("""
-        WITH Q0 AS (%s), Q1 AS (%s), Q2 AS (%s), Q3 AS (%s), Q4 AS (%s)
-        SELECT partner_id, currency_id, current, b_1_30, b_30_60, b_60_90,
-                            b_90_120, b_over_120,
-                            current+b_1_30+b_30_60+b_60_90+b_90_120+b_over_120
-                            AS balance
-        FROM Q4
-        GROUP BY partner_id, currency_id, current, b_1_30, b_30_60, b_60_90,
-        b_90_120, b_over_120""" % (
-            self._show_buckets_sql_q0(date_end),
-            self._show_buckets_sql_q1(partners, date_end, account_type),
-            self._show_buckets_sql_q2(
-                full_dates['date_end'],
-                full_dates['minus_30'],
-                full_dates['minus_60'],
-                full_dates['minus_90'],
-                full_dates['minus_120']),
-            self._show_buckets_sql_q3(company_id),
-            self._show_buckets_sql_q4()))
-        for row in self.env.cr.dictfetchall():
-            res[row.pop('partner_id')].append(row)
+        buckets = self._get_buckets()
+        query = """
+        WITH Q0 AS (""" + self._show_buckets_sql_q0() + """),
+        Q1 AS (""" + self._show_buckets_sql_q1() + """),
+        Q2 AS (""" + self._show_buckets_sql_q2() + """)
+        SELECT partner_id, currency_id, days_overdue, amount
+        FROM Q2"""
+        params = {
+            'company_id': company_id,
+            'partner_ids': list(partner_ids),
+            'date_end': date_end,
+            'account_type': account_type,
+        }
+        aging = self.env['account.aging']._compute_aging(
+            query, params, ('partner_id', 'currency_id'),
+            [limit for name, limit in buckets[1:]], prepared=True)
+        for (partner_id, currency_id), (total, amounts) in aging.items():
+            row = {'currency_id': currency_id}
+            for (name, limit), amount in zip(buckets, amounts):
+                row[name] = amount or 0.0
+            row['balance'] = sum(amount or 0.0 for amount in amounts)
+            res[partner_id].append(row)
         return res
 
     @api.multi
@@ -323,30 +304,31 @@ class CustomerActivityStatement(models.AbstractModel):
 
         balance_start = self._get_account_initial_balance(
             company_id, partner_ids, date_start, account_type)
+        lines = self._get_account_display_lines(
+            company_id, partner_ids, date_start, date_end, account_type)
+        buckets = {}
+        if data['show_aging_buckets']:
+            buckets = self._get_account_show_buckets(
+                company_id, partner_ids, date_end, account_type)
+        currencies = self._get_currencies(balance_start, lines, buckets)
+        format_date = self._get_date_formatter(partner_ids)
 
         for partner_id in partner_ids:
             balance_start_to_display[partner_id] = {}
             for line in balance_start[partner_id]:
-                currency = self.env['res.currency'].browse(line['currency_id'])
-                if currency not in balance_start_to_display[partner_id]:
-                    balance_start_to_display[partner_id][currency] = []
+                currency = currencies[line['currency_id']]
                 balance_start_to_display[partner_id][currency] = \
                     line['balance']
 
-        lines = self._get_account_display_lines(
-            company_id, partner_ids, date_start, date_end, account_type)
-
         for partner_id in partner_ids:
             lines_to_display[partner_id], amount_due[partner_id] = {}, {}
             currency_to_display[partner_id] = {}
-            today_display[partner_id] = self._format_date_to_partner_lang(
-                today, partner_id)
-            date_start_display[partner_id] = self._format_date_to_partner_lang(
+            today_display[partner_id] = format_date(today, partner_id)
+            date_start_display[partner_id] = format_date(
                 date_start, partner_id)
-            date_end_display[partner_id] = self._format_date_to_partner_lang(
-                date_end, partner_id)
+            date_end_display[partner_id] = format_date(date_end, partner_id)
             for line in lines[partner_id]:
-                currency = self.env['res.currency'].browse(line['currency_id'])
+                currency = currencies[line['currency_id']]
                 if currency not in lines_to_display[partner_id]:
                     lines_to_display[partner_id][currency] = []
                     currency_to_display[partner_id][currency] = currency
@@ -358,24 +340,21 @@ class CustomerActivityStatement(models.AbstractModel):
                 if not line['blocked']:
                     amount_due[partner_id][currency] += line['amount']
                 line['balance'] = amount_due[partner_id][currency]
-                line['date'] = self._format_date_to_partner_lang(
-                    line['date'], partner_id)
-                line['date_maturity'] = self._format_date_to_partner_lang(
+                line['date'] = format_date(line['date'], partner_id)
+                line['date_maturity'] = format_date(
                     line['date_maturity'], partner_id)
                 lines_to_display[partner_id][currency].append(line)
 
         if data['show_aging_buckets']:
-            buckets = self._get_account_show_buckets(
-                company_id, partner_ids, date_end, account_type)
             for partner_id in partner_ids:
                 buckets_to_display[partner_id] = {}
                 for line in buckets[partner_id]:
-                    currency = self.env['res.currency'].browse(
-                        line['currency_id'])
-                    if currency not in buckets_to_display[partner_id]:
-                        buckets_to_display[partner_id][currency] = []
+                    currency = currencies[line['currency_id']]
                     buckets_to_display[partner_id][currency] = line
 
+        _logger.debug(
+            "%s date formatting cache: %s hits, %s misses", self._name,
+            format_date.stats['hit'], format_date.stats['miss'])
         return {
             'doc_ids': partner_ids,
             'doc_model': 'res.partner',
@@ -2,6 +2,9 @@
 #   (http://www.eficent.com)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+from datetime import date, timedelta
+
+from odoo import fields
 from odoo.tests.common import TransactionCase
 
 
@@ -65,3 +68,89 @@ class TestCustomerActivityStatement(TransactionCase):
                               "There was an error while compiling the report.")
         self.assertIn("Show_Buckets", report,
                       "There was an error while compiling the report.")
+
+    def test_batch_export(self):
+        wiz_id = self.wiz.with_context(
+            active_ids=[self.partner1.id, self.partner2.id],
+        ).create({'batch_export': True})
+        action = wiz_id.button_export_pdf()
+        self.assertEqual(action['res_model'], 'account.financial.report.job')
+        job = self.env['account.financial.report.job'].browse(
+            action['res_id'])
+        self.assertTrue(job.batch)
+        self.assertEqual(job.report_model, 'report.' + self.report_name)
+
+        # A chunk of partners is rendered with a single set of queries
+        data = wiz_id._prepare_activity_statement()
+        report = self.statement_model.get_report_values(
+            data['partner_ids'], data)
+        self.assertEqual(
+            set(report['Date']), set([self.partner1.id, self.partner2.id]))
+
+    def test_date_formatter(self):
+        format_date = self.statement_model._get_date_formatter(
+            [self.partner1.id, self.partner2.id])
+        self.assertEqual(
+            format_date('2018-01-31', self.partner1.id),
+            self.statement_model._format_date_to_partner_lang(
+                '2018-01-31', self.partner1.id))
+        format_date('2018-01-31', self.partner1.id)
+        self.assertEqual(format_date.stats['hit'], 1)
+        self.assertEqual(format_date.stats['miss'], 1)
+
+    def test_show_buckets_boundaries(self):
+        partner = self.env['res.partner'].create({'name': 'Aging'})
+        receivable = self.env['account.account'].search([
+            ('company_id', '=', self.company.id),
+            ('internal_type', '=', 'receivable'),
+        ], limit=1)
+        revenue = self.env['account.account'].search([
+            ('company_id', '=', self.company.id),
+            ('user_type_id', '=',
+             self.env.ref('account.data_account_type_revenue').id),
+        ], limit=1)
+        journal = self.env['account.journal'].search([
+            ('company_id', '=', self.company.id),
+            ('type', '=', 'sale'),
+        ], limit=1)
+        date_end = date(2018, 6, 30)
+        line_ids = []
+        # Days overdue and amount of each receivable line
+        for days, amount in ((0, 1.0), (1, 2.0), (29, 4.0), (30, 8.0),
+                             (119, 16.0), (120, 32.0)):
+            date_maturity = fields.Date.to_string(
+                date_end - timedelta(days=days))
+            line_ids += [
+                (0, 0, {
+                    'name': 'Receivable',
+                    'account_id': receivable.id,
+                    'partner_id': partner.id,
+                    'date_maturity': date_maturity,
+                    'debit': amount,
+                }),
+                (0, 0, {
+                    'name': 'Revenue',
+                    'account_id': revenue.id,
+                    'partner_id': partner.id,
+                    'credit': amount,
+                }),
+            ]
+        self.env['account.move'].create({
+            'journal_id': journal.id,
+            'date': '2018-01-01',
+            'line_ids': line_ids,
+        })
+        buckets = self.statement_model._get_account_show_buckets(
+            self.company.id, [partner.id], fields.Date.to_string(date_end),
+            'receivable')
+        self.assertEqual(len(buckets[partner.id]), 1)
+        row = buckets[partner.id][0]
+        # Unlike the Aged Partner Balance, the amounts overdue by 30 days
+        # are in the second bucket, and the ones by 120 days in the last
+        self.assertEqual(row['current'], 1.0)
+        self.assertEqual(row['b_1_30'], 6.0)
+        self.assertEqual(row['b_30_60'], 8.0)
+        self.assertEqual(row['b_60_90'], 0.0)
+        self.assertEqual(row['b_90_120'], 16.0)
+        self.assertEqual(row['b_over_120'], 32.0)
+        self.assertEqual(row['balance'], 63.0)
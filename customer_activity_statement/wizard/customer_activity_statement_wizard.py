@@ -3,7 +3,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
 from datetime import date
-from odoo import api, fields, models
+from odoo import api, fields, models, _
 
 
 class CustomerActivityStatementWizard(models.TransientModel):
@@ -33,6 +33,12 @@ class CustomerActivityStatementWizard(models.TransientModel):
     account_type = fields.Selection(
         [('receivable', 'Receivable'),
          ('payable', 'Payable')], string='Account type', default='receivable')
+    batch_export = fields.Boolean(
+        string='One PDF per partner',
+        help='Render the statement of each partner in its own PDF in '
+             'background, the files are attached to the partners and to '
+             'the report job.',
+    )
 
     @api.multi
     def button_export_pdf(self):
@@ -54,6 +60,11 @@ class CustomerActivityStatementWizard(models.TransientModel):
     def _export(self):
         """Export to PDF."""
         data = self._prepare_activity_statement()
+        if self.batch_export:
+            return self.env['account.financial.report.job'].enqueue(
+                _('Activity Statements'),
+                'report.customer_activity_statement.statement',
+                data, 'qweb-pdf', batch=True)
         return self.env.ref(
             'customer_activity_statement'
             '.action_print_customer_activity_statement').report_action(
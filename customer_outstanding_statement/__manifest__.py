@@ -12,6 +12,7 @@
     'license': 'AGPL-3',
     'depends': [
         'account_invoicing',
+        'account_financial_report',
     ],
     'data': [
         'views/statement.xml',
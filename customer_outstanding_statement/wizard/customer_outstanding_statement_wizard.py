@@ -3,7 +3,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
 from datetime import date
-from odoo import api, fields, models
+from odoo import api, fields, models, _
 
 
 class CustomerOutstandingStatementWizard(models.TransientModel):
@@ -30,6 +30,12 @@ class CustomerOutstandingStatementWizard(models.TransientModel):
     account_type = fields.Selection(
         [('receivable', 'Receivable'),
          ('payable', 'Payable')], string='Account type', default='receivable')
+    batch_export = fields.Boolean(
+        string='One PDF per partner',
+        help='Render the statement of each partner in its own PDF in '
+             'background, the files are attached to the partners and to '
+             'the report job.',
+    )
 
     @api.multi
     def button_export_pdf(self):
@@ -50,6 +56,11 @@ class CustomerOutstandingStatementWizard(models.TransientModel):
     def _export(self):
         """Export to PDF."""
         data = self._prepare_outstanding_statement()
+        if self.batch_export:
+            return self.env['account.financial.report.job'].enqueue(
+                _('Outstanding Statements'),
+                'report.customer_outstanding_statement.statement',
+                data, 'qweb-pdf', batch=True)
         return self.env.ref(
             'customer_outstanding_statement'
             '.action_print_customer_outstanding_statement').report_action(